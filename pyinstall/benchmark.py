@@ -0,0 +1,443 @@
+"""
+Benchmark harness for the e-slip pipeline. Generates a synthetic corpus (no real candidate data):
+candidate lists as text-layer and scanned-image PDFs, a matching centre list, an eligibility CSV
+export and a timetable, then times every stage from extract_text_from_pdf through create_pdf_slip
+and compares the result with a stored baseline.
+
+    python benchmark.py                                # 100 and 1,000 candidates, every mode
+    python benchmark.py --sizes 100 1000 10000 --save-baseline
+    python benchmark.py --generate-only --corpus-dir corpus
+
+The corpus is cached in --corpus-dir, so only the first run at a size pays for generation.
+Scanned PDFs need Tesseract; without it the scanned modes are skipped. The "preprocessed" mode OCRs
+the scanned corpus again with page preprocessing on (needs numpy) and reports the OCR time saved and
+the change in parsed candidates against the plain "scanned" run. --ocr-profiles repeats the scanned
+modes once per OCR profile and compares their OCR time and the candidates each one read exactly right:
+
+    python benchmark.py --modes scanned --ocr-profiles generic candidate_list candidate_list_best
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+from timeslips_core import (
+    SUBJECT_CODE_MAP, parse_csv, parse_centre_list, parse_candidate_list, match_candidates, generate_slips,
+    missing_slip_fonts, get_tesseract, get_pil_image, get_pdf_class, get_numpy, start_timings, stop_timings,
+    configure_ocr, LOG_WARNING, infer_log_level, OCR_PROFILES, OCR_STAGE_PROFILES,
+    SUBJECT_CODE_PATTERN,
+)
+
+DEFAULT_SIZES = [100, 1000]
+MODES = ("text", "scanned", "preprocessed")
+OCR_MODES = ("scanned", "preprocessed")  # both read the scanned corpus
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "benchmark_baseline.json")
+CORPUS_SEED = 2026
+SCAN_DPI = 200  # resolution the "scanned" candidate lists are rasterised at
+LINES_PER_PAGE = 60
+SLIP_LIMIT = 200  # slips written per size; per-slip cost is flat, so a sample keeps 10k runs practical
+REGRESSION_TOLERANCE = 0.25  # flag stages more than 25% slower than the baseline...
+REGRESSION_MIN_MS = 20.0  # ...unless the difference is below timer noise
+ELIGIBLE_SERVICE = "E-candidate slip/Timetable only- $30"
+OTHER_SERVICE = "Error recognition only- $20"
+
+LAST_NAMES = ["Alleyne", "Baptiste", "Boodram", "Charles", "Clarke", "Daniel", "Edwards", "Francis", "George",
+              "Gordon", "Greenidge", "Harper", "Holder", "James", "John", "Joseph", "King", "Lewis", "Mohammed",
+              "Nurse", "O'Neal", "Persaud", "Phillip", "Ramdass", "Roberts", "Samuel", "Singh", "Springer",
+              "Thomas", "Walcott", "Williams", "Young"]
+FIRST_NAMES = ["Aaliyah", "Akeem", "Brianna", "Dante", "Deja", "Jada", "Jaden", "Kemar", "Keisha", "Kyle",
+               "Latoya", "Malik", "Nia", "Omari", "Rhea", "Ricardo", "Shanice", "Tariq", "Tiana", "Trevon",
+               "Vanessa", "Zara"]
+MIDDLE_NAMES = ["", "", "", "Anne", "Marie", "Jose", "Lee", "Grace", "Paul", "Ray"]
+CENTRE_PLACES = ["Belmont", "Bridgetown", "Castries", "Chaguanas", "Christ Church", "Kingstown", "Linden",
+                 "Montego Bay", "Point Fortin", "Roseau", "San Fernando", "Speightstown", "St. George's",
+                 "Spanish Town", "Tunapuna", "Vieux Fort"]
+CENTRE_KINDS = ["Secondary School", "High School", "College", "Secondary"]
+
+
+def log(msg, level=None):
+    """ Only warnings and errors from the pipeline are worth printing between timing rows """
+    if infer_log_level(msg, level) >= LOG_WARNING:
+        print(f"    {msg}", flush=True)
+
+
+# ---------------- SYNTHETIC CORPUS ----------------
+def make_roster(size, seed=CORPUS_SEED):
+    """ Deterministic roster (plain dicts with the name split into parts, for writing the corpus) plus centres """
+    rng = random.Random(seed + size)
+    centre_count = max(1, size // 120)
+    centres = {}
+    while len(centres) < centre_count:
+        code = f"{rng.randint(100000, 999999)}"
+        centres[code] = f"{rng.choice(CENTRE_PLACES)} {rng.choice(CENTRE_KINDS)}"
+
+    codes = sorted(centres)
+    subject_codes = sorted(SUBJECT_CODE_MAP)
+    seq = {code: 0 for code in codes}
+    roster = []
+    for _ in range(size):
+        centre = rng.choice(codes)
+        seq[centre] += 1
+        subjects = [{"code": code, "type": rng.choice("ARG")}
+                    for code in rng.sample(subject_codes, rng.randint(1, 7))]
+        roster.append({
+            "id": f"{centre}{seq[centre]:04d}", "centre_num": centre, "seq_num": f"{seq[centre]:04d}",
+            "last": rng.choice(LAST_NAMES), "first": rng.choice(FIRST_NAMES), "middle": rng.choice(MIDDLE_NAMES),
+            "dob": f"{rng.randint(1, 28):02d}/{rng.randint(1, 12):02d}/{rng.randint(2005, 2010)}",
+            "gender": rng.choice("MF"), "subjects": subjects,
+        })
+    roster.sort(key=lambda c: c["id"])
+    return roster, centres
+
+
+def roster_line(c):
+    name = f"{c['last']}, {c['first']} {c['middle']}".strip().upper()
+    subjects = " ".join(f"{s['code']}-{s['type']}" for s in c["subjects"])
+    return f"{c['id']} {name} {c['dob']} {c['gender']} {subjects} {len(c['subjects'])}"
+
+
+def write_text_pdf(path, title, lines, fontsize=7):
+    import pymupdf
+
+    doc = pymupdf.open()
+    for start in range(0, len(lines), LINES_PER_PAGE):
+        page = doc.new_page(width=595, height=842)  # A4 in points
+        page.insert_text((36, 40), title, fontsize=10)
+        y = 64
+        for line in lines[start:start + LINES_PER_PAGE]:
+            page.insert_text((36, y), line, fontsize=fontsize)
+            y += 12.5
+        page.insert_text((500, 820), f"Page {start // LINES_PER_PAGE + 1}", fontsize=7)
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def write_scanned_pdf(text_pdf_path, path, seed=CORPUS_SEED):
+    """ Rasterise a text-layer PDF the way a photocopier scan looks: grey, slightly skewed, noisy, JPEG """
+    import pymupdf
+
+    Image = get_pil_image()
+    rng = random.Random(seed)
+    src = pymupdf.open(text_pdf_path)
+    out = pymupdf.open()
+    for page in src:
+        pix = page.get_pixmap(dpi=SCAN_DPI, colorspace=pymupdf.csGRAY)
+        img = Image.frombytes("L", [pix.width, pix.height], pix.samples)
+        img = img.rotate(rng.uniform(-0.6, 0.6), resample=Image.BILINEAR, fillcolor=255)
+        noise = Image.effect_noise(img.size, 18)
+        img = Image.blend(img, noise, 0.08)
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=60)
+        new_page = out.new_page(width=page.rect.width, height=page.rect.height)
+        new_page.insert_image(new_page.rect, stream=buf.getvalue())
+    out.save(path, deflate=True)
+    out.close()
+    src.close()
+
+
+def write_csv_export(path, roster, seed=CORPUS_SEED):
+    """ May/June style export: most candidates ordered a slip, some another service, a few are not on the list """
+    rng = random.Random(seed + len(roster))
+    fields = ["Timestamp", "Last Name", "First Name", "Middle Name", "Date Of Birth", "Email",
+              "Additional Application Service - sent via email", "Choose Examination"]
+    rows = []
+    for c in roster:
+        day, month, year = c["dob"].split("/")
+        dob = rng.choice([f"{year}-{month}-{day}", c["dob"]])
+        email = f"{c['first']}.{c['last']}{c['seq_num']}@example.com".lower().replace("'", "")
+        service = ELIGIBLE_SERVICE if rng.random() < 0.85 else OTHER_SERVICE
+        rows.append([f"2026-03-{rng.randint(1, 28):02d}", c["last"], c["first"], c["middle"], dob, email,
+                     service, "CSEC"])
+    for i in range(max(1, len(roster) // 50)):
+        rows.append(["2026-03-01", rng.choice(LAST_NAMES), "Walkin", "", f"2009-01-{i % 28 + 1:02d}",
+                     f"walkin{i}@example.com", ELIGIBLE_SERVICE, "CSEC"])
+    rng.shuffle(rows)
+    with open(path, "w", newline='', encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(fields)
+        writer.writerows(rows)
+
+
+def make_timetable(seed=CORPUS_SEED):
+    rng = random.Random(seed)
+    return {code: [{"paper": str(p), "date": f"{rng.randint(1, 28):02d}/{rng.choice([5, 6]):02d}/2026",
+                    "session": rng.choice(["AM", "PM"])} for p in (1, 2)]
+            for code in SUBJECT_CODE_MAP}
+
+
+def corpus_paths(corpus_dir, size):
+    return {
+        "text": os.path.join(corpus_dir, f"candidates_{size}_text.pdf"),
+        "scanned": os.path.join(corpus_dir, f"candidates_{size}_scanned.pdf"),
+        "centres": os.path.join(corpus_dir, f"centres_{size}.pdf"),
+        "csv": os.path.join(corpus_dir, f"export_{size}.csv"),
+        "timetable": os.path.join(corpus_dir, "timetable.json"),
+    }
+
+
+def generate_corpus(corpus_dir, size, modes):
+    """ Write whatever part of the corpus for `size` is not cached yet; returns the file paths """
+    os.makedirs(corpus_dir, exist_ok=True)
+    paths = corpus_paths(corpus_dir, size)
+    roster, centres = make_roster(size)
+    if not os.path.exists(paths["text"]):
+        write_text_pdf(paths["text"], "CANDIDATE LIST CSEC MAY-JUNE 2026", [roster_line(c) for c in roster])
+    if any(m in OCR_MODES for m in modes) and not os.path.exists(paths["scanned"]):
+        write_scanned_pdf(paths["text"], paths["scanned"])
+    if not os.path.exists(paths["centres"]):
+        write_text_pdf(paths["centres"], "CENTRE LIST", [f"{code} {name}" for code, name in sorted(centres.items())],
+                       fontsize=9)
+    if not os.path.exists(paths["csv"]):
+        write_csv_export(paths["csv"], roster)
+    if not os.path.exists(paths["timetable"]):
+        with open(paths["timetable"], "w", encoding="utf-8") as f:
+            json.dump(make_timetable(), f, indent=1)
+    return paths
+
+
+# ---------------- RUN ----------------
+def warm_up():
+    """ Load the lazily imported libraries up front so the first timed stage is not charged for them """
+    __import__("pymupdf")
+    get_pil_image()
+    get_tesseract()
+    get_pdf_class()
+    get_numpy()
+
+
+def exact_count(cand_list, size):
+    """
+    Parsed candidates whose number, name, date of birth and subjects all match the generated roster
+    (subjects the candidate list parser does not read, such as CAPE unit codes, are left out of the check)
+    """
+    roster, _ = make_roster(size)
+    truth = {c["id"]: (f"{c['last']}, {c['first']} {c['middle']}".strip().upper(), c["dob"],
+                       tuple((s["code"], s["type"]) for s in c["subjects"]
+                             if SUBJECT_CODE_PATTERN.fullmatch(s["code"]))) for c in roster}
+    return sum(1 for c in cand_list
+               if truth.get(c.id) == (c.name.upper(), c.dob, tuple((s.code, s.type) for s in c.subjects)))
+
+
+def run_once(paths, size, mode, slip_limit, profile=None):
+    """
+    Run the pipeline on one corpus entry (candidate lists read with the given OCR profile, if any);
+    returns stage wall times, span totals and yields
+    """
+    default_profile = OCR_STAGE_PROFILES["candidate_pages"]
+    work_dir = tempfile.mkdtemp(prefix="eslip_bench_")
+    stages = {}
+    timings = start_timings()
+    try:
+        t = time.perf_counter()
+        csv_list = parse_csv(paths["csv"], "CSEC", "May - June", log)
+        stages["csv"] = time.perf_counter() - t
+
+        t = time.perf_counter()
+        centres = parse_centre_list(paths["centres"], log, work_dir)
+        stages["centre_list"] = time.perf_counter() - t
+
+        configure_ocr(preprocess=mode == "preprocessed", profiles={"candidate_pages": profile or default_profile})
+        t = time.perf_counter()
+        cand_list, _, _ = parse_candidate_list(paths["scanned" if mode in OCR_MODES else mode], log, work_dir)
+        stages["candidate_list"] = time.perf_counter() - t
+        configure_ocr(preprocess=False, profiles={"candidate_pages": default_profile})
+
+        t = time.perf_counter()
+        matched, _ = match_candidates(cand_list, csv_list)
+        stages["match"] = time.perf_counter() - t
+
+        with open(paths["timetable"], encoding="utf-8") as f:
+            timetable = json.load(f)
+        sample = matched[:slip_limit]
+        t = time.perf_counter()
+        result = generate_slips(sample, centres, timetable, work_dir, "May - June", "2026", "CSEC", True, log)
+        stages["slips"] = time.perf_counter() - t
+    finally:
+        stop_timings()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    spans = {}
+    for ev in timings.events:
+        spans[ev["name"]] = spans.get(ev["name"], 0.0) + ev["dur"] / 1000
+    return {
+        "stages_ms": {k: round(v * 1000, 1) for k, v in stages.items()},
+        "spans_ms": {k: round(v, 1) for k, v in sorted(spans.items())},
+        "counts": {"candidates": size, "parsed": len(cand_list), "exact": exact_count(cand_list, size),
+                   "csv_eligible": len(csv_list),
+                   "centres": len(centres), "matched": len(matched), "slips": result["success"]},
+        "per_slip_ms": round(stages["slips"] * 1000 / result["success"], 2) if result["success"] else None,
+    }
+
+
+def print_result(key, res):
+    counts = res["counts"]
+    print(f"  {key}: parsed {counts['parsed']}/{counts['candidates']} ({counts['exact']} exact), "
+          f"matched {counts['matched']}, "
+          f"{counts['slips']} slips ({res['per_slip_ms']} ms/slip)")
+    for stage, ms in res["stages_ms"].items():
+        print(f"    {stage:<16} {ms:>10.1f} ms")
+    for name, ms in res["spans_ms"].items():
+        print(f"      . {name:<16} {ms:>8.1f} ms")
+
+
+def compare_preprocessing(results):
+    """ Print what preprocessing bought per size: OCR time saved and the change in parsed candidates """
+    runs = results["runs"]
+    sizes = sorted({int(key.split("/")[0]) for key in runs})
+    pairs = [(runs[f"{s}/scanned"], runs[f"{s}/preprocessed"], s) for s in sizes
+             if f"{s}/scanned" in runs and f"{s}/preprocessed" in runs]
+    if not pairs:
+        return
+    print("\nPreprocessing vs plain scanned:")
+    for plain, pre, size in pairs:
+        ocr_before = plain["spans_ms"].get("ocr", 0.0)
+        ocr_after = pre["spans_ms"].get("ocr", 0.0)
+        prep = pre["spans_ms"].get("preprocess", 0.0)
+        net = plain["stages_ms"]["candidate_list"] - pre["stages_ms"]["candidate_list"]
+        saved = ocr_before - ocr_after
+        print(f"  {size}: OCR {ocr_before:.0f} -> {ocr_after:.0f} ms "
+              f"({f'{-saved / ocr_before:+.0%}, ' if ocr_before else ''}saved {saved:.0f} ms), "
+              f"preprocessing cost {prep:.0f} ms, net {net:+.0f} ms; "
+              f"parsed {plain['counts']['parsed']} -> {pre['counts']['parsed']} "
+              f"({pre['counts']['parsed'] - plain['counts']['parsed']:+d} of {size})")
+
+
+def compare_profiles(results):
+    """ Print OCR time and exactly read candidates per OCR profile, against the first profile of each run """
+    groups = {}
+    for key, res in results["runs"].items():
+        parts = key.split("/")
+        if len(parts) == 3:
+            groups.setdefault(f"{parts[0]}/{parts[1]}", []).append((parts[2], res))
+    for group, runs in groups.items():
+        print(f"\nOCR profiles, {group}:")
+        first_ocr = runs[0][1]["spans_ms"].get("ocr", 0.0)
+        for profile, res in runs:
+            ocr = res["spans_ms"].get("ocr", 0.0)
+            change = f" ({(ocr - first_ocr) / first_ocr:+.0%})" if first_ocr and profile != runs[0][0] else ""
+            print(f"  {profile:<22} OCR {ocr:>9.0f} ms{change:<8} exact {res['counts']['exact']:>6}/"
+                  f"{res['counts']['candidates']}  parsed {res['counts']['parsed']:>6}")
+
+
+# ---------------- BASELINE ----------------
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def compare_with_baseline(results, baseline, tolerance=REGRESSION_TOLERANCE):
+    """ Print per-stage deltas against the baseline; returns the list of regressions """
+    regressions = []
+    print(f"\nComparison with baseline from {baseline.get('created', '?')} ({baseline.get('machine', '?')}):")
+    for key, res in results["runs"].items():
+        base = baseline.get("runs", {}).get(key)
+        if not base:
+            print(f"  {key}: not in baseline")
+            continue
+        if res["counts"]["parsed"] < base["counts"]["parsed"]:
+            regressions.append(f"{key} parsed {res['counts']['parsed']} candidates, "
+                               f"baseline {base['counts']['parsed']}")
+        if res["counts"]["exact"] < base["counts"].get("exact", 0):
+            regressions.append(f"{key} read {res['counts']['exact']} candidates exactly, "
+                               f"baseline {base['counts']['exact']}")
+        for stage, ms in res["stages_ms"].items():
+            old = base["stages_ms"].get(stage)
+            if stage == "slips" and base.get("per_slip_ms"):
+                # the slip sample size may differ between runs, so scale the baseline by its per-slip cost
+                old = base["per_slip_ms"] * res["counts"]["slips"]
+            if not old:
+                continue
+            change = (ms - old) / old
+            flag = change > tolerance and ms - old > REGRESSION_MIN_MS
+            print(f"  {key:<14} {stage:<16} {old:>10.1f} -> {ms:>10.1f} ms ({change:+.0%}){'  SLOWER' if flag else ''}")
+            if flag:
+                regressions.append(f"{key} {stage} {change:+.0%}")
+    return regressions
+
+
+def build_arg_parser():
+    p = argparse.ArgumentParser(description="Benchmark the e-slip pipeline on a synthetic corpus.")
+    p.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="candidate counts, e.g. 100 1000 10000")
+    p.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    p.add_argument("--corpus-dir", default=os.path.join(tempfile.gettempdir(), "eslip_bench_corpus"))
+    p.add_argument("--slip-limit", type=int, default=SLIP_LIMIT, help="slips written per size")
+    p.add_argument("--baseline", default=BASELINE_PATH, help="baseline JSON to compare with or save to")
+    p.add_argument("--save-baseline", action="store_true", help="store this run as the new baseline")
+    p.add_argument("--output", help="also write this run's results to a JSON file")
+    p.add_argument("--ocr-profiles", nargs="+", choices=list(OCR_PROFILES), metavar="PROFILE",
+                   help=f"run the scanned modes once per OCR profile ({', '.join(OCR_PROFILES)})")
+    p.add_argument("--generate-only", action="store_true", help="write the corpus and stop")
+    return p
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    modes = list(args.modes)
+    if not args.generate_only:
+        if any(m in OCR_MODES for m in modes) and not get_tesseract():
+            print("Tesseract not found: skipping the scanned-image modes (their corpus can only be read by OCR).")
+            modes = [m for m in modes if m not in OCR_MODES]
+        if "preprocessed" in modes and not get_numpy():
+            print("numpy not found: skipping the preprocessed mode.")
+            modes.remove("preprocessed")
+
+    if not args.generate_only:
+        missing_fonts = missing_slip_fonts()
+        if missing_fonts:
+            print(f"ERROR: missing font file(s): {', '.join(missing_fonts)}")
+            return 1
+
+    warm_up()
+    results = {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "machine": f"{platform.node()} {platform.machine()}",
+               "python": platform.python_version(), "slip_limit": args.slip_limit, "runs": {}}
+    for size in args.sizes:
+        t = time.perf_counter()
+        paths = generate_corpus(args.corpus_dir, size, args.modes)
+        print(f"Corpus for {size} candidates ready in {time.perf_counter() - t:.1f}s ({args.corpus_dir})")
+        if args.generate_only:
+            continue
+        for mode in modes:
+            for profile in (args.ocr_profiles if args.ocr_profiles and mode in OCR_MODES else [None]):
+                key = f"{size}/{mode}/{profile}" if profile else f"{size}/{mode}"
+                res = run_once(paths, size, mode, args.slip_limit, profile)
+                results["runs"][key] = res
+                print_result(key, res)
+
+    if args.generate_only:
+        return 0
+    compare_preprocessing(results)
+    compare_profiles(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+
+    status = 0
+    baseline = load_baseline(args.baseline)
+    if baseline and not args.save_baseline:
+        regressions = compare_with_baseline(results, baseline)
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            status = 1
+        else:
+            print("\nNo regressions against the baseline.")
+    elif not baseline and not args.save_baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to store one.")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"\nBaseline saved: {args.baseline}")
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,544 +1,224 @@
+import time
+_STARTUP_T0 = time.perf_counter()  # before any other import, for the startup timing report
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-import pymupdf  # PyMuPDF
-from fpdf import FPDF
-from fpdf.enums import XPos, YPos
 import re
 import os
-import sys  # Added for PyInstaller path handling
+import sys
 import threading
-import time
 import queue
-import csv
+from collections import deque
 from datetime import datetime
 
-try:
-    import pytesseract
-    from PIL import Image
-except ImportError:
-    pytesseract = None
-    Image = None
-
-# ------------------ PATH HELPER ------------------
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    try:
-        # PyInstaller creates a temp folder and stores path in _MEIPASS
-        base_path = sys._MEIPASS
-    except Exception:
-        base_path = os.path.abspath(".")
-
-    return os.path.join(base_path, relative_path)
-
-# ------------------ CONFIG ------------------
-DEBUG = 0  # 1 = only process first page of each PDF
-ASK_TIMETABLE_EVERY_RUN = True  # if True, asks once per unique subject set per run
-
-# ---------------- TESSERACT CONFIG ----------------
-if pytesseract:
-    # 1. Look for Tesseract bundled inside the Exe
-    bundled_tess_path = resource_path(os.path.join("Tesseract-OCR", "tesseract.exe"))
-    
-    if os.path.exists(bundled_tess_path):
-        pytesseract.pytesseract.tesseract_cmd = bundled_tess_path
-    else:
-        # 2. Fallback to standard install location (for dev mode)
-        default_path = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
-        if os.path.exists(default_path):
-             pytesseract.pytesseract.tesseract_cmd = default_path
-
-# ---------------- SUBJECT MAP ----------------
-SUBJECT_CODE_MAP = {
-    "ENGAG": "English A",
-    "ENGBG": "English B",
-    "MATHG": "Mathematics",
-    "HISTG": "History",
-    "GEOGG": "Geography",
-    "BIOLG": "Biology",
-    "CHEMG": "Chemistry",
-    "PHYSICSG": "Physics",
-    "ECONG": "Economics",
-    "PRINBG": "Principles of Business",
-    "PRINAG": "Principles of Accounts",
-    "SPANSG": "Spanish",
-    "FRNCHG": "French",
-    "ITG": "Information Technology",
-    "ADDMTG": "Additional Mathematics",
-    "OFFADG": "Office Administration",
-    "AGSBG": "Agricultural Science (Double Award)",
-    "AGSCG": "Agricultural Science (Single Award)",
-    "SOCSG": "Social Studies",
-    "INTSG": "Integrated Science",
-    "HUMANG": "Human & Social Biology",
-    "TDSCG": "Technical Drawing",
-    "MECHTG": "Mechanical Engineering Technology",
-    "FOODNG": "Food & Nutrition",
-    "HTMG": "Hospitality Management",
-    "ARTSG": "Visual Arts",
-    "MUSCG": "Music",
-    "DANCIG": "Dance",
-    "THEATG": "Theatre Arts",
-    "PHEDUG": "Physical Education",
-    "CARITEG": "Caribbean History",
-    "SOCSTUDG": "Social Studies",
-    "OAG": "Office Administration",
-    "POAG": "Principles of Accounts",
-    "HSBIOG": "Human and Social Biology",
-    "POBG": "Principles of Business",
-    "INTSCIG": "Integrated Science S/A",
-    "BIOG": "Biology",
-    "ADDMATH": "Additional Mathematics",
-    "CARHISTG": "Caribbean History",
-    "GEOG": "Geography",
-    "SPANG": "Spanish",
-    "FRENG": "French",
-    "PORTG": "Portuguese",
-    "EDPMG": "Electronic Document Preparation & Management",
-    "RELIGEDG": "Religious Education",
-    "TECHDRG": "Technical Drawing",
-    "AGSCIDAG": "Agricultural Science D/A",
-    "AGSCISAG": "Agricultural Science S/A",
-    "INDTECHG": "Industrial Technology",
-    "FASHION": "Textiles, Clothing & Fashion",
-    "FOODNUTH": "Food, Nutrition & Health",
-    "FAMRESMG": "Family & Resource Management",
-    "MUSICG": "Music",
-    "PEASPORT": "Physical Education & Sport",
-    "THEARTSG": "Theatre Arts",
-    "VISARTSG": "Visual Arts",
-    "ACCU1": "Accounting Unit 1",
-    "ACCU2": "Accounting Unit 2",
-    "AMTU1": "Applied Mathematics Unit 1",
-    "AMTU2": "Applied Mathematics Unit 2",
-    "BIOU1": "Biology Unit 1",
-    "BIOU2": "Biology Unit 2",
-    "CARSTDU1": "Caribbean Studies",
-    "CHEMU1": "Chemistry Unit 1",
-    "CHEMU2": "Chemistry Unit 2",
-    "COMMSTU1": "Communication Studies",
-    "ECONU1": "Economics Unit 1",
-    "ECONU2": "Economics Unit 2",
-    "ENTRU1": "Entrepreneurship Unit 1",
-    "ENTRU2": "Entrepreneurship Unit 2",
-    "ENSCU1": "Environmental Science Unit 1",
-    "ENSCU2": "Environmental Science Unit 2",
-    "FRENU1": "French Unit 1",
-    "FRENU2": "French Unit 2",
-    "GEOU1": "Geography Unit 1",
-    "GEOU2": "Geography Unit 2",
-    "HISTU2": "History Unit 2",
-    "INMATU1": "Integrated Mathematics",
-    "INTHU1": "Information Technology Unit 1",
-    "INTHU2": "Information Technology Unit 2",
-    "LAWU1": "Law Unit 1",
-    "LAWU2": "Law Unit 2",
-    "LIEU1": "Literatures in English Unit 1",
-    "LIEU2": "Literatures in English Unit 2",
-    "MOBU1": "Management of Business Unit 1",
-    "MOBU2": "Management of Business Unit 2",
-    "PHYU1": "Physics Unit 1",
-    "PHYU2": "Physics Unit 2",
-    "PMATHU1": "Pure Mathematics Unit 1",
-    "PMATHU2": "Pure Mathematics Unit 2",
-    "SOCU1": "Sociology Unit 1",
-    "SOCU2": "Sociology Unit 2",
-    "SPU1": "Spanish Unit 1",
-    "SPU2": "Spanish Unit 2",
-    "TOURU1": "Tourism Unit 1",
-    "TOURU2": "Tourism Unit 2"
-}
-
-SUBJECT_CODE_PATTERN = re.compile(r"([A-Z]{3,8})(?:-([A-Z]))?") 
-DATE_PATTERN = re.compile(r"\b(\d{2}/\d{2}/\d{4})\b")
-CANDIDATE_NUM_PATTERN = re.compile(r"\b(\d{10})\b")
-NAME_PATTERN = re.compile(r"^[A-Z'\- ]+,\s*[A-Z'\- ]+(?:\s+[A-Z'\- ]+)*$")
-
-
-# ---------------- CSV PARSER (ROUTER) ----------------
-def parse_csv(csv_path, exam_type, exam_month, log_callback):
-    if exam_type == "CSEC" and exam_month == "January":
-        log_callback("Using CSEC January CSV parser.")
-        return parse_csv_january(csv_path, log_callback)
-    else:
-        log_callback("Using standard May/June CSV parser.")
-        return parse_csv_may_june(csv_path, exam_type, log_callback)
-
-
-def parse_csv_may_june(csv_path, exam_type, log_callback):
-    eligible = []
-    try:
-        with open(csv_path, newline='', encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            log_callback(f"DEBUG: Reading {csv_path} for May/June...")
-            
-            row_count = 0
-            for row in reader:
-                row_count += 1
-                service = row.get("Additional Application Service - sent via email", "").strip()
-
-                if service not in [
-                    "E-candidate slip/Timetable only- $30",
-                    "Error recognition & E-candidate slip/Timetable- $50"
-                ]:
-                    continue
-
-                if "Choose Examination" in row and row["Choose Examination"].strip():
-                    exam_in_csv = row["Choose Examination"].strip().upper()
-                    if exam_in_csv != exam_type.upper():
-                        continue
-
-                last = (row.get("Last Name", "")).strip()
-                first = (row.get("First Name", "")).strip()
-                middle = (row.get("Middle Name", "")).strip()
-                name = normalize_name_csv(last, first, middle)
-
-                dob = normalize_dob(row.get("Date Of Birth", ""))
-                if not dob:
-                    continue
-
-                eligible.append({"name": name, "dob": dob, "raw": row})
-        log_callback(f"CSV: {len(eligible)} candidate(s) eligible for e-slips after filtering.")
-        return eligible
-    except Exception as e:
-        log_callback(f"ERROR parsing May/June CSV: {e}")
-        return []
-
-
-def parse_csv_january(csv_path, log_callback):
-    eligible = []
-    name_col = "Full Name - name of candidate participating in CSEC January 2026 examination."
-    service_col = "Application Processing Type - sent via email"
-    dob_col = "Date of Birth"
-
-    try:
-        with open(csv_path, newline='', encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-
-            if not reader.fieldnames:
-                log_callback("ERROR: CSV file is empty or unreadable.")
-                return []
-
-            try:
-                name_header = next(h for h in reader.fieldnames if name_col in h)
-                service_header = next(h for h in reader.fieldnames if service_col in h)
-                dob_header = next(h for h in reader.fieldnames if dob_col in h)
-            except StopIteration:
-                log_callback("ERROR: CSEC January CSV is missing required columns.")
-                return []
-
-            row_count = 0
-            for row in reader:
-                row_count += 1
-                service = row.get(service_header, "").strip()
-
-                eligible_services = [
-                    "Generate E-candidate slip/Timetable only- $30",
-                    "Error recognition & E-candidate slip/Timetable- $50",
-                    "E-candidate slip/Timetable only- $30",
-                    "Error correction & E-candidate slip/Timetable- $50"
-                ]
-
-                if service not in eligible_services:
-                    continue
-
-                full_name_str = row.get(name_header, "").strip()
-                name = normalize_name_from_full(full_name_str)
-
-                dob = normalize_dob(row.get(dob_header, ""))
-                if not dob:
-                    continue
-
-                eligible.append({"name": name, "dob": dob, "raw": row})
-        log_callback(f"CSV: {len(eligible)} candidate(s) eligible for e-slips after filtering.")
-        return eligible
-    except Exception as e:
-        log_callback(f"ERROR parsing CSEC January CSV: {e}")
-        return []
-
-
-# ---------------- PDF TEXT HELPERS ----------------
-def extract_text_from_pdf(pdf_path, log, output_dir):
-    doc = pymupdf.open(pdf_path)
-    all_text = []
-    page_count = len(doc)
-    pages_to_process = page_count if not DEBUG else 1
-
-    full_ocr_text = ""
-
-    for i, page in enumerate(doc):
-        if DEBUG and i >= pages_to_process:
-            break
-
-        log(f"Processing page {i + 1}/{pages_to_process}")
-
-        txt = ""
-        if pytesseract and Image:
-            log(f"Forcing high-DPI OCR on page {i + 1}...")
-            pix = page.get_pixmap(dpi=350)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            config = '--psm 6'
-            txt = pytesseract.image_to_string(img, config=config)
-        else:
-            log("Tesseract/Pillow not found, falling back to simple text extraction.")
-            txt = page.get_text("text") or ""
-
-        cleaned_txt = clean_ocr_text(txt)
-        all_text.append(cleaned_txt)
-        full_ocr_text += f"--- PAGE {i + 1} ---\n{cleaned_txt}\n\n"
-
-    doc.close()
-    joined = "\n".join(all_text)
-    return joined
+import timeslips_core as core
+from timeslips_core import (
+    LOG_DETAIL, LOG_INFO, LOG_WARNING, LOG_ERROR, RunCancelled, SMTP_SETTINGS_PATH, SUBJECT_CODE_PATTERN,
+    normalize_dob, get_stored_timetable, update_stored_timetable, timetable_store_key, find_missing_centres,
+    lookup_centres, missing_slip_fonts, ProgressTracker, configure_ocr, reset_run_control, format_duration,
+)
 
+LOG_MAX_LINES = 5000  # lines kept in the log pane and its ring buffer; the run log file keeps everything
+LOG_LEVEL_CHOICES = {"Detail": LOG_DETAIL, "Info": LOG_INFO, "Warnings": LOG_WARNING, "Errors": LOG_ERROR}
+LIVE_COLUMNS = [("page", "Page", 90), ("id", "Candidate #", 100), ("name", "Name", 230), ("dob", "DOB", 80),
+                ("subjects", "Subjects", 60), ("status", "Status", 110)]
+LIVE_MAX_ROWS = 1000  # newest rows kept in the live results table; the counts above it cover every row
 
-def clean_ocr_text(s):
-    s = s.replace("\u2010", "-").replace("\u2011", "-").replace("\u2013", "-")
-    s = s.replace('|', '').replace(']', '')
-    s = s.replace(' O ', ' 0 ').replace(' G ', ' 6 ').replace(' B ', ' 8 ')
-    s = s.replace(' l ', ' 1 ')
-    s = re.sub(r'\s+', ' ', s)
-    return s
 
+# ---------------- STARTUP TIMING ----------------
+class StartupTimer:
+    """ Records the time spent in each launch phase, measured from the first import of this module """
 
-def normalize_name_csv(last, first, middle):
-    parts = []
-    last = last.strip().upper()
-    first = first.strip().upper()
-    middle = middle.strip().upper()
-    if last:
-        nm = last + ", " + first
-        if middle:
-            nm += " " + middle
-        parts.append(nm)
-    else:
-        nm = first
-        if middle:
-            nm += " " + middle
-        parts.append(nm)
-    return ", ".join(parts).title()
+    def __init__(self, t0):
+        self.t0 = t0
+        self.last = t0
+        self.marks = []
 
+    def mark(self, label):
+        now = time.perf_counter()
+        self.marks.append((label, now - self.last))
+        self.last = now
 
-def normalize_name_from_full(full_name_str):
-    parts = full_name_str.strip().upper().split()
-    if not parts:
-        return ""
+    def report(self):
+        lines = [f"  {label:<20} {secs * 1000:8.1f} ms" for label, secs in self.marks]
+        lines.append(f"  {'total to window':<20} {(self.last - self.t0) * 1000:8.1f} ms")
+        return "Startup timing (excludes interpreter/PyInstaller unpacking):\n" + "\n".join(lines)
 
-    last = parts[-1]
-    first = parts[0] if len(parts) > 1 else ""
-    middle = " ".join(parts[1:-1])
 
-    return normalize_name_csv(last, first, middle) 
+startup_timer = StartupTimer(_STARTUP_T0)
+startup_timer.mark("imports")
 
 
-def normalize_key_name(name_str):
-    if not isinstance(name_str, str):
-        return ""
-    return re.sub(r'[\s,]+', '', name_str).lower()
-
+# ---------------- MANUAL WINDOWS ----------------
+class VirtualGrid(ttk.Frame):
+    """
+    Editable table that only creates widgets for the rows on screen, so it stays fast at thousands
+    of rows. `columns` is a list of (key, title, width, kind), kind being "entry", "label" or a list
+    of choices (read-only combobox). `rows` are plain dicts that edits are written back to; rows
+    with "locked" set are shown read-only. Up/Down/Enter move between rows, Tab/Shift+Tab between
+    cells (wrapping to the next row), PgUp/PgDn scroll a page.
+    """
+
+    def __init__(self, container, columns, rows=None, **kwargs):
+        super().__init__(container, **kwargs)
+        self.columns = columns
+        self.rows = rows if rows is not None else []
+        self.first = 0  # index of the row shown in the first slot
+        self.current = None  # index of the row holding the focus
+        self.slots = []  # (vars, widgets) per visible line, reused for whichever rows are on screen
+        self._rendering = False
+        self._row_height = None
+        self.editable = [c for c, col in enumerate(columns) if col[3] != "label"]
+
+        self.body = ttk.Frame(self)
+        self.body.pack(side="left", fill="both", expand=True)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+        self.scrollbar.pack(side="right", fill="y")
+        for c, (key, title, width, kind) in enumerate(columns):
+            ttk.Label(self.body, text=title, font=("Helvetica", 10, "bold")).grid(row=0, column=c, padx=5, pady=5,
+                                                                                  sticky='w')
+        self._header_height = None
+        self.body.bind("<Configure>", self._on_resize)
+        self._bind_wheel(self.body)
+        self._add_slot()
+        self.refresh()
+
+    def _bind_wheel(self, widget):
+        widget.bind("<MouseWheel>", lambda e: self.scroll_to(self.first + (-3 if e.delta > 0 else 3)))
+        widget.bind("<Button-4>", lambda e: self.scroll_to(self.first - 3))
+        widget.bind("<Button-5>", lambda e: self.scroll_to(self.first + 3))
+
+    def _add_slot(self):
+        slot = len(self.slots)
+        row_vars, widgets = [], []
+        for c, (key, title, width, kind) in enumerate(self.columns):
+            var = tk.StringVar()
+            if kind == "label":
+                widget = ttk.Label(self.body, textvariable=var, width=width)
+            elif kind == "entry":
+                widget = ttk.Entry(self.body, textvariable=var, width=width)
+            else:
+                widget = ttk.Combobox(self.body, textvariable=var, values=kind, width=width, state="readonly")
+            widget.grid(row=slot + 1, column=c, padx=5, pady=2, sticky='w')
+            var.trace_add("write", lambda *a, s=slot, k=key, v=var: self._on_edit(s, k, v))
+            if kind != "label":
+                widget.bind("<FocusIn>", lambda e, s=slot: self._on_focus(s))
+                if kind == "entry":  # a combobox keeps Up/Down for its own list
+                    widget.bind("<Up>", lambda e, s=slot, c=c: self._move(s, c, -1))
+                    widget.bind("<Down>", lambda e, s=slot, c=c: self._move(s, c, 1))
+                widget.bind("<Return>", lambda e, s=slot, c=c: self._move(s, c, 1))
+                widget.bind("<Tab>", lambda e, s=slot, c=c: self._tab(s, c, 1))
+                widget.bind("<Shift-Tab>", lambda e, s=slot, c=c: self._tab(s, c, -1))
+                widget.bind("<ISO_Left_Tab>", lambda e, s=slot, c=c: self._tab(s, c, -1))
+                widget.bind("<Prior>", lambda e, s=slot, c=c: self._move(s, c, -len(self.slots)))
+                widget.bind("<Next>", lambda e, s=slot, c=c: self._move(s, c, len(self.slots)))
+            self._bind_wheel(widget)
+            row_vars.append(var)
+            widgets.append(widget)
+        self.slots.append((row_vars, widgets))
+
+    def _on_resize(self, event):
+        if self._row_height is None:
+            self._header_height = self.body.grid_slaves(row=0)[0].winfo_reqheight() + 10
+            self._row_height = max(w.winfo_reqheight() for w in self.slots[0][1]) + 4
+        capacity = max(1, (event.height - self._header_height) // self._row_height)
+        if capacity == len(self.slots):
+            return
+        while len(self.slots) < capacity:
+            self._add_slot()
+        while len(self.slots) > capacity:
+            for widget in self.slots.pop()[1]:
+                widget.destroy()
+        self.refresh()
 
-def normalize_dob(val):
-    val = str(val).strip()
-    if not val:
-        return None
+    def _on_edit(self, slot, key, var):
+        if self._rendering:
+            return
+        i = self.first + slot
+        if i < len(self.rows) and not self.rows[i].get("locked"):
+            self.rows[i][key] = var.get()
 
-    val = val.replace(".", "").strip()
+    def _on_focus(self, slot):
+        self.current = self.first + slot
 
-    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y"):
+    def refresh(self):
+        """ Redraw the visible rows from self.rows, e.g. after rows were added, edited or locked """
+        self.first = max(0, min(self.first, len(self.rows) - len(self.slots)))
+        self._rendering = True
         try:
-            dt = datetime.strptime(val, fmt)
-            return dt.strftime("%d/%m/%Y")
-        except ValueError:
-            continue
-
-    extended_formats = [
-        "%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y",
-        "%b %d %Y", "%B %d %Y", "%d-%b-%Y", "%d-%B-%Y",
-        "%b-%d-%Y", "%B-%d-%Y", "%d %b, %Y", "%d %B, %Y",
-    ]
-
-    for fmt in extended_formats:
-        try:
-            dt = datetime.strptime(val, fmt)
-            return dt.strftime("%d/%m/%Y")
-        except ValueError:
-            continue
-    try:
-        words = val.split()
-        if len(words) >= 3:
-            words[0] = words[0].capitalize()
-            val_capitalized = " ".join(words)
-            for fmt in extended_formats:
-                try:
-                    dt = datetime.strptime(val_capitalized, fmt)
-                    return dt.strftime("%d/%m/%Y")
-                except ValueError:
-                    continue
-    except Exception:
-        pass
-
-    m = DATE_PATTERN.search(val)
-    return m.group(1) if m else None
-
-
-# ---------------- CENTRE LIST PARSER ----------------
-def parse_centre_list(pdf_path, log, output_dir):
-    centres = {}
-    log("--- STARTING CENTRE LIST PARSING (IMPROVED LOGIC) ---")
-    try:
-        text = extract_text_from_pdf(pdf_path, log, output_dir)
-        code_pattern = re.compile(r"\b(\d{6})\b")
-        matches = list(code_pattern.finditer(text))
-
-        if not matches:
-            log("Warning: No 6-digit centre codes found in the centre list PDF.")
-            return {}
-
-        for i, current_match in enumerate(matches):
-            code = current_match.group(1)
-            start_pos = current_match.end()
-            end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-            name_raw = text[start_pos:end_pos]
-
-            name_cleaned = re.sub(r'\d', '', name_raw) 
-            name_cleaned = name_cleaned.replace("E-Testing", "").strip()
-            name_cleaned = name_cleaned.replace("Schoo!", "School").strip() 
-
-            common_endings = ["Secondary School", "Secondary", "College", "Campus", "High School", "School"]
-
-            best_name = name_cleaned
-            for ending in common_endings:
-                if ending in name_cleaned:
-                    end_index = name_cleaned.find(ending) + len(ending)
-                    potential_name = name_cleaned[:end_index].strip()
-                    best_name = potential_name
-                    break 
-
-            best_name = re.sub(r'\s+', ' ', best_name).strip()
-
-            if code and best_name:
-                centres[code] = best_name
-
-        if not centres:
-            log("Warning: No centres parsed from centre list PDF with improved logic.")
+            for slot, (row_vars, widgets) in enumerate(self.slots):
+                i = self.first + slot
+                row = self.rows[i] if i < len(self.rows) else None
+                for (key, title, width, kind), var, widget in zip(self.columns, row_vars, widgets):
+                    if row is None:
+                        widget.grid_remove()
+                        continue
+                    widget.grid()
+                    var.set(row.get(key, ""))
+                    if kind != "label":
+                        widget.state(["disabled"] if row.get("locked") else ["!disabled"])
+        finally:
+            self._rendering = False
+        if self.rows:
+            self.scrollbar.set(self.first / len(self.rows), min(1.0, (self.first + len(self.slots)) / len(self.rows)))
         else:
-            log(f"Centres parsed (improved logic): {len(centres)}")
-        return centres
-
-    except Exception as e:
-        log(f"ERROR parsing centre list: {e}")
-        return {}
-
-
-# ---------------- CANDIDATE LIST PARSER ----------------
-def parse_candidate_list(pdf_path, log, output_dir):
-    candidates = []
-    log("--- STARTING CANDIDATE LIST PARSING (Smarter Logic V3) ---")
-
-    try:
-        text = extract_text_from_pdf(pdf_path, log, output_dir)
-
-        matches = list(re.finditer(CANDIDATE_NUM_PATTERN, text))
-
-        if not matches:
-            raise ValueError("OCR did not find any 10-digit candidate numbers in the PDF text.")
-
-        for i, current_match in enumerate(matches):
-            start_pos = current_match.start()
-            end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(text)
-
-            block = text[start_pos:end_pos]
-            cleaned_block = re.sub(r'\s+', ' ', block).strip()
-
-            id_match = CANDIDATE_NUM_PATTERN.search(cleaned_block)
-            dob_match = DATE_PATTERN.search(cleaned_block)
-
-            if not (id_match and dob_match):
-                log(f"SKIPPING malformed block: {cleaned_block[:100]}...")
-                continue
-
-            candidate_num_full = id_match.group(1)
-            dob = dob_match.group(1)
-
-            name_raw = cleaned_block[id_match.end():dob_match.start()].strip()
-            name_parts = [part.strip() for part in name_raw.split(',') if part.strip()]
-            if name_parts:
-                last_name = name_parts[0]
-                first_middle = ' '.join(name_parts[1:])
-                name = f"{last_name}, {first_middle}".title()
-            else:
-                name = name_raw.title()
-
-            if not name or not re.search(r'[a-zA-Z]', name):
-                log(f"SKIPPING block for Cand# {candidate_num_full}: Invalid name parsed ('{name_raw}').")
-                continue
-
-            remaining_text = cleaned_block[dob_match.end():].strip()
-
-            gender_match = re.search(r'\b([MF])\b', remaining_text)
-            if not gender_match:
-                log(f"SKIPPING block for Cand# {candidate_num_full}: Could not find Gender after DOB.")
-                continue
-
-            gender = "Male" if gender_match.group(1) == "M" else "Female"
-
-            subjects_raw = remaining_text[gender_match.end():].strip()
-
-            count_match = re.search(r'\s(\d)$', subjects_raw)
-            if count_match:
-                subjects_raw = subjects_raw[:count_match.start()].strip()
-
-            subjects_list = []
-            for code_match in SUBJECT_CODE_PATTERN.finditer(subjects_raw.upper()):
-                code, type = code_match.groups()
-                if code in SUBJECT_CODE_MAP:
-                    subjects_list.append({"code": code, "type": type or 'N/A'})
-
-            candidates.append({
-                "id": candidate_num_full, "centre_num": candidate_num_full[:6], "seq_num": candidate_num_full[6:],
-                "name": name, "dob": dob, "gender": gender, "subjects": subjects_list
-            })
-
-        log(f"Found {len(candidates)} candidates successfully parsed.")
-
-        if not candidates:
-            raise ValueError("OCR parsing failed to extract any valid candidate data.")
-
-        return candidates, [], text
-
-    except Exception as e:
-        log(f"ERROR parsing candidate list: {e}")
-        return [], [], ""
-
-
-# ---------------- MANUAL WINDOWS ----------------
-class ScrollableFrame(ttk.Frame):
-    def __init__(self, container, *args, **kwargs):
-        super().__init__(container, *args, **kwargs)
-        canvas = tk.Canvas(self)
-        scrollbar = ttk.Scrollbar(self, orient="vertical", command=canvas.yview)
-        self.scrollable_frame = ttk.Frame(canvas)
-
-        self.scrollable_frame.bind(
-            "<Configure>",
-            lambda e: canvas.configure(
-                scrollregion=canvas.bbox("all")
-            )
-        )
-
-        canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+            self.scrollbar.set(0, 1)
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.rows) - len(self.slots)))
+        if first != self.first:
+            self.first = first
+            self.refresh()
+        return "break"
+
+    def _on_scrollbar(self, action, amount, unit=None):
+        if action == "moveto":
+            self.scroll_to(int(float(amount) * len(self.rows)))
+        else:
+            self.scroll_to(self.first + int(amount) * (len(self.slots) if unit == "pages" else 1))
 
-        canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+    def focus_row(self, i, column=None):
+        """ Scroll row i into view and put the cursor in its column (the first editable one by default) """
+        if not self.rows:
+            return
+        i = max(0, min(i, len(self.rows) - 1))
+        if i < self.first:
+            self.scroll_to(i)
+        elif i >= self.first + len(self.slots):
+            self.scroll_to(i - len(self.slots) + 1)
+        widget = self.slots[i - self.first][1][self.editable[0] if column is None else column]
+        widget.focus_set()
+        if isinstance(widget, ttk.Entry) and not isinstance(widget, ttk.Combobox):
+            widget.icursor("end")
+        self.current = i
+
+    def _move(self, slot, column, delta):
+        self.focus_row(self.first + slot + delta, column)
+        return "break"
+
+    def _tab(self, slot, column, step):
+        pos = self.editable.index(column) + step
+        delta = 0
+        if pos >= len(self.editable):
+            pos, delta = 0, 1
+        elif pos < 0:
+            pos, delta = len(self.editable) - 1, -1
+        return self._move(slot, self.editable[pos], delta)
 
 
 class BaseManualEntry(tk.Toplevel):
-    def __init__(self, parent, title, instructions):
+    """
+    With on_submit set the dialog is not modal: 'Apply' hands the completed rows to
+    on_submit and keeps the dialog open for the rest, and 'Submit' applies and closes.
+    """
+
+    def __init__(self, parent, title, instructions, on_submit=None):
         super().__init__(parent)
         self.title(title)
         self.geometry("950x600") 
         self.transient(parent)
-        self.grab_set()
+        self.on_submit = on_submit
+        if on_submit is None:
+            self.grab_set()
         self.entries = []
 
         self.main_frame = ttk.Frame(self, padding=10)
@@ -550,11 +230,34 @@ class BaseManualEntry(tk.Toplevel):
         btns = ttk.Frame(self)
         btns.pack(pady=8)
         ttk.Button(btns, text="Submit", command=self.submit).pack(side="left", padx=6)
+        if on_submit is not None:
+            ttk.Button(btns, text="Apply", command=self.apply).pack(side="left", padx=(0, 6))
         ttk.Button(btns, text="Cancel", command=self.destroy).pack(side="left")
 
-    def submit(self):
+    def collect(self, partial=False):
+        """ Validate the rows and return the entries, or None to keep the dialog open """
         raise NotImplementedError
 
+    def mark_applied(self, entries):
+        """ Lock the rows behind entries so they are not handed over twice """
+        raise NotImplementedError
+
+    def submit(self):
+        entries = self.collect(partial=self.on_submit is not None)
+        if entries is None:
+            return
+        self.entries = entries
+        if self.on_submit is not None and entries:
+            self.on_submit(entries)
+        self.destroy()
+
+    def apply(self):
+        entries = self.collect(partial=True)
+        if not entries:
+            return
+        self.on_submit(entries)
+        self.mark_applied(entries)
+
     def show(self):
         self.deiconify()
         self.wait_window()
@@ -562,12 +265,16 @@ class BaseManualEntry(tk.Toplevel):
 
 
 class ManualCandidateEntry(BaseManualEntry):
-    def __init__(self, parent, missed_blocks, pdf_text):
+    COLUMNS = [("id", "Candidate ID", 15, "entry"), ("name", "Full Name (Surname, First)", 30, "entry"),
+               ("dob", "DOB (dd/mm/yyyy)", 15, "entry"), ("gender", "Gender (M/F)", 5, "entry"),
+               ("subjects", "Subjects (e.g., MATHG-A POBG-R)", 40, "entry")]
+
+    def __init__(self, parent, missed_blocks, pdf_text, on_submit=None):
         super().__init__(parent, "Manual Candidate Entry",
-                         "Review unparsable lines. Add or correct candidate info. Use 'Find All Details' to auto-fill.")
+                         "Review unparsable lines. Add or correct candidate info. Use 'Find All Details' to auto-fill.",
+                         on_submit)
 
         self.pdf_text = pdf_text 
-        self.rows = []
 
         if missed_blocks:
             ref_frame = ttk.LabelFrame(self.main_frame, text="Unparsable Lines", padding=5)
@@ -577,15 +284,8 @@ class ManualCandidateEntry(BaseManualEntry):
             ref_text.insert("1.0", "\n---\n".join(missed_blocks))
             ref_text.config(state="disabled")
 
-        self.scrollable_frame = ScrollableFrame(self.main_frame)
-        self.scrollable_frame.pack(fill="both", expand=True, padx=10)
-        self.container = self.scrollable_frame.scrollable_frame
-
-        self.headers = ["Candidate ID", "Full Name (Surname, First)", "DOB (dd/mm/yyyy)", "Gender (M/F)",
-                        "Subjects (e.g., MATHG-A POBG-R)"] 
-        for i, header in enumerate(self.headers):
-            ttk.Label(self.container, text=header, font=("Helvetica", 10, "bold")).grid(row=0, column=i, padx=5, pady=5,
-                                                                                                sticky='w')
+        self.table = VirtualGrid(self.main_frame, self.COLUMNS)
+        self.table.pack(fill="both", expand=True, padx=10)
 
         bottom_btn_frame = ttk.Frame(self)
         bottom_btn_frame.pack(pady=5, padx=10, fill='x')
@@ -598,50 +298,37 @@ class ManualCandidateEntry(BaseManualEntry):
 
         self._add_row()
 
-    def _add_row(self, data=None):
+    @staticmethod
+    def _row(data=None):
         data = data or {}
-        row_num = len(self.rows) + 1
-
-        row_vars = {
-            "id": tk.StringVar(value=data.get("id", "")),
-            "name": tk.StringVar(value=data.get("name", "")),
-            "dob": tk.StringVar(value=data.get("dob", "")),
-            "gender": tk.StringVar(value=data.get("gender", "")),
-            "subjects": tk.StringVar(value=data.get("subjects", ""))
-        }
-
-        ttk.Entry(self.container, textvariable=row_vars["id"], width=15).grid(row=row_num, column=0, padx=5, pady=2,
-                                                                                          sticky='w')
-        ttk.Entry(self.container, textvariable=row_vars["name"], width=30).grid(row=row_num, column=1, padx=5, pady=2,
-                                                                                                sticky='w')
-        ttk.Entry(self.container, textvariable=row_vars["dob"], width=15).grid(row=row_num, column=2, padx=5, pady=2,
-                                                                                               sticky='w')
-        ttk.Entry(self.container, textvariable=row_vars["gender"], width=5).grid(row=row_num, column=3, padx=5, pady=2,
-                                                                                                 sticky='w')
-        ttk.Entry(self.container, textvariable=row_vars["subjects"], width=40).grid(row=row_num, column=4, padx=5,
-                                                                                                    pady=2, sticky='w')
-
-        self.rows.append(row_vars)
+        return {key: data.get(key, "") for key in ("id", "name", "dob", "gender", "subjects", "email")}
+
+    def _add_row(self, data=None):
+        self.table.rows.append(self._row(data))
+        self.table.refresh()
+        if data is None:
+            self.table.focus_row(len(self.table.rows) - 1)
+
+    def _open_rows(self):
+        return [row for row in self.table.rows if not row.get("locked")]
 
     def _find_all_details(self):
         found_count = 0
         not_found_ids = []
 
-        for row_vars in self.rows:
-            candidate_id = row_vars["id"].get().strip()
+        # index every block once instead of rescanning the list text for each row
+        matches = list(re.finditer(core.CANDIDATE_NUM_PATTERN, self.pdf_text))
+        blocks = {}
+        for i, current_match in enumerate(matches):
+            end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(self.pdf_text)
+            blocks.setdefault(current_match.group(1), self.pdf_text[current_match.start():end_pos])
+
+        for row in self._open_rows():
+            candidate_id = row["id"].strip()
             if not re.match(r'^\d{10}$', candidate_id):
                 continue 
 
-            matches = list(re.finditer(CANDIDATE_NUM_PATTERN, self.pdf_text))
-            found_block = None
-
-            for i, current_match in enumerate(matches):
-                if current_match.group(1) == candidate_id:
-                    start_pos = current_match.start()
-                    end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(self.pdf_text)
-                    found_block = self.pdf_text[start_pos:end_pos]
-                    break
-
+            found_block = blocks.get(candidate_id)
             if not found_block:
                 not_found_ids.append(candidate_id)
                 continue
@@ -662,7 +349,7 @@ class ManualCandidateEntry(BaseManualEntry):
             subjects_list = []
             for code_match in SUBJECT_CODE_PATTERN.finditer(subjects_raw.upper()):
                 code, type = code_match.groups()
-                if code in SUBJECT_CODE_MAP:
+                if code in core.SUBJECT_CODE_MAP:
                     subject_str = code
                     if type:
                         subject_str += f"-{type}"
@@ -674,10 +361,11 @@ class ManualCandidateEntry(BaseManualEntry):
                 not_found_ids.append(candidate_id)
                 continue
 
-            row_vars["gender"].set(gender)
-            row_vars["subjects"].set(subjects_final_str)
+            row["gender"] = gender
+            row["subjects"] = subjects_final_str
             found_count += 1
 
+        self.table.refresh()
         summary_message = f"Found and populated details for {found_count} candidate(s).\n\n"
         if not_found_ids:
             summary_message += f"Could not find or fully parse details for the following IDs:\n" + "\n".join(
@@ -685,345 +373,163 @@ class ManualCandidateEntry(BaseManualEntry):
 
         messagebox.showinfo("Find Complete", summary_message, parent=self)
 
-    def submit(self):
+    def collect(self, partial=False):
+        # partial: rows whose ID is still blank or the ?????????? placeholder are left for later
         out = []
-        has_blank_id_with_data = False
-
-        for row_vars in self.rows:
-            id_val = row_vars["id"].get().strip()
-            name_val = row_vars["name"].get().strip()
-            dob_val = row_vars["dob"].get().strip()
-            if not id_val and (name_val or dob_val):
-                has_blank_id_with_data = True
-                break
+        rows = self._open_rows()
+        has_blank_id_with_data = any(not row["id"].strip() and (row["name"].strip() or row["dob"].strip())
+                                     for row in rows)
 
-        if has_blank_id_with_data:
+        if has_blank_id_with_data and not partial:
             proceed = messagebox.askyesno(
                 "Blank Candidate ID",
-                "Rows with blank ID will be ignored. Continue?"
+                "Rows with blank ID will be ignored. Continue?",
+                parent=self
             )
             if not proceed:
-                return
+                return None
 
-        for row_vars in self.rows:
-            id_val = row_vars["id"].get().strip()
-            name_val = row_vars["name"].get().strip()
-            dob_val = row_vars["dob"].get().strip()
-            gender_val = row_vars["gender"].get().strip().upper()
-            subjects_str = row_vars["subjects"].get().strip().upper()
+        self._collected_rows = []
+        for n, row in enumerate(rows):
+            id_val = row["id"].strip()
+            name_val = row["name"].strip()
+            dob_val = row["dob"].strip()
+            gender_val = row["gender"].strip().upper()
+            subjects_str = row["subjects"].strip().upper()
 
-            if not id_val:
+            if not id_val or (partial and set(id_val) == {"?"}):
                 continue
 
+            error = None
             if not re.match(r'^\d{10}$', id_val):
-                messagebox.showerror("Validation Error", f"Invalid Candidate ID: '{id_val}'. Must be 10 digits.")
-                return
-
-            normalized_dob = normalize_dob(dob_val)
-            if not normalized_dob:
-                messagebox.showerror("Validation Error", f"Invalid DOB: '{dob_val}'. Use dd/mm/yyyy format.")
-                return
-
-            if gender_val and gender_val not in ["M", "F"]:
-                messagebox.showerror("Validation Error", f"Invalid Gender: '{gender_val}'. Use M or F.")
-                return
-
-            gender_full = "Male" if gender_val == "M" else "Female" if gender_val == "F" else "N/A"
+                error = (f"Invalid Candidate ID: '{id_val}'. Must be 10 digits.", 0)
+            elif not normalize_dob(dob_val):
+                error = (f"Invalid DOB: '{dob_val}'. Use dd/mm/yyyy format.", 2)
+            elif gender_val and gender_val not in ["M", "F"]:
+                error = (f"Invalid Gender: '{gender_val}'. Use M or F.", 3)
+            if error:
+                messagebox.showerror("Validation Error", error[0], parent=self)
+                self.table.focus_row(self.table.rows.index(row), error[1])
+                return None
+
+            gender_full = core.GENDER_WORDS.get(gender_val, "N/A")
 
             subjects_list = []
             for s in subjects_str.split():
                 match = SUBJECT_CODE_PATTERN.match(s)
                 if match:
                     code, type = match.groups()
-                    subjects_list.append({"code": code, "type": type or 'N/A'})
+                    subjects_list.append(core.make_subject(code, type))
 
-            out.append({
-                "id": id_val, "centre_num": id_val[:6], "seq_num": id_val[6:],
-                "name": name_val, "dob": normalized_dob, "gender": gender_full,
-                "subjects": subjects_list
-            })
+            out.append(core.Candidate(id_val, name_val, normalize_dob(dob_val), gender_full, subjects_list,
+                                      row["email"]))
+            self._collected_rows.append(row)
 
-        self.entries = out
-        self.destroy()
+        return out
+
+    def mark_applied(self, entries):
+        for row in self._collected_rows:
+            row["locked"] = True
+        self.table.refresh()
 
 
 class ManualCSVEntry(ManualCandidateEntry):
-    def __init__(self, parent, unmatched_csv, pdf_text):
-        super().__init__(parent, [], pdf_text)
+    def __init__(self, parent, unmatched_csv, pdf_text, on_submit=None):
+        super().__init__(parent, [], pdf_text, on_submit)
         self.title("Manual CSV Candidate Entry")
         self.instructions_label.config(
             text="Enter Candidate ID for unmatched CSV candidates. Use 'Find All Details' to auto-populate.")
 
-        for widget in self.container.winfo_children():
-            if int(widget.grid_info()["row"]) > 0:
-                widget.destroy()
-        self.rows = []
-
-        for i, header in enumerate(self.headers):
-            ttk.Label(self.container, text=header, font=("Helvetica", 10, "bold")).grid(row=0, column=i, padx=5, pady=5,
-                                                                                                sticky='w')
-
-        for c in unmatched_csv:
-            data = {"id": "??????????", "name": c['name'], "dob": c['dob']}
-            self._add_row(data)
+        self.table.rows[:] = [self._row({"id": "??????????", "name": c.name, "dob": c.dob, "email": c.email})
+                              for c in unmatched_csv]
+        self.table.refresh()
 
 
 class ManualCentreEntry(BaseManualEntry):
-    def __init__(self, parent, missing_centre_codes):
-        super().__init__(parent, "Manual Centre Entry",
-                         "Enter the name for each missing centre code.")
-        self.centre_entries = {}
+    COLUMNS = [("code", "Centre Code", 12, "label"), ("name", "Centre Name", 50, "entry")]
 
-        scrollable_frame = ScrollableFrame(self.main_frame)
-        scrollable_frame.pack(fill="both", expand=True, padx=10)
-        container = scrollable_frame.scrollable_frame
-
-        ttk.Label(container, text="Centre Code", font=("Helvetica", 10, "bold")).grid(row=0, column=0, padx=5, pady=5,
-                                                                                              sticky='w')
-        ttk.Label(container, text="Centre Name", font=("Helvetica", 10, "bold")).grid(row=0, column=1, padx=5, pady=5,
-                                                                                              sticky='w')
-
-        for i, code in enumerate(missing_centre_codes, 1):
-            ttk.Label(container, text=code).grid(row=i, column=0, padx=5, pady=2, sticky='w')
-            name_var = tk.StringVar()
-            name_entry = ttk.Entry(container, textvariable=name_var, width=50)
-            name_entry.grid(row=i, column=1, padx=5, pady=2, sticky='w')
-            self.centre_entries[code] = name_var
+    def __init__(self, parent, missing_centre_codes, on_submit=None):
+        super().__init__(parent, "Manual Centre Entry",
+                         "Enter the name for each missing centre code.", on_submit)
+        self.table = VirtualGrid(self.main_frame, self.COLUMNS,
+                                 [{"code": code, "name": ""} for code in missing_centre_codes])
+        self.table.pack(fill="both", expand=True, padx=10)
 
-    def submit(self):
+    def collect(self, partial=False):
         centres = {}
-        for code, name_var in self.centre_entries.items():
-            name = name_var.get().strip()
-            if code and name:
-                centres[code] = name
-        self.entries = centres
-        self.destroy()
-
-
-class ManualTimetableEntry(BaseManualEntry):
-    def __init__(self, parent, unique_subjects, exam_month, exam_year):
-        super().__init__(parent, "Manual Timetable Entry",
-                         "Enter timetable information. Use 'Add Paper' if needed.")
-        self.subject_rows = {}
-
-        scrollable_frame = ScrollableFrame(self.main_frame)
-        scrollable_frame.pack(fill="both", expand=True, padx=10)
-        container = scrollable_frame.scrollable_frame
-
-        self.period_options = ["AM", "PM", "Oral Examination"]
-
-        for s_code in sorted(unique_subjects):
-            s_name = SUBJECT_CODE_MAP.get(s_code, s_code)
-
-            subject_frame = ttk.LabelFrame(container, text=f"{s_code} - {s_name}", padding=10)
-            subject_frame.pack(fill="x", pady=5, padx=5)
-
-            headers = ["Paper", "Date", "Period"]
-            for i, header in enumerate(headers):
-                ttk.Label(subject_frame, text=header, font=("Helvetica", 10, "bold")).grid(row=0, column=i, padx=5,
-                                                                                                   pady=5)
-
-            self.subject_rows[s_code] = []
-
-            default_papers = ["1", "2", "3/2"]
-            for paper_placeholder in default_papers:
-                self._add_paper_row(s_code, subject_frame, paper_placeholder)
-
-            add_button = ttk.Button(subject_frame, text=f"Add Paper for {s_code}",
-                                    command=lambda code=s_code, frame=subject_frame: self._add_paper_row(code, frame))
-            add_button.grid(row=len(self.subject_rows[s_code]) + 1, column=0, columnspan=3, pady=5)
-
-    def _add_paper_row(self, subject_code, container, paper_num=None):
-        row_index = len(self.subject_rows[subject_code]) + 1
-
-        paper_var = tk.StringVar(value=str(paper_num) if paper_num else str(row_index))
-        date_var = tk.StringVar()
-        period_var = tk.StringVar(value="AM")
-
-        ttk.Entry(container, textvariable=paper_var, width=10).grid(row=row_index, column=0, padx=5, pady=2)
-        ttk.Entry(container, textvariable=date_var, width=20).grid(row=row_index, column=1, padx=5, pady=2)
-        ttk.Combobox(container, textvariable=period_var, values=self.period_options, width=20, state="readonly").grid(
-            row=row_index, column=2, padx=5, pady=2)
-
-        self.subject_rows[subject_code].append((paper_var, date_var, period_var))
-
-    def submit(self):
-        timetable = {}
-        for subject_code, rows in self.subject_rows.items():
-            timetable[subject_code] = []
-            for paper_var, date_var, period_var in rows:
-                date = date_var.get().strip()
-                if date: 
-                    timetable[subject_code].append({
-                        "paper": paper_var.get().strip(),
-                        "date": date,
-                        "session": period_var.get().strip()
-                    })
-        self.entries = timetable
-        self.destroy()
-
-
-# --- PDF GENERATION CLASS ---
-class PDF(FPDF):
-    def __init__(self):
-        super().__init__()
-        # FIX: Use resource path for background image
-        self.background_path = resource_path("background.png")
-
-    def add_page(self, orientation='', format='', same=False):
-        super().add_page(orientation, format, same)
-        if self.background_path and os.path.exists(self.background_path):
-            self.image(self.background_path, x=0, y=0, w=self.w, h=self.h)
-        else:
-            try:
-                self.set_font('Roboto', 'I', 8)
-                self.cell(0, 5, "background.png not found", 0, align='C')
-            except RuntimeError:
-                self.set_font('Helvetica', 'I', 8)
-                self.cell(0, 5, "background.png not found", 0, align='C')
-
-    def header(self):
-        try:
-            self.set_font('Roboto', 'B', 14)
-        except RuntimeError:
-            self.set_font('Helvetica', 'B', 14)
-        self.set_y(50)
-        self.cell(0, 10, 'CXC Examination E-Slip', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
-        self.ln(5)
-
-    def footer(self):
-        self.set_y(-15)
-
-
-def create_pdf_slip(candidate, centre_name, timetable, output_dir, exam_month, exam_year, exam_type):
-    try:
-        name_parts = candidate['name'].split(',', 1)
-        surname = name_parts[0].strip() if name_parts else "Unknown"
-        other_names = name_parts[1].strip() if len(name_parts) > 1 else ""
-
-        # --- NEW LOGIC: Rearrange to "First/Other Names Surname" ---
-        if other_names:
-            display_name = f"{other_names} {surname}"
-        else:
-            display_name = surname
+        for row in self.table.rows:
+            name = row["name"].strip()
+            if row["code"] and name and not row.get("locked"):
+                centres[row["code"]] = name
+        return centres
 
-        sanitized_surname = re.sub(r'[\\/*?:"<>|]', "", surname)
-        sanitized_other_names = re.sub(r'[\\/*?:"<>|]', "", other_names)
+    def mark_applied(self, entries):
+        for row in self.table.rows:
+            if row["code"] in entries:
+                row["locked"] = True
+        self.table.refresh()
 
-        filename = f"{exam_type} E-Slip {sanitized_surname} {sanitized_other_names}.pdf"
-        filepath = os.path.join(output_dir, filename)
 
-        counter = 1
-        base_filepath = filepath
-        while os.path.exists(filepath):
-            name, ext = os.path.splitext(base_filepath)
-            filepath = f"{name} ({counter}){ext}"
-            counter += 1
+class ManualTimetableEntry(BaseManualEntry):
+    PERIOD_OPTIONS = ["AM", "PM", "Oral Examination"]
 
-        pdf = PDF()
+    def __init__(self, parent, unique_subjects, exam_month, exam_year, on_submit=None):
+        super().__init__(parent, "Manual Timetable Entry",
+                         "Enter timetable information. Use 'Add Paper' if needed.", on_submit)
+        columns = [("subject", "Subject", 34, "label"), ("paper", "Paper", 10, "entry"),
+                   ("date", "Date", 20, "entry"), ("session", "Period", 18, self.PERIOD_OPTIONS)]
+        self.subject_codes = sorted(unique_subjects)
+        rows = []
+        for s_code in self.subject_codes:
+            for paper_placeholder in ["1", "2", "3/2"]:
+                rows.append(self._paper_row(s_code, paper_placeholder))
+        self.table = VirtualGrid(self.main_frame, columns, rows)
+        self.table.pack(fill="both", expand=True, padx=10)
 
-        try:
-            # FIX: Use resource path for fonts
-            pdf.add_font('Roboto', '', resource_path('Roboto-Regular.ttf'))
-            pdf.add_font('Roboto', 'B', resource_path('Roboto-Bold.ttf'))
-            pdf.add_font('Roboto', 'I', resource_path('Roboto-Italic.ttf'))
-        except Exception as e:
-            if "FPDFException" in str(e) and "TTF file" in str(e):
-                messagebox.showerror("Font File Missing",
-                                     "Required Roboto font files (.ttf) not found.")
-                return False
-
-        pdf.add_page()
-        pdf.set_right_margin(15)
-        pdf.set_left_margin(15)
-        pdf.set_auto_page_break(True, 30)
-
-        pdf.set_font('Roboto', '', 11)
-        greeting_text = (
-            "Greetings\n"
-            f"Thank you for using the Exam Concierge Service for the {exam_month} {exam_year} CXC examinations.\n"
-            "The information requested is as follows:"
-        )
-        pdf.multi_cell(0, 5, greeting_text)
-        pdf.ln(5)
-
-        pdf.set_font('Roboto', 'B', 12)
-        pdf.cell(0, 10, 'Candidate Credentials', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
-        pdf.set_font('Roboto', '', 10)
-        label_col_width = 55
-        value_col_width = 125
-
-        credentials = {
-            "Candidate Full Name": display_name,  # Updated to use the rearranged name
-            "Candidate DOB": candidate['dob'], "Candidate Gender": candidate['gender'],
-            "Candidate Number": candidate['id'], "Centre Number": candidate['centre_num'],
-            "Centre Location": centre_name or 'N/A' 
-        }
-        pdf.set_fill_color(220, 220, 220)
-        for label, value in credentials.items():
-            pdf.set_font('Roboto', 'B', 10)
-            pdf.cell(label_col_width, 8, label, border=1, fill=True)
-            pdf.set_font('Roboto', '', 10)
-            pdf.cell(value_col_width, 8, f" {value}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.ln(5)
-
-        examination_details = f"{exam_type} {exam_month} {exam_year}"
-        pdf.set_font('Roboto', 'B', 10)
-        pdf.cell(label_col_width, 8, "Examination", border=1, fill=True)
-        pdf.set_font('Roboto', '', 10)
-        pdf.cell(0, 8, f" {examination_details}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-        pdf.ln(2)
-
-        pdf.set_font('Roboto', 'B', 10)
-        pdf.set_fill_color(220, 220, 220)
-        pdf.cell(0, 8, "Examination Timetable", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C', fill=True)
-
-        pdf.set_font('Roboto', 'B', 10)
-        headers = ["Subject", "Candidate Type", "Paper", "Date", "Session"]
-        total_width = pdf.w - pdf.l_margin - pdf.r_margin
-        col_widths = [total_width * 0.35, total_width * 0.15, total_width * 0.15, total_width * 0.20,
-                      total_width * 0.15]
-
-        for i, header in enumerate(headers):
-            pdf.cell(col_widths[i], 8, header, border=1, align='C', fill=True)
-        pdf.ln()
-
-        pdf.set_font('Roboto', '', 9)
-        if not candidate.get('subjects'):
-            pdf.cell(sum(col_widths), 10, "No subjects found for this candidate.", 1, new_x=XPos.LMARGIN,
-                     new_y=YPos.NEXT, align='C')
-        else:
-            for subject in candidate['subjects']:
-                code = subject['code']
-                cand_type = subject['type']
-                subject_name = SUBJECT_CODE_MAP.get(code, code)
-                papers_info = timetable.get(code, [])
-
-                papers_to_show = papers_info
-                if cand_type == 'R':
-                    papers_to_show = [p for p in papers_info if p.get('paper') in ['1', '2']]
-
-                for paper_info in papers_to_show:
-                    pdf.cell(col_widths[0], 8, f" {subject_name}", 1)
-                    pdf.cell(col_widths[1], 8, cand_type, 1, align='C')
-                    pdf.cell(col_widths[2], 8, paper_info.get('paper', ''), 1, align='C')
-                    pdf.cell(col_widths[3], 8, paper_info.get('date', ''), 1, align='C')
-                    pdf.cell(col_widths[4], 8, paper_info.get('session', ''), 1, new_x=XPos.LMARGIN, new_y=YPos.NEXT,
-                             align='C')
-
-        bottom_text = (
-            "Starting times for all centers within a territory are 09:00 hr. for the morning (9AM) session and 13:00 hr. for the afternoon (1PM) session. The Local Registrar reserves the right to arrange candidates for the administering of examinations."
-        )
-        pdf.ln(5)
-        pdf.set_font('Roboto', 'I', 9)
-        pdf.multi_cell(0, 5, bottom_text, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
-
-        pdf.output(filepath)
-        return filepath
-
-    except Exception as e:
-        print(f"Failed to create PDF for {candidate.get('name', 'Unknown')}: {e}")
-        return False
+        bottom_btn_frame = ttk.Frame(self)
+        bottom_btn_frame.pack(pady=5, padx=10, fill='x')
+        ttk.Button(bottom_btn_frame, text="Add Paper for Selected Subject", command=self._add_paper_row).pack(
+            side=tk.RIGHT)
+
+    @staticmethod
+    def _paper_row(subject_code, paper_num):
+        name = core.SUBJECT_CODE_MAP.get(subject_code, subject_code)
+        return {"code": subject_code, "subject": f"{subject_code} - {name}", "paper": str(paper_num), "date": "",
+                "session": "AM"}
+
+    def _add_paper_row(self):
+        rows = self.table.rows
+        current = self.table.current
+        if current is None or current >= len(rows) or rows[current].get("locked"):
+            messagebox.showinfo("Add Paper", "Click into a paper row of the subject first.", parent=self)
+            return
+        code = rows[current]["code"]
+        last = max(i for i, row in enumerate(rows) if row["code"] == code)
+        count = sum(1 for row in rows if row["code"] == code)
+        rows.insert(last + 1, self._paper_row(code, count + 1))
+        self.table.refresh()
+        self.table.focus_row(last + 1, 2)
+
+    def collect(self, partial=False):
+        timetable = {code: [] for code in self.subject_codes}
+        for row in self.table.rows:
+            date = row["date"].strip()
+            if date and row["code"] in timetable: 
+                timetable[row["code"]].append({
+                    "paper": row["paper"].strip(),
+                    "date": date,
+                    "session": row["session"].strip()
+                })
+        if partial:
+            timetable = {code: papers for code, papers in timetable.items() if papers}
+        return timetable
+
+    def mark_applied(self, entries):
+        for row in self.table.rows:
+            if row["code"] in entries:
+                row["locked"] = True
+        self.subject_codes = [code for code in self.subject_codes if code not in entries]
+        self.table.refresh()
 
 
 # ---------------- APP ----------------
@@ -1031,10 +537,17 @@ class ESlipGeneratorApp:
     def __init__(self, root):
         self.root = root
         self.root.title("CXC E-Slip Generator V2")
-        self.root.geometry("800x700")
+        self.root.geometry("800x860")
 
         self.log_queue = queue.Queue()
-        self.file_paths = {"candidates": "", "centres": "", "csv": ""}
+        self.log_buffer = deque(maxlen=LOG_MAX_LINES)
+        self.log_level = tk.StringVar(value="Info")
+        self.run_log = None
+        self.progress_queue = queue.Queue()
+        self.results_queue = queue.Queue()  # ("start", LiveMatchTally) and ("page", path, page, found, skipped)
+        self.live_tally = None
+        self.progress_tracker = ProgressTracker()
+        self.file_paths = {"candidates": [], "centres": "", "csv": []}  # candidate lists and CSVs: one or more
         self.centre_file_widgets = [] 
         self.output_dir = ""
         self.exam_type = tk.StringVar(value="CSEC")
@@ -1043,6 +556,15 @@ class ESlipGeneratorApp:
         self.exam_month = tk.StringVar(value="May - June") 
         self.exam_year = tk.StringVar(value=str(datetime.now().year))
         self.centre_list_available = tk.BooleanVar(value=True)
+        self.use_saved_roster = tk.BooleanVar(value=False)
+        self.compact_output = tk.BooleanVar(value=False)
+        self.send_email = tk.BooleanVar(value=False)
+        self.review_while_generating = tk.BooleanVar(value=False)
+        self.write_trace = tk.BooleanVar(value=False)
+        self.preprocess_scans = tk.BooleanVar(value=False)
+        self.prefilter_pages = tk.BooleanVar(value=False)
+        self.candidate_ocr_profile = tk.StringVar(value=core.OCR_STAGE_PROFILES["candidate_pages"])
+        self._review = None
 
         self._start_time = None
 
@@ -1064,11 +586,16 @@ class ESlipGeneratorApp:
         ttk.Label(exam_fr, text="Year:").grid(row=0, column=4, sticky="e", padx=(10, 0))
         ttk.Entry(exam_fr, textvariable=self.exam_year, width=8).grid(row=0, column=5, sticky="w")
         exam_fr.grid_columnconfigure(6, weight=1)
+        ttk.Button(exam_fr, text="Import Timetable...", command=self.import_timetable).grid(row=0, column=7,
+                                                                                          sticky="e")
 
         files_fr = ttk.LabelFrame(wrap, text="2. Select Source Files", padding=10)
         files_fr.pack(fill="x", pady=(10, 0))
 
-        self._add_file_row(files_fr, 0, "Candidate List (PDF):", "candidates", [("PDF files", "*.pdf")])
+        self.candidate_file_widgets = self._add_file_row(files_fr, 0, "Candidate List(s) (PDF):", "candidates",
+                                                         [("PDF files", "*.pdf")], multiple=True)
+        ttk.Checkbutton(files_fr, text="Use saved roster", variable=self.use_saved_roster,
+                        command=self._toggle_candidate_input).grid(row=0, column=3, sticky="w", padx=(10, 0))
 
         self.centre_file_widgets = self._add_file_row(files_fr, 1, "Centre List (PDF):", "centres",
                                                                   [("PDF files", "*.pdf")])
@@ -1078,19 +605,40 @@ class ESlipGeneratorApp:
                                                                     command=self._toggle_centre_list_input)
         self.centre_list_checkbox.grid(row=1, column=3, sticky="w", padx=(10, 0))
 
-        self._add_file_row(files_fr, 2, "Eligibility CSV:", "csv", [("CSV files", "*.csv")])
+        self._add_file_row(files_fr, 2, "Eligibility CSV(s):", "csv", [("CSV files", "*.csv")], multiple=True)
+        ttk.Checkbutton(files_fr, text="Clean up scanned pages before OCR (deskew, despeckle)",
+                        variable=self.preprocess_scans).grid(row=3, column=1, sticky="w", pady=(6, 0))
+        profile_fr = ttk.Frame(files_fr)
+        profile_fr.grid(row=3, column=3, sticky="w", padx=(10, 0), pady=(6, 0))
+        ttk.Label(profile_fr, text="OCR profile:").pack(side="left")
+        ttk.Combobox(profile_fr, textvariable=self.candidate_ocr_profile, values=list(core.OCR_PROFILES), width=20,
+                     state="readonly").pack(side="left", padx=(4, 0))
+        ttk.Checkbutton(files_fr, text="Only fully OCR candidate list pages with eligible applicants",
+                        variable=self.prefilter_pages).grid(row=4, column=1, sticky="w")
 
         out_fr = ttk.LabelFrame(wrap, text="3. Output", padding=10)
         out_fr.pack(fill="x", pady=(10, 0))
         self.out_lbl = ttk.Label(out_fr, text="No folder selected", relief="sunken")
         self.out_lbl.grid(row=0, column=0, sticky="ew")
         ttk.Button(out_fr, text="Choose Folder", command=self.select_output_dir).grid(row=0, column=1, padx=6)
+        ttk.Checkbutton(out_fr, text="Compact PDFs (smaller files)", variable=self.compact_output).grid(
+            row=1, column=0, sticky="w", pady=(6, 0))
+        ttk.Checkbutton(out_fr, text="Email slips to applicants (settings: smtp.json)",
+                        variable=self.send_email).grid(row=2, column=0, sticky="w")
+        ttk.Checkbutton(out_fr, text="Write timing trace (open in chrome://tracing)",
+                        variable=self.write_trace).grid(row=3, column=0, sticky="w")
         out_fr.grid_columnconfigure(0, weight=1)
 
         act = ttk.Frame(wrap)
         act.pack(fill="x", pady=(10, 0))
         self.btn_start = ttk.Button(act, text="Generate E-Slips", command=self.start)
         self.btn_start.pack(side="left")
+        self.btn_preflight = ttk.Button(act, text="Preflight Check", command=self.start_preflight)
+        self.btn_preflight.pack(side="left", padx=(6, 0))
+        self.btn_cancel = ttk.Button(act, text="Cancel", command=self.cancel, state=tk.DISABLED)
+        self.btn_cancel.pack(side="left", padx=(6, 0))
+        ttk.Checkbutton(act, text="Generate matched slips while reviewing the rest",
+                        variable=self.review_while_generating).pack(side="left", padx=(10, 0))
 
         self.progress_bar = ttk.Progressbar(act, orient="horizontal", mode="determinate")
         self.progress_bar.pack(side="right", fill="x", expand=True, padx=(10, 0))
@@ -1098,13 +646,39 @@ class ESlipGeneratorApp:
         self.status_label = ttk.Label(wrap, text="Status: Ready")
         self.status_label.pack(fill="x", pady=(5, 0))
 
+        live_fr = ttk.LabelFrame(wrap, text="Live Results", padding=10)
+        live_fr.pack(fill="x", pady=(10, 0))
+        self.live_summary = ttk.Label(live_fr, text="Candidates appear here as each page is parsed.")
+        self.live_summary.pack(fill="x", pady=(0, 4))
+        live_container = ttk.Frame(live_fr)
+        live_container.pack(fill="x")
+        self.live_tree = ttk.Treeview(live_container, columns=[key for key, _, _ in LIVE_COLUMNS], show="headings",
+                                      height=6)
+        for key, title, width in LIVE_COLUMNS:
+            self.live_tree.heading(key, text=title)
+            self.live_tree.column(key, width=width, stretch=key == "name")
+        self.live_tree.tag_configure("not_in_csv", foreground="#666666")
+        self.live_tree.tag_configure("skipped", foreground="#b00020")
+        live_scroll = ttk.Scrollbar(live_container, orient="vertical", command=self.live_tree.yview)
+        self.live_tree.configure(yscrollcommand=live_scroll.set)
+        self.live_tree.pack(side="left", fill="x", expand=True)
+        live_scroll.pack(side="right", fill="y")
+
         log_fr = ttk.LabelFrame(wrap, text="Log", padding=10)
         log_fr.pack(fill="both", expand=True, pady=(10, 0))
 
+        log_opts = ttk.Frame(log_fr)
+        log_opts.pack(fill="x", pady=(0, 4))
+        ttk.Label(log_opts, text="Show:").pack(side="left")
+        level_menu = ttk.Combobox(log_opts, textvariable=self.log_level, values=list(LOG_LEVEL_CHOICES), width=10,
+                                  state="readonly")
+        level_menu.pack(side="left", padx=(4, 0))
+        level_menu.bind("<<ComboboxSelected>>", lambda e: self._render_log())
+
         log_container = ttk.Frame(log_fr)
         log_container.pack(fill="both", expand=True)
 
-        self.log_txt = tk.Text(log_container, height=16, font=("Consolas", 10))
+        self.log_txt = tk.Text(log_container, height=12, font=("Consolas", 10))
         scrollbar = ttk.Scrollbar(log_container, orient="vertical", command=self.log_txt.yview)
         self.log_txt.configure(yscrollcommand=scrollbar.set)
 
@@ -1112,6 +686,8 @@ class ESlipGeneratorApp:
         scrollbar.pack(side="right", fill="y")
 
         self.root.after(100, self._drain_log)
+        self.root.after(200, self._drain_progress)
+        self.root.after(250, self._drain_results)
         self.timetable_cache = {}
 
         self._update_month_options()
@@ -1135,7 +711,13 @@ class ESlipGeneratorApp:
             if len(self.centre_file_widgets) > 1:
                 self.centre_file_widgets[1].config(text="No file selected")
 
-    def _add_file_row(self, parent, row, label, key, ftypes):
+    def _toggle_candidate_input(self, *args):
+        # the saved roster replaces the candidate lists, so there is nothing to pick
+        state = "disabled" if self.use_saved_roster.get() else "normal"
+        for widget in self.candidate_file_widgets:
+            widget.config(state=state)
+
+    def _add_file_row(self, parent, row, label, key, ftypes, multiple=False):
         lbl_widget = ttk.Label(parent, text=label)
         lbl_widget.grid(row=row, column=0, sticky="w")
 
@@ -1143,14 +725,21 @@ class ESlipGeneratorApp:
         path_lbl.grid(row=row, column=1, sticky="ew", padx=6)
 
         btn_widget = ttk.Button(parent, text="Browse",
-                                command=lambda k=key, l=path_lbl, ft=ftypes: self._pick_file(k, l, ft))
+                                command=lambda k=key, l=path_lbl, ft=ftypes: self._pick_file(k, l, ft, multiple))
         btn_widget.grid(row=row, column=2)
 
         parent.grid_columnconfigure(1, weight=1)
 
         return [lbl_widget, path_lbl, btn_widget]
 
-    def _pick_file(self, key, label_widget, ftypes):
+    def _pick_file(self, key, label_widget, ftypes, multiple=False):
+        if multiple:
+            paths = list(filedialog.askopenfilenames(filetypes=ftypes))
+            if paths:
+                self.file_paths[key] = paths
+                names = ", ".join(os.path.basename(p) for p in paths)
+                label_widget.config(text=names if len(paths) == 1 else f"{len(paths)} files: {names}")
+            return
         p = filedialog.askopenfilename(filetypes=ftypes)
         if p:
             self.file_paths[key] = p
@@ -1162,21 +751,141 @@ class ESlipGeneratorApp:
             self.output_dir = p
             self.out_lbl.config(text=p)
 
-    def log(self, msg):
-        self.log_queue.put(msg)
+    def import_timetable(self):
+        p = filedialog.askopenfilename(filetypes=[("Timetable files", "*.csv *.json"), ("All files", "*.*")])
+        if not p:
+            return
+        exam_type = self.exam_type.get().strip()
+        exam_month = self.exam_month.get().strip()
+        exam_year = self.exam_year.get().strip()
+        try:
+            tt = core.parse_timetable_file(p, self.log)
+            if not tt:
+                messagebox.showerror("Import Timetable", "No timetable entries found in the selected file.")
+                return
+            stored = update_stored_timetable(exam_type, exam_month, exam_year, tt)
+        except Exception as e:
+            self.log(f"ERROR importing timetable: {e}")
+            messagebox.showerror("Import Timetable", str(e))
+            return
+        self.log(f"Imported timetable for {len(tt)} subject(s) into {exam_type} {exam_month} {exam_year} "
+                 f"({len(stored)} subject(s) stored).")
+        messagebox.showinfo("Import Timetable",
+                            f"Imported {len(tt)} subject(s) for {exam_type} {exam_month} {exam_year}.")
+
+    def log(self, msg, level=None):
+        self.log_queue.put((core.infer_log_level(msg, level), msg))
 
     def _drain_log(self):
-        while not self.log_queue.empty():
+        # one insert, trim and scroll per tick however many messages arrived
+        batch = []
+        while True:
             try:
-                msg = self.log_queue.get_nowait()
-                self.log_txt.insert("end", msg + "\n")
-                self.log_txt.see("end")
+                batch.append(self.log_queue.get_nowait())
             except queue.Empty:
                 break
+
+        if batch:
+            if self.run_log is not None:
+                self.run_log.write([core.format_log_line(msg, level) for level, msg in batch])
+            self.log_buffer.extend(batch)
+            min_level = LOG_LEVEL_CHOICES.get(self.log_level.get(), LOG_INFO)
+            shown = [msg for level, msg in batch[-LOG_MAX_LINES:] if level >= min_level]
+            if shown:
+                self.log_txt.insert("end", "\n".join(shown) + "\n")
+                line_count = int(self.log_txt.index("end-1c").split(".")[0])
+                if line_count > LOG_MAX_LINES:
+                    self.log_txt.delete("1.0", f"{line_count - LOG_MAX_LINES + 1}.0")
+                self.log_txt.see("end")
         self.root.after(120, self._drain_log)
 
+    def progress(self, stage, done, total):
+        """ Progress callback for the pipeline; safe to call from any thread """
+        self.progress_queue.put((stage, done, total, time.monotonic()))
+
+    def _apply_progress_events(self):
+        """ Feed queued progress events to the tracker; returns the stage reported last """
+        latest = None
+        while True:
+            try:
+                stage, done, total, ts = self.progress_queue.get_nowait()
+            except queue.Empty:
+                return latest
+            self.progress_tracker.update(stage, done, total, ts)
+            latest = stage
+
+    def _drain_progress(self):
+        latest = self._apply_progress_events()
+        if latest is not None:
+            st = self.progress_tracker.stages[latest]
+            self.progress_bar["maximum"] = max(st["total"], 1)
+            self.progress_bar["value"] = st["done"]
+            self.status_label.config(text=f"Status: {self.progress_tracker.describe(latest)}")
+        self.root.after(200, self._drain_progress)
+
+    def live_page(self, pdf_path, page, candidates, skipped):
+        """ on_page callback for parse_candidate_lists; safe to call from any thread """
+        self.results_queue.put(("page", pdf_path, page, candidates, skipped))
+
+    def _drain_results(self):
+        # one batch of table inserts per tick, however many pages finished since the last one
+        rows = []
+        while True:
+            try:
+                event = self.results_queue.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == "start":
+                self.live_tally = event[1]
+                rows = []
+                self.live_tree.delete(*self.live_tree.get_children())
+                continue
+            _, pdf_path, page, candidates, skipped = event
+            if self.live_tally is None:
+                continue
+            label = str(page + 1)
+            if len(self.file_paths["candidates"]) > 1:
+                label = f"{os.path.basename(pdf_path)} p.{label}"
+            for c, hit in self.live_tally.add(pdf_path, page, candidates, skipped):
+                rows.append(((label, c.id, c.name, c.dob, len(c.subjects), "Matched" if hit else "Not in CSV"),
+                             () if hit else ("not_in_csv",)))
+            rows.extend(((label, "", block[:120], "", "", "Skipped block"), ("skipped",)) for block in skipped)
+
+        if rows:
+            for values, tags in rows[-LIVE_MAX_ROWS:]:
+                self.live_tree.insert("", "end", values=values, tags=tags)
+            children = self.live_tree.get_children()
+            if len(children) > LIVE_MAX_ROWS:
+                self.live_tree.delete(*children[:len(children) - LIVE_MAX_ROWS])
+            self.live_tree.see(self.live_tree.get_children()[-1])
+            self.live_summary.config(text=self.live_tally.describe())
+        self.root.after(250, self._drain_results)
+
+    def _set_status(self, text):
+        self.root.after(0, lambda: self.status_label.config(text=text))
+
+    def _log_progress_summary(self):
+        # runs on the Tk thread after the queued events, so the summary has the final counts
+        def report():
+            self._apply_progress_events()
+            summary = self.progress_tracker.summary()
+            if summary:
+                self.log(summary)
+            core.write_timing_report(core.stop_timings(), self.output_dir, self.log, trace=self.write_trace.get())
+            core.write_page_issue_report(self.output_dir, self.log)
+        self.root.after(0, report)
+
+    def _render_log(self):
+        """ Redraw the pane from the ring buffer after the level filter changes """
+        min_level = LOG_LEVEL_CHOICES.get(self.log_level.get(), LOG_INFO)
+        shown = [msg for level, msg in self.log_buffer if level >= min_level]
+        self.log_txt.delete("1.0", tk.END)
+        if shown:
+            self.log_txt.insert("end", "\n".join(shown) + "\n")
+        self.log_txt.see("end")
+
     def start(self):
-        required_files = ["candidates", "csv"]
+        required_files = ["csv"] if self.use_saved_roster.get() else ["candidates", "csv"]
         if self.centre_list_available.get():
             required_files.append("centres")
 
@@ -1195,13 +904,97 @@ class ESlipGeneratorApp:
 
         self._start_time = time.time()
         self.btn_start.config(state=tk.DISABLED)
+        self.btn_preflight.config(state=tk.DISABLED)
+        self.btn_cancel.config(state=tk.NORMAL)
         self.status_label.config(text="Status: Starting...")
+        self._apply_progress_events()
+        self.progress_tracker = ProgressTracker()
+        core.start_timings()
+        reset_run_control()
+        configure_ocr(preprocess=self.preprocess_scans.get(),
+                      profiles={"candidate_pages": self.candidate_ocr_profile.get()})
         self.log_txt.delete("1.0", tk.END)
+        self.log_buffer.clear()
+
+        if self.run_log is not None:
+            self.run_log.close()
+        try:
+            self.run_log = core.RunLogFile(self.output_dir)
+            self.log(f"Full log: {self.run_log.path}")
+        except OSError as e:
+            self.run_log = None
+            self.log(f"Warning: could not create log file in output folder: {e}")
 
         t = threading.Thread(target=self._run)
         t.daemon = True
         t.start()
 
+    def start_preflight(self):
+        """ Check the CSV and a few sampled pages of each list, then report the expected match rate and run time """
+        if self.use_saved_roster.get():
+            messagebox.showerror("Preflight Check", "A preflight check reads the candidate lists; "
+                                                    "untick the saved roster option first.")
+            return
+        required_files = ["candidates", "csv"] + (["centres"] if self.centre_list_available.get() else [])
+        missing = [key for key in required_files if not self.file_paths[key]]
+        if missing:
+            messagebox.showerror("Missing Files", f"Please select the source files.\n"
+                                                  f"Missing files: {', '.join(missing)}")
+            return
+
+        self.btn_start.config(state=tk.DISABLED)
+        self.btn_preflight.config(state=tk.DISABLED)
+        self.btn_cancel.config(state=tk.NORMAL)
+        self.status_label.config(text="Status: Preflight check...")
+        reset_run_control()
+        configure_ocr(preprocess=self.preprocess_scans.get(),
+                      profiles={"candidate_pages": self.candidate_ocr_profile.get()})
+        threading.Thread(target=self._run_preflight, daemon=True).start()
+
+    def _run_preflight(self):
+        try:
+            exam_type = self.exam_type.get().strip()
+            report = core.preflight(self.file_paths["candidates"],
+                                    self.file_paths["centres"] if self.centre_list_available.get() else "",
+                                    self.file_paths["csv"], exam_type, self.exam_month.get().strip(),
+                                    self.exam_year.get().strip(), self.log, self.compact_output.get())
+        except RunCancelled:
+            self.log("Preflight check cancelled.")
+            self._set_status("Status: Cancelled")
+            return
+        except Exception as e:
+            msg = str(e)
+            self.log(f"ERROR: {msg}")
+            self.root.after(0, lambda: messagebox.showerror("Preflight Check", msg))
+            return
+        finally:
+            self.root.after(0, self._reset_ui)
+
+        lines = [f"Eligible applicants in the CSV: {report['eligible']}",
+                 f"Candidates parsed from {report['sampled_pages']} of {report['candidate_pages']} page(s): "
+                 f"{report['sampled_candidates']} ({report['sampled_matched']} in the CSV)"]
+        if report["match_rate"] is not None:
+            lines.append(f"Expected matches: about {report['projected_matched']} ({report['match_rate']:.0%})")
+        lines.append(f"Projected full run: about {format_duration(report['projected_seconds'])}")
+        if report["problems"]:
+            lines += ["", "Problems:"] + [f"- {problem}" for problem in report["problems"]]
+        self._set_status("Status: Preflight check found problems" if report["problems"] else
+                         "Status: Preflight check passed")
+        show = messagebox.showwarning if report["problems"] else messagebox.showinfo
+        self.root.after(0, lambda: show("Preflight Check", "\n".join(lines)))
+
+    def cancel(self):
+        """ Ask the worker threads to stop at the next page or slip; the run then finishes normally """
+        core.cancel_run()
+        self.btn_cancel.config(state=tk.DISABLED)
+        self.log("Cancelling: stopping after the current page or slip...")
+        self.status_label.config(text="Status: Cancelling...")
+
+    def _cancelled(self):
+        self.log("Run cancelled before slips were generated.")
+        self._set_status("Status: Cancelled")
+        self._log_progress_summary()
+
     def _run(self):
         try:
             exam_type = self.exam_type.get().strip()
@@ -1209,24 +1002,32 @@ class ESlipGeneratorApp:
             exam_year = self.exam_year.get().strip()
 
             self.log("Status: Parsing CSV for eligible candidates...")
-            csv_list = parse_csv(self.file_paths["csv"], exam_type, exam_month, self.log)
+            csv_list = core.parse_csvs(self.file_paths["csv"], exam_type, exam_month, self.log)
             if not csv_list:
                 self.log("No eligible candidates found in CSV. Stopping.")
+                self.root.after(0, self._reset_ui)
                 return
 
-            centres = {}
-            if self.centre_list_available.get():
-                self.log("Status: Parsing Centre List...")
-                centres = parse_centre_list(self.file_paths["centres"], self.log, self.output_dir)
-                if not centres:
-                    self.log("No centres found. Stopping.")
-                    return
-            else:
+            centres = {}  # filled after matching with just the centres the matched candidates need
+            if not self.centre_list_available.get():
                 self.log("Status: Skipping Centre List (not available).")
 
+            if self.use_saved_roster.get():
+                # matched straight against the roster store in _continue_processing
+                self._continue_processing(None, csv_list, centres, exam_month, exam_year, exam_type, "")
+                return
+
             self.log("Status: Parsing Candidate List...")
-            cand_list, unmatched_blocks, pdf_text = parse_candidate_list(self.file_paths["candidates"], self.log,
-                                                                         self.output_dir)
+            eligible = csv_list if self.prefilter_pages.get() else None
+            self.results_queue.put(("start", core.LiveMatchTally(csv_list)))
+            cand_list, unmatched_blocks, pdf_text = core.parse_candidate_lists(self.file_paths["candidates"], self.log,
+                                                                               self.output_dir, self.progress, eligible,
+                                                                               self.live_page)
+            if eligible is not None:
+                self.log("Roster not saved: a prefiltered run only parses the pages with eligible applicants.")
+            elif cand_list:
+                core.save_roster(timetable_store_key(exam_type, exam_month, exam_year), cand_list,
+                                 ", ".join(os.path.basename(p) for p in self.file_paths["candidates"]), self.log)
 
             if unmatched_blocks:
                 self.log(f"Opening manual candidate entry for {len(unmatched_blocks)} unmatched block(s)...")
@@ -1237,10 +1038,13 @@ class ESlipGeneratorApp:
             else:
                 self._continue_processing(cand_list, csv_list, centres, exam_month, exam_year, exam_type, pdf_text)
 
+        # the run goes on in dialogs and slip workers after this returns; they reset the UI when it ends
+        except RunCancelled:
+            self._cancelled()
+            self.root.after(0, self._reset_ui)
         except Exception as e:
             self.log(f"ERROR: {e}")
             messagebox.showerror("Error", str(e))
-        finally:
             self.root.after(0, self._reset_ui)
 
     def _show_manual_candidate_entry(self, unmatched_blocks, cand_list, csv_list, centres, exam_month, exam_year,
@@ -1259,31 +1063,21 @@ class ESlipGeneratorApp:
 
     def _continue_processing(self, cand_list, csv_list, centres, exam_month, exam_year, exam_type, pdf_text):
         try:
-            self.log("Status: Cross-matching candidates with CSV...")
-            matched = []
-            missing_csv = []
-
-            def make_key(c):
-                name_key = normalize_key_name(c.get('name', ''))
-                return (name_key, c.get('dob', ''))
-
-            cand_index = {}
-            for c in cand_list:
-                key = make_key(c)
-                if key[0]:
-                    cand_index[key] = c
-            
-            for row in csv_list:
-                csv_name_key = normalize_key_name(row.get('name', ''))
-                k = (csv_name_key, row.get('dob', ''))
-                
-                if k in cand_index:
-                    matched.append(cand_index[k])
-                else:
-                    missing_csv.append(row)
-            
+            if cand_list is None:
+                self.log("Status: Cross-matching CSV with the stored roster...")
+                matched, missing_csv = core.match_stored_roster(timetable_store_key(exam_type, exam_month, exam_year),
+                                                                csv_list, self.log, self.progress)
+            else:
+                self.log("Status: Cross-matching candidates with CSV...")
+                matched, missing_csv = core.match_candidates(cand_list, csv_list, self.progress)
+
             self.log(f"Matched {len(matched)} candidates")
 
+            if self.review_while_generating.get():
+                self._lookup_centres(matched, centres)
+                self._start_review_mode(matched, missing_csv, centres, exam_month, exam_year, exam_type, pdf_text)
+                return
+
             if missing_csv:
                 self.log(f"CSV candidates not found in candidate list: {len(missing_csv)}. Opening manual entry...")
                 self.root.after(0, lambda: self._show_manual_csv_entry(missing_csv, matched, centres, exam_month,
@@ -1292,6 +1086,9 @@ class ESlipGeneratorApp:
             else:
                 self._continue_with_centres(matched, centres, exam_month, exam_year, exam_type)
 
+        except RunCancelled:
+            self._cancelled()
+            self.root.after(0, self._reset_ui)
         except Exception as e:
             self.log(f"ERROR in continue processing: {e}")
             self.root.after(0, self._reset_ui)
@@ -1311,8 +1108,8 @@ class ESlipGeneratorApp:
     def _continue_with_centres(self, matched, centres, exam_month, exam_year, exam_type):
         if self.centre_list_available.get():
             try:
-                needed_centres = {c['centre_num'] for c in matched if c.get('centre_num')}
-                missing_codes = sorted([c for c in needed_centres if c not in centres])
+                self._lookup_centres(matched, centres)
+                missing_codes = find_missing_centres(matched, centres)
 
                 if missing_codes:
                     self.log(f"Missing {len(missing_codes)} centre code(s). Opening manual centre entry...")
@@ -1323,6 +1120,9 @@ class ESlipGeneratorApp:
                 else:
                     self._continue_with_timetable(matched, centres, exam_month, exam_year, exam_type)
 
+            except RunCancelled:
+                self._cancelled()
+                self.root.after(0, self._reset_ui)
             except Exception as e:
                 self.log(f"ERROR in centre processing: {e}")
                 self.root.after(0, self._reset_ui)
@@ -1330,6 +1130,15 @@ class ESlipGeneratorApp:
             self.log("Skipping manual centre entry (not available).")
             self._continue_with_timetable(matched, centres, exam_month, exam_year, exam_type)
 
+    def _lookup_centres(self, candidates, centres):
+        """ Add the names of the centres these candidates need (and centres lacks) from the centre list """
+        if not self.centre_list_available.get():
+            return
+        codes = find_missing_centres(candidates, centres)
+        if codes:
+            self.log("Status: Looking up centre names...")
+            centres.update(lookup_centres(self.file_paths["centres"], codes, self.log, self.progress))
+
     def _show_manual_centre_entry(self, missing_codes, centres, matched, exam_month, exam_year, exam_type):
         dlg = ManualCentreEntry(self.root, missing_codes)
         added = dlg.show()
@@ -1344,19 +1153,25 @@ class ESlipGeneratorApp:
 
     def _continue_with_timetable(self, matched, centres, exam_month, exam_year, exam_type):
         try:
-            subject_universe = set()
-            for c in matched:
-                for s in c.get('subjects', []):
-                    subject_universe.add(s['code'])
-            subject_universe = {s for s in subject_universe if s}
-
-            if ASK_TIMETABLE_EVERY_RUN and subject_universe:
-                self.log(f"Collecting timetable for {len(subject_universe)} unique subject(s)...")
-                self.root.after(0, lambda: self._show_manual_timetable_entry(subject_universe, matched, centres,
+            subject_universe = core.collect_subjects(matched)
+
+            try:
+                stored = get_stored_timetable(exam_type, exam_month, exam_year)
+            except Exception as e:
+                self.log(f"Warning: could not read timetable store: {e}")
+                stored = {}
+            self.timetable_cache = {code: papers for code, papers in stored.items() if papers}
+            missing_subjects = {s for s in subject_universe if not self.timetable_cache.get(s)}
+            self.log(f"Timetable store has {len(subject_universe) - len(missing_subjects)} of "
+                     f"{len(subject_universe)} subject(s) for {exam_type} {exam_month} {exam_year}.")
+
+            if core.ASK_TIMETABLE_EVERY_RUN and missing_subjects:
+                self.log(f"Collecting timetable for {len(missing_subjects)} missing subject(s)...")
+                self.root.after(0, lambda: self._show_manual_timetable_entry(missing_subjects, matched, centres,
                                                                              exam_month, exam_year, exam_type))
                 return
             else:
-                self._generate_slips(matched, centres, {}, exam_month, exam_year, exam_type)
+                self._generate_slips(matched, centres, self.timetable_cache, exam_month, exam_year, exam_type)
 
         except Exception as e:
             self.log(f"ERROR in timetable processing: {e}")
@@ -1368,6 +1183,10 @@ class ESlipGeneratorApp:
         if tt:
             self.timetable_cache.update(tt)
             self.log(f"Added timetable for {len(tt)} subjects")
+            try:
+                update_stored_timetable(exam_type, exam_month, exam_year, tt)
+            except Exception as e:
+                self.log(f"Warning: could not save timetable store: {e}")
 
         t = threading.Thread(
             target=lambda: self._generate_slips(matched, centres, self.timetable_cache, exam_month, exam_year,
@@ -1375,34 +1194,196 @@ class ESlipGeneratorApp:
         t.daemon = True
         t.start()
 
+    # ---- review queue mode: slips for matched candidates are written while operators review the rest ----
+    def _start_review_mode(self, matched, missing_csv, centres, exam_month, exam_year, exam_type, pdf_text):
+        missing_fonts = missing_slip_fonts()
+        if missing_fonts:
+            self.log(f"ERROR: missing font file(s): {', '.join(missing_fonts)}")
+            messagebox.showerror("Font File Missing", "Required Roboto font files (.ttf) not found.")
+            self.root.after(0, self._reset_ui)
+            return
+
+        try:
+            stored = get_stored_timetable(exam_type, exam_month, exam_year)
+        except Exception as e:
+            self.log(f"Warning: could not read timetable store: {e}")
+            stored = {}
+        self.timetable_cache = {code: papers for code, papers in stored.items() if papers}
+
+        review_queue = core.ReviewQueue(centres, self.timetable_cache, self.centre_list_available.get())
+        ready = review_queue.add(matched)
+
+        worker = core.SlipWorker(centres, self.timetable_cache, self.output_dir, exam_month, exam_year, exam_type,
+                                 self.compact_output.get(), self.log, self.progress)
+        self.log("Status: Generating PDF slips...")
+        worker.submit(ready)
+        self.log(f"Review queue: {len(ready)} slip(s) generating now, {len(review_queue.held)} candidate(s) held, "
+                 f"{len(missing_csv)} unmatched CSV row(s) to review.")
+
+        # the run stays open while a review dialog or a background centre lookup ("lookups") is pending
+        self._review = {"queue": review_queue, "worker": worker, "dialogs": [], "lookups": 0, "codes": set(),
+                        "subjects": set(), "exam": (exam_month, exam_year, exam_type), "pdf_text": pdf_text}
+        self.root.after(0, lambda: self._open_review_dialogs(missing_csv))
+
+    def _open_review_dialogs(self, missing_csv=None):
+        review = self._review
+        exam_month, exam_year, exam_type = review["exam"]
+        review_queue = review["queue"]
+
+        if missing_csv:
+            self._track_review_dialog(
+                ManualCSVEntry(self.root, missing_csv, review["pdf_text"],
+                               on_submit=lambda entries: self._review_submit(candidates=entries)))
+
+        # only ask for what no open dialog already covers, e.g. a centre first needed by a corrected CSV row
+        if self.centre_list_available.get():
+            codes = [c for c in review_queue.missing_centres() if c not in review["codes"]]
+            if codes:
+                review["codes"].update(codes)
+                self._track_review_dialog(
+                    ManualCentreEntry(self.root, codes, on_submit=lambda entries: self._review_submit(centres=entries)))
+
+        subjects = review_queue.missing_subjects() - review["subjects"]
+        if subjects:
+            review["subjects"].update(subjects)
+            self._track_review_dialog(
+                ManualTimetableEntry(self.root, subjects, exam_month, exam_year,
+                                     on_submit=lambda entries: self._review_submit(timetable=entries)))
+
+        if not review["dialogs"] and not review["lookups"]:
+            self._finish_review_mode()
+
+    def _lookup_review_centres(self):
+        """ Look up centres first needed by corrected rows in the background; only unknown ones get a dialog """
+        review = self._review
+        if not self.centre_list_available.get():
+            return
+        codes = [c for c in review["queue"].missing_centres() if c not in review["codes"]]
+        if not codes:
+            return
+        review["codes"].update(codes)  # keeps _open_review_dialogs from asking while the lookup runs
+        review["lookups"] += 1
+
+        def run():
+            try:
+                found = lookup_centres(self.file_paths["centres"], codes, self.log)
+            except RunCancelled:
+                found = {}
+
+            def done():
+                review["lookups"] -= 1
+                if self._review is not review:
+                    return
+                review["codes"].difference_update(c for c in codes if c not in found)
+                if found:
+                    self._review_submit(centres=found)
+                else:
+                    self._open_review_dialogs()
+            self.root.after(0, done)
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _track_review_dialog(self, dlg):
+        self._review["dialogs"].append(dlg)
+        dlg.bind("<Destroy>", lambda e, d=dlg: self._review_dialog_closed(d) if e.widget is d else None)
+
+    def _review_submit(self, candidates=None, centres=None, timetable=None):
+        review = self._review
+        review_queue = review["queue"]
+        exam_month, exam_year, exam_type = review["exam"]
+        released = []
+
+        if candidates:
+            self.log(f"Added {len(candidates)} candidates from CSV manual entry")
+            released += review_queue.add(candidates)
+            self._lookup_review_centres()
+        if centres:
+            self.log(f"Added {len(centres)} centre mappings")
+            released += review_queue.add_centres(centres)
+        if timetable:
+            self.log(f"Added timetable for {len(timetable)} subjects")
+            try:
+                update_stored_timetable(exam_type, exam_month, exam_year, timetable)
+            except Exception as e:
+                self.log(f"Warning: could not save timetable store: {e}")
+            released += review_queue.add_timetable(timetable)
+
+        review["worker"].submit(released)
+        self.log(f"Review queue: released {len(released)} slip(s), {len(review_queue.held)} still held.")
+        # open follow-up dialogs now, before a submitting dialog closes and the run could be finished
+        self._open_review_dialogs()
+
+    def _review_dialog_closed(self, dlg):
+        review = self._review
+        if review is None or dlg not in review["dialogs"]:
+            return
+        review["dialogs"].remove(dlg)
+        if not review["dialogs"] and not review["lookups"]:
+            self._finish_review_mode()
+
+    def _finish_review_mode(self):
+        review = self._review
+        self._review = None
+
+        def finish():
+            try:
+                result = review["worker"].close()
+                exam_month, exam_year, exam_type = review["exam"]
+                held = review["queue"].held
+                if held:
+                    self.log(f"{len(held)} candidate(s) left without a slip (centre or timetable not supplied): "
+                             + ", ".join(c.name or 'Unknown' for c in held))
+
+                duration = time.time() - (self._start_time or time.time())
+                final_message = (f"{'Cancelled' if result['cancelled'] else 'Complete'}! {result['success']}/"
+                                 f"{result['total']} slips generated in {duration:.2f}s.")
+                self.log(final_message)
+
+                if self.send_email.get() and result["deliveries"] and not result["cancelled"]:
+                    self._deliver_slips(result["deliveries"], exam_month, exam_year, exam_type)
+                self._set_status(f"Status: {final_message}")
+                self._log_progress_summary()
+
+                if not result["cancelled"]:
+                    messagebox.showinfo("Success", f"Processing complete.\n{result['success']} of "
+                                                   f"{result['total']} e-slips were generated.")
+            except Exception as e:
+                self.log(f"ERROR in slip generation: {e}")
+                messagebox.showerror("Error", f"An error occurred during slip generation: {e}")
+            finally:
+                self.root.after(0, self._reset_ui)
+
+        # waiting for the worker to drain must not block the Tk thread
+        threading.Thread(target=finish, daemon=True).start()
+
     def _generate_slips(self, matched, centres, timetable, exam_month, exam_year, exam_type):
         try:
+            missing_fonts = missing_slip_fonts()
+            if missing_fonts:
+                self.log(f"ERROR: missing font file(s): {', '.join(missing_fonts)}")
+                messagebox.showerror("Font File Missing", "Required Roboto font files (.ttf) not found.")
+                return
+
             self.log("Status: Generating PDF slips...")
             total_candidates = len(matched)
-            self.progress_bar["maximum"] = total_candidates
-            success_count = 0
-
-            for i, c in enumerate(matched):
-                self.progress_bar["value"] = i + 1
-                centre_name = centres.get(c.get('centre_num', ''), '')
-
-                try:
-                    out = create_pdf_slip(c, centre_name, timetable, self.output_dir, exam_month, exam_year, exam_type)
-                    if out:
-                        self.log(f"Generated: {os.path.basename(out)}")
-                        success_count += 1
-                    else:
-                        self.log(f"Failed to generate slip for {c.get('name', 'Unknown')}")
-                except Exception as e:
-                    self.log(f"Failed to generate slip for {c.get('name', 'Unknown')}: {e}")
+
+            result = core.generate_slips(matched, centres, timetable, self.output_dir, exam_month, exam_year, exam_type,
+                                         self.compact_output.get(), self.log, self.progress)
+            success_count = result["success"]
 
             duration = time.time() - (self._start_time or time.time())
-            final_message = f"Complete! {success_count}/{total_candidates} slips generated in {duration:.2f}s."
+            final_message = (f"{'Cancelled' if result['cancelled'] else 'Complete'}! {success_count}/"
+                             f"{total_candidates} slips generated in {duration:.2f}s.")
             self.log(final_message)
-            self.status_label.config(text=f"Status: {final_message}")
 
-            messagebox.showinfo("Success",
-                                f"Processing complete.\n{success_count} of {total_candidates} e-slips were generated.")
+            if self.send_email.get() and result["deliveries"] and not result["cancelled"]:
+                self._deliver_slips(result["deliveries"], exam_month, exam_year, exam_type)
+            self._set_status(f"Status: {final_message}")
+            self._log_progress_summary()
+
+            if not result["cancelled"]:
+                messagebox.showinfo("Success", f"Processing complete.\n{success_count} of {total_candidates} "
+                                               f"e-slips were generated.")
 
         except Exception as e:
             self.log(f"ERROR in slip generation: {e}")
@@ -1410,8 +1391,21 @@ class ESlipGeneratorApp:
         finally:
             self.root.after(0, self._reset_ui)
 
+    def _deliver_slips(self, deliveries, exam_month, exam_year, exam_type):
+        self.log("Status: Emailing slips...")
+        self._set_status("Status: Emailing slips...")
+        try:
+            settings = core.load_smtp_settings()
+        except Exception as e:
+            self.log(f"ERROR reading SMTP settings ({SMTP_SETTINGS_PATH}): {e}")
+            return
+        log_path = os.path.join(self.output_dir, "email_send_log.csv")
+        core.deliver_slips(deliveries, settings, log_path, self.log, exam_month, exam_year, exam_type)
+
     def _reset_ui(self):
         self.btn_start.config(state=tk.NORMAL)
+        self.btn_preflight.config(state=tk.NORMAL)
+        self.btn_cancel.config(state=tk.DISABLED)
         self.progress_bar["value"] = 0
 
 
@@ -1423,5 +1417,18 @@ if __name__ == "__main__":
         style.theme_use('clam')
     except Exception:
         pass
+    startup_timer.mark("tk root")
     app = ESlipGeneratorApp(root)
+    startup_timer.mark("main window")
+
+    def _report_startup():
+        startup_timer.mark("first draw")
+        report = startup_timer.report()
+        app.log(report)
+        if "--startup-report" in sys.argv:
+            # used to track launch time: print the report and exit once the window is up
+            print(report, flush=True)
+            root.destroy()
+
+    root.after_idle(_report_startup)
     root.mainloop()
\ No newline at end of file
@@ -0,0 +1,1082 @@
+"""
+Headless batch mode for the CXC E-Slip Generator. Runs the same pipeline as the Tk app
+without importing tkinter, so it can run on a server or from a scheduler:
+
+    python timeslips_cli.py --config run.json
+    python timeslips_cli.py --candidates list.pdf --centres centres.pdf --csv export.csv --output out \\
+        --exam-type CSEC --exam-month "May - June" --exam-year 2026
+    python timeslips_cli.py --candidates region1.pdf region2.pdf --csv may.csv late.csv ...
+
+Several candidate lists and CSV exports are merged into one roster before matching.
+Parsed rosters are saved to the roster store, so a late CSV batch can be matched without the PDFs:
+
+    python timeslips_cli.py --from-store --csv late.csv --output out --exam-type CSEC --exam-month "May - June" ...
+
+Watch mode keeps running and writes slips for rows that are new since the last export it processed:
+
+    python timeslips_cli.py --watch exports/ --output out --centres centres.pdf --exam-type CSEC ...
+
+A sharded run splits candidate list OCR (by page range) and slip generation (by centre) into jobs in a
+shared queue folder. Worker processes on this or other machines claim the jobs; this process merges
+their results into the roster and the output folder:
+
+    python timeslips_cli.py --candidates list.pdf --csv export.csv --output out --shard //server/eslip/q1 ...
+    python timeslips_cli.py --worker //server/eslip/q1          # on every machine that should help
+    python timeslips_cli.py ... --shard q1 --local-workers 3    # or all on one machine
+
+A preflight check reads a few pages of each list and reports CSV problems, the expected match rate and the
+projected run time within seconds, without writing anything:
+
+    python timeslips_cli.py --preflight --candidates list.pdf --centres centres.pdf --csv export.csv ...
+
+Ctrl+C cancels a batch run at the next page or slip (a page whose OCR times out is retried and, if
+every attempt fails, skipped and listed in eslip_page_issues_<timestamp>.csv); press it again to stop at once.
+
+Records that would open a manual entry dialog in the app are handled by the --unmatched policy:
+  review  write them to review.csv in the output folder and generate every slip that is complete (default)
+  skip    only log them and generate every slip that is complete
+  fail    stop before generating anything (exit code 2)
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from itertools import repeat
+from urllib.parse import parse_qs, urlsplit
+
+import timeslips_core as core
+from timeslips_core import (
+    LOG_DETAIL, LOG_INFO, LOG_WARNING, RunCancelled, infer_log_level, RunLogFile, configure_ocr, cancel_run,
+    parse_centre_list, parse_candidate_lists, parse_timetable_file, get_stored_timetable, update_stored_timetable,
+    timetable_store_key, save_roster, RosterStore, ReviewQueue, generate_slips, missing_slip_fonts,
+    warm_slip_renderer, render_slip, slip_filename, applicant_key, load_smtp_settings, deliver_slips, JobQueue,
+    encode_candidate, decode_candidate, record_page_issue, SHARD_POLL_SECONDS,
+)
+
+RUN_DEFAULTS = {
+    "candidates": [],  # one or more candidate list PDFs (a single path string is accepted too)
+    "centres": "",  # empty = no centre list available
+    "csv": [],  # one or more eligibility CSV exports
+    "output": "",
+    "exam_type": "CSEC",
+    "exam_month": "May - June",
+    "exam_year": "",
+    "timetable": "",  # optional CSV/JSON timetable imported into the store before the run
+    "centre_names": {},  # optional {code: name} overrides, e.g. for codes missing from the centre list
+    "centre_lookup": True,  # only read the centre list until the matched candidates' centres are found
+    "compact": False,
+    "email": False,
+    "smtp_config": core.SMTP_SETTINGS_PATH,
+    "unmatched": "review",
+    "trace": False,  # also write a Chrome trace of the run's timed spans to the output folder
+    "from_store": False,  # match against the stored roster instead of parsing candidate lists
+    "roster_store": core.ROSTER_DB_PATH,
+    "watch": "",  # folder of CSV exports to watch; slips are written for new eligible rows as they arrive
+    "poll": core.WATCH_POLL_SECONDS,
+    "auto_crop": True,  # learn the body region of the PDFs from their first pages and OCR only that
+    "ocr_crop": {},  # fixed body region per list, e.g. {"candidate_pages": [0.04, 0.11, 0.97, 0.94]}
+    "prefilter": False,  # cheap first pass, then full OCR only of the pages with eligible applicants
+    "preprocess": False,  # binarise, deskew and despeckle scanned pages before OCR (needs numpy)
+    "ocr_timeout": core.OCR_PAGE_TIMEOUT,  # seconds per OCR attempt on a page before it is retried or skipped
+    "ocr_profiles": {},  # OCR profile per stage, e.g. {"candidate_pages": "candidate_list_best"}
+    "shard": "",  # shared queue folder: OCR and slip generation run as jobs on --worker processes
+    "local_workers": 0,  # worker processes a sharded run starts on this machine
+    "pages_per_job": core.SHARD_PAGES_PER_JOB,
+    "worker": "",  # queue folder of a sharded run to work for
+    "worker_id": "",  # name of this worker in the queue (default: host name and process id)
+    "preflight": False,  # only check the inputs on a few sampled pages and project the run time
+    "sample_pages": core.PREFLIGHT_SAMPLE_PAGES,  # pages a preflight check reads from each list
+    "serve": "",  # [HOST:]PORT to serve slips over HTTP from the roster store (host defaults to 127.0.0.1)
+    "render_workers": 0,  # warmed-up processes the slip service renders on (0 = render in the request thread)
+}
+UNMATCHED_POLICIES = ("review", "skip", "fail")
+MULTI_FILE_KEYS = ("candidates", "csv")
+REVIEW_FIELDS = ["issue", "candidate_id", "name", "dob", "email", "detail"]
+
+
+_log_state = {"min_level": LOG_INFO, "file": None}
+
+
+def log(msg, level=None):
+    """ Print at or above the chosen level; everything goes to the run log file in the output folder """
+    level = infer_log_level(msg, level)
+    line = core.format_log_line(msg, level)
+    if _log_state["file"] is not None:
+        _log_state["file"].write([line])
+    if level >= _log_state["min_level"]:
+        print(line, flush=True)
+
+
+def quiet_log(msg, level=None):
+    """ Log callback for chatty steps repeated on every poll: their info messages become detail """
+    level = infer_log_level(msg, level)
+    log(msg, LOG_DETAIL if level == LOG_INFO else level)
+
+
+class ProgressPrinter:
+    """ Progress callback that logs a stage's rate and ETA at most every `interval` seconds and when it completes """
+
+    def __init__(self, interval=5.0):
+        self.tracker = core.ProgressTracker()
+        self.interval = interval
+        self._last = {}
+
+    def __call__(self, stage, done, total):
+        self.tracker.update(stage, done, total)
+        now = time.monotonic()
+        if done and (done == total or now - self._last.get(stage, 0) >= self.interval):
+            self._last[stage] = now
+            log(f"Progress: {self.tracker.describe(stage)}")
+
+
+class LiveResultsPrinter:
+    """ on_page callback: logs how many parsed candidates match the CSV so far, at most every `interval` seconds """
+
+    def __init__(self, csv_list, interval=5.0):
+        self.tally = core.LiveMatchTally(csv_list)
+        self.interval = interval
+        self._last = time.monotonic()
+        self._lock = threading.Lock()  # several candidate lists are parsed on a thread pool
+
+    def __call__(self, pdf_path, page, candidates, skipped):
+        with self._lock:
+            self.tally.add(pdf_path, page, candidates, skipped)
+            now = time.monotonic()
+            if now - self._last >= self.interval:
+                self._last = now
+                log(f"Live results: {self.tally.describe()}")
+
+
+def build_arg_parser():
+    p = argparse.ArgumentParser(description="Generate CXC e-slips without the GUI.")
+    p.add_argument("--config", help="JSON file with run settings; command-line options override it")
+    p.add_argument("--candidates", nargs="+", help="candidate list PDF(s)")
+    p.add_argument("--centres", help="centre list PDF (omit if not available)")
+    p.add_argument("--csv", nargs="+", help="eligibility CSV export(s)")
+    p.add_argument("--output", help="output folder for slips and review files")
+    p.add_argument("--exam-type", choices=["CSEC", "CAPE"])
+    p.add_argument("--exam-month", choices=["January", "May - June"])
+    p.add_argument("--exam-year")
+    p.add_argument("--timetable", help="CSV/JSON timetable to import into the timetable store first")
+    p.add_argument("--unmatched", choices=UNMATCHED_POLICIES, help="policy for records that need a human")
+    p.add_argument("--compact", dest="compact", action="store_true", default=None,
+                   help="write compact PDFs (default: full quality)")
+    p.add_argument("--no-compact", dest="compact", action="store_false")
+    p.add_argument("--email", dest="email", action="store_true", default=None, help="email slips after generation")
+    p.add_argument("--smtp-config", help=f"SMTP settings JSON (default: {core.SMTP_SETTINGS_PATH})")
+    p.add_argument("--trace", action="store_true", default=None,
+                   help="write a Chrome trace (eslip_trace_*.json) of per-stage timings to the output folder")
+    p.add_argument("--from-store", dest="from_store", action="store_true", default=None,
+                   help="match against the roster saved by an earlier run instead of reading candidate lists")
+    p.add_argument("--roster-store", help=f"roster database (default: {core.ROSTER_DB_PATH})")
+    p.add_argument("--watch", help="keep running and process new rows of CSV exports dropped in this folder")
+    p.add_argument("--poll", type=float,
+                   help=f"watch mode polling interval in seconds (default {core.WATCH_POLL_SECONDS})")
+    p.add_argument("--ocr-crop", nargs=4, type=float, metavar=("LEFT", "TOP", "RIGHT", "BOTTOM"),
+                   help="fixed body region of candidate list pages (page fractions) instead of learning it")
+    p.add_argument("--no-auto-crop", dest="auto_crop", action="store_false", default=None,
+                   help="OCR whole pages instead of the body region learned from the first pages")
+    p.add_argument("--prefilter", action="store_true", default=None,
+                   help="find the pages with eligible applicants in a cheap first pass and only fully OCR those")
+    p.add_argument("--preprocess", action="store_true", default=None,
+                   help="binarise, deskew and despeckle scanned pages before OCR (needs numpy)")
+    p.add_argument("--ocr-timeout", dest="ocr_timeout", type=float,
+                   help=f"seconds per OCR attempt on a page, 0 = no limit (default {core.OCR_PAGE_TIMEOUT})")
+    p.add_argument("--ocr-profile", dest="ocr_profiles", action="append", metavar="STAGE=PROFILE",
+                   help=f"OCR profile for a stage ({', '.join(core.OCR_STAGE_PROFILES)}); "
+                        f"profiles: {', '.join(core.OCR_PROFILES)}")
+    p.add_argument("--full-centre-list", dest="centre_lookup", action="store_false", default=None,
+                   help="parse the whole centre list up front instead of looking up only the centres needed")
+    p.add_argument("--shard", metavar="QUEUE_DIR",
+                   help="run OCR by page range and slips by centre as jobs in this shared folder")
+    p.add_argument("--local-workers", dest="local_workers", type=int,
+                   help="worker processes a sharded run starts on this machine (default 0: only --worker processes)")
+    p.add_argument("--pages-per-job", dest="pages_per_job", type=int,
+                   help=f"candidate list pages per OCR job of a sharded run (default {core.SHARD_PAGES_PER_JOB})")
+    p.add_argument("--worker", metavar="QUEUE_DIR", help="work on the jobs of a sharded run until it finishes")
+    p.add_argument("--worker-id", dest="worker_id", help="name of this worker in the queue")
+    p.add_argument("--preflight", action="store_true", default=None,
+                   help="check the CSV and a few sampled pages of each list, report the expected match rate "
+                        "and projected run time, then exit")
+    p.add_argument("--sample-pages", dest="sample_pages", type=int,
+                   help=f"pages a preflight check reads from each list (default {core.PREFLIGHT_SAMPLE_PAGES})")
+    p.add_argument("--serve", metavar="[HOST:]PORT",
+                   help="serve slips for stored candidates over HTTP (GET /slip/<number>, POST /slips)")
+    p.add_argument("--render-workers", dest="render_workers", type=int,
+                   help="processes the slip service renders slips on (default 0: in the request thread)")
+    p.add_argument("--verbose", action="store_true", help="also print per-page and per-slip messages")
+    return p
+
+
+def load_run_config(args):
+    cfg = dict(RUN_DEFAULTS)
+    if args.config:
+        with open(args.config, encoding="utf-8") as f:
+            cfg.update(json.load(f))
+    for key in RUN_DEFAULTS:
+        val = getattr(args, key, None)
+        if val is not None:
+            cfg[key] = val
+    for key in MULTI_FILE_KEYS:
+        if isinstance(cfg[key], str):
+            cfg[key] = [cfg[key]] if cfg[key] else []
+    if isinstance(cfg["ocr_crop"], list):
+        cfg["ocr_crop"] = {"candidate_pages": cfg["ocr_crop"]}
+    if isinstance(cfg["ocr_profiles"], list):
+        pairs = [item.split("=", 1) for item in cfg["ocr_profiles"]]
+        if any(len(pair) != 2 for pair in pairs):
+            raise ValueError("--ocr-profile takes STAGE=PROFILE, e.g. candidate_pages=candidate_list_best")
+        cfg["ocr_profiles"] = dict(pairs)
+    if not cfg["exam_year"]:
+        cfg["exam_year"] = time.strftime("%Y")
+    return cfg
+
+
+def validate_config(cfg):
+    errors = []
+    if cfg["worker"]:
+        # a worker takes everything else from the jobs and the run settings in the queue folder
+        return [] if os.path.isdir(cfg["worker"]) else [f"queue folder not found: {cfg['worker']}"]
+    # the stored roster replaces candidate lists; watch mode reads its CSVs from the watched folder;
+    # a preflight check writes nothing; the slip service serves stored candidates (its logs go to the output folder)
+    optional = {"candidates": cfg["from_store"] or cfg["watch"] or cfg["serve"], "csv": cfg["watch"] or cfg["serve"],
+                "output": cfg["preflight"]}
+    for key in ("candidates", "csv", "output"):
+        if not cfg[key] and not optional[key]:
+            errors.append(f"'{key}' is required")
+    for key in ("candidates", "centres", "csv", "timetable"):
+        paths = cfg[key] if key in MULTI_FILE_KEYS else [cfg[key]]
+        for path in paths:
+            if path and not os.path.exists(path):
+                errors.append(f"{key} file not found: {path}")
+    if cfg["watch"] and not os.path.isdir(cfg["watch"]):
+        errors.append(f"watch folder not found: {cfg['watch']}")
+    if cfg["unmatched"] not in UNMATCHED_POLICIES:
+        errors.append(f"unmatched policy must be one of {', '.join(UNMATCHED_POLICIES)}")
+    for stage, name in cfg["ocr_profiles"].items():
+        if stage not in core.OCR_STAGE_PROFILES:
+            errors.append(f"unknown OCR stage '{stage}', expected one of {', '.join(core.OCR_STAGE_PROFILES)}")
+        elif name not in core.OCR_PROFILES:
+            errors.append(f"unknown OCR profile '{name}', expected one of {', '.join(core.OCR_PROFILES)}")
+    if cfg["watch"] and cfg["unmatched"] == "fail":
+        errors.append("watch mode keeps running, so it takes --unmatched review or skip, not fail")
+    if cfg["shard"] and (cfg["watch"] or cfg["prefilter"]):
+        errors.append("a sharded run cannot be combined with watch mode or the prefilter")
+    if cfg["shard"] and (cfg["local_workers"] < 0 or cfg["pages_per_job"] < 1):
+        errors.append("local workers must be 0 or more and pages per job at least 1")
+    if cfg["preflight"] and (cfg["from_store"] or cfg["watch"] or cfg["sample_pages"] < 1):
+        errors.append("a preflight check needs candidate lists and CSV exports, and at least 1 sample page")
+    if cfg["serve"]:
+        port = cfg["serve"].rpartition(":")[2]
+        if not (port.isdigit() and 0 < int(port) < 65536):
+            errors.append(f"--serve takes [HOST:]PORT, got '{cfg['serve']}'")
+        if cfg["watch"] or cfg["shard"] or cfg["preflight"] or cfg["render_workers"] < 0:
+            errors.append("the slip service cannot be combined with watch mode, sharding or a preflight check, "
+                          "and render workers must be 0 or more")
+    if cfg["exam_type"] == "CAPE" and cfg["exam_month"] != "May - June":
+        errors.append("CAPE is only sat in May - June")
+    return errors
+
+
+def write_review_file(path, rows, append=False):
+    new_file = not (append and os.path.exists(path))
+    with open(path, "a" if append else "w", newline='', encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=REVIEW_FIELDS)
+        if new_file:
+            writer.writeheader()
+        for row in rows:
+            writer.writerow({k: row.get(k, "") for k in REVIEW_FIELDS})
+
+
+def run_batch(cfg):
+    """ Run the full pipeline for one job; returns a process exit code """
+    exam_type, exam_month, exam_year = cfg["exam_type"], cfg["exam_month"], cfg["exam_year"]
+    output_dir = cfg["output"]
+    os.makedirs(output_dir, exist_ok=True)
+    start_time = time.time()
+    progress = ProgressPrinter()
+    _log_state["file"] = RunLogFile(output_dir)
+    log(f"Full log: {_log_state['file'].path}")
+    core.start_timings()
+
+    missing_fonts = missing_slip_fonts()
+    if missing_fonts:
+        log(f"ERROR: missing font file(s): {', '.join(missing_fonts)}")
+        return 1
+
+    if cfg["timetable"]:
+        tt = parse_timetable_file(cfg["timetable"], log)
+        if tt:
+            update_stored_timetable(exam_type, exam_month, exam_year, tt)
+
+    log("Status: Parsing CSV for eligible candidates...")
+    csv_list = core.parse_csvs(cfg["csv"], exam_type, exam_month, log)
+    if not csv_list:
+        log("No eligible candidates found in CSV. Stopping.")
+        return 1
+
+    centres = {}
+    if cfg["centres"] and not cfg["centre_lookup"]:
+        log("Status: Parsing Centre List...")
+        centres = parse_centre_list(cfg["centres"], log, output_dir, progress)
+        if not centres:
+            log("No centres found. Stopping.")
+            return 1
+    elif not cfg["centres"]:
+        log("Status: Skipping Centre List (not available).")
+    centres.update(cfg["centre_names"])
+
+    exam_key = timetable_store_key(exam_type, exam_month, exam_year)
+    if cfg["from_store"]:
+        unmatched_blocks = []
+        log("Status: Cross-matching CSV with the stored roster...")
+        matched, missing_csv = core.match_stored_roster(exam_key, csv_list, log, progress, cfg["roster_store"])
+    else:
+        log("Status: Parsing Candidate List...")
+        eligible = csv_list if cfg["prefilter"] else None
+        if cfg["shard"]:
+            cand_list, unmatched_blocks = shard_candidate_lists(cfg, progress)
+        else:
+            cand_list, unmatched_blocks, _ = parse_candidate_lists(cfg["candidates"], log, output_dir, progress,
+                                                                   eligible, LiveResultsPrinter(csv_list))
+        if eligible is not None:
+            log("Roster not saved: a prefiltered run only parses the pages with eligible applicants.")
+        elif cand_list:
+            save_roster(exam_key, cand_list, ", ".join(os.path.basename(p) for p in cfg["candidates"]), log,
+                        cfg["roster_store"])
+
+        log("Status: Cross-matching candidates with CSV...")
+        matched, missing_csv = core.match_candidates(cand_list, csv_list, progress)
+    log(f"Matched {len(matched)} candidates")
+    if cfg["centres"] and cfg["centre_lookup"]:
+        log("Status: Looking up centre names...")
+        centres.update(core.lookup_centres(cfg["centres"], core.find_missing_centres(matched, centres), log, progress))
+
+    review = [{"issue": "unparsed_block", "detail": block} for block in unmatched_blocks]
+    review += [{"issue": "not_in_candidate_list", "name": row.name, "dob": row.dob, "email": row.email,
+                "detail": f"CSV line {row.line}"} for row in missing_csv]
+
+    # Candidates whose centre or timetable is incomplete are held back rather than given a wrong slip
+    timetable = get_stored_timetable(exam_type, exam_month, exam_year)
+    review_queue = ReviewQueue(centres, timetable, check_centres=bool(cfg["centres"]))
+    ready = review_queue.add(matched)
+    for c in review_queue.held:
+        missing_centre, missing_subjects = review_queue.missing_for(c)
+        issues = []
+        if missing_centre:
+            issues.append(("missing_centre", missing_centre))
+        if missing_subjects:
+            issues.append(("missing_timetable", " ".join(missing_subjects)))
+        for issue, detail in issues:
+            review.append({"issue": issue, "candidate_id": c.id, "name": c.name, "dob": c.dob,
+                           "email": c.email, "detail": detail})
+
+    if review:
+        log(f"{len(review)} record(s) need review ({len(matched) - len(ready)} matched candidate(s) held back).")
+        if cfg["unmatched"] == "fail":
+            log("Unmatched policy is 'fail'. Stopping before generation.")
+            return 2
+        if cfg["unmatched"] == "review":
+            review_path = os.path.join(output_dir, "review.csv")
+            write_review_file(review_path, review)
+            log(f"Review file written: {review_path}")
+
+    log("Status: Generating PDF slips...")
+    if cfg["shard"]:
+        result = shard_slips(cfg, ready, centres, timetable, progress)
+    else:
+        result = generate_slips(ready, centres, timetable, output_dir, exam_month, exam_year, exam_type,
+                                cfg["compact"], log, progress)
+    duration = time.time() - start_time
+    log(f"{'Cancelled' if result['cancelled'] else 'Complete'}! {result['success']}/{result['total']} "
+        f"slips generated in {duration:.2f}s.")
+    log(progress.tracker.summary())
+    if result["cancelled"]:
+        return 130
+
+    if cfg["email"] and result["deliveries"]:
+        settings = load_smtp_settings(cfg["smtp_config"])
+        counts = deliver_slips(result["deliveries"], settings, os.path.join(output_dir, "email_send_log.csv"), log,
+                               exam_month, exam_year, exam_type)
+        if counts["failed"]:
+            return 1
+
+    return 0 if result["success"] == result["total"] else 1
+
+
+def run_preflight(cfg):
+    """ Check the inputs on sampled pages without generating anything; exit code 1 if problems were found """
+    exam_type, exam_month, exam_year = cfg["exam_type"], cfg["exam_month"], cfg["exam_year"]
+    timetable = dict(get_stored_timetable(exam_type, exam_month, exam_year))
+    if cfg["timetable"]:
+        timetable.update(parse_timetable_file(cfg["timetable"], log) or {})  # checked, not stored
+    report = core.preflight(cfg["candidates"], cfg["centres"], cfg["csv"], exam_type, exam_month, exam_year, log,
+                            cfg["compact"], cfg["sample_pages"], timetable)
+    return 1 if report["problems"] else 0
+
+
+def run_watch(cfg):
+    """ Watch a folder of CSV exports and write slips for new eligible rows until interrupted (Ctrl+C) """
+    exam_type, exam_month, exam_year = cfg["exam_type"], cfg["exam_month"], cfg["exam_year"]
+    output_dir = cfg["output"]
+    os.makedirs(output_dir, exist_ok=True)
+    _log_state["file"] = RunLogFile(output_dir, prefix="eslip_watch")
+    log(f"Full log: {_log_state['file'].path}")
+
+    missing_fonts = missing_slip_fonts()
+    if missing_fonts:
+        log(f"ERROR: missing font file(s): {', '.join(missing_fonts)}")
+        return 1
+    if cfg["timetable"]:
+        tt = parse_timetable_file(cfg["timetable"], log)
+        if tt:
+            update_stored_timetable(exam_type, exam_month, exam_year, tt)
+
+    centres = {}
+    if cfg["centres"]:
+        centres = parse_centre_list(cfg["centres"], log, output_dir)
+        if not centres:
+            log("No centres found. Stopping.")
+            return 1
+    centres.update(cfg["centre_names"])
+
+    exam_key = timetable_store_key(exam_type, exam_month, exam_year)
+    if cfg["candidates"]:
+        cand_list, _, _ = parse_candidate_lists(cfg["candidates"], log, output_dir)
+        if cand_list:
+            save_roster(exam_key, cand_list, ", ".join(os.path.basename(p) for p in cfg["candidates"]), log,
+                        cfg["roster_store"])
+
+    review_path = os.path.join(output_dir, "review.csv")
+    state = core.WatchState(os.path.join(output_dir, "watch_state.json"))
+    watcher = core.CsvFolderWatcher(cfg["watch"], state)
+    review_queue = ReviewQueue(centres, get_stored_timetable(exam_type, exam_month, exam_year),
+                               check_centres=bool(cfg["centres"]))
+    smtp_settings = load_smtp_settings(cfg["smtp_config"]) if cfg["email"] else None
+
+    warm_slip_renderer(cfg["compact"])  # the first new applicant is not charged for font and background loading
+
+    def write_slips(cands):
+        result = {"success": 0, "total": len(cands), "bytes": 0, "deliveries": []}
+        for c in cands:
+            before = result["success"]
+            # released from the hold either way; a failed slip is retried when the next export lists the row
+            state.held.pop(applicant_key(c), None)
+            core.write_slip(c, review_queue.centres, review_queue.timetable, output_dir, exam_month, exam_year,
+                            exam_type, cfg["compact"], log, result)
+            if result["success"] > before:
+                state.done.add(applicant_key(c))
+        if smtp_settings and result["deliveries"]:
+            deliver_slips(result["deliveries"], smtp_settings, os.path.join(output_dir, "email_send_log.csv"), log,
+                          exam_month, exam_year, exam_type)
+        return result["success"]
+
+    def process_export(store, path):
+        started = time.perf_counter()
+        name = os.path.basename(path)
+        rows = core.parse_csv(path, exam_type, exam_month, quiet_log)
+        new = {}
+        for row in rows:
+            key = applicant_key(row)
+            if key not in state.done and key not in state.held:
+                new.setdefault(key, row)
+        if not new:
+            log(f"{name}: no new eligible rows.", LOG_DETAIL)
+            watcher.mark_processed(path)
+            state.save()
+            return
+
+        matched, missing_csv = store.match(exam_key, list(new.values()))
+        ready = review_queue.add(matched)
+        written = write_slips(ready)
+
+        review = []
+        for row in missing_csv:
+            if applicant_key(row) not in state.unmatched:
+                state.unmatched.add(applicant_key(row))
+                review.append({"issue": "not_in_candidate_list", "name": row.name, "dob": row.dob,
+                               "email": row.email, "detail": f"{name} line {row.line}"})
+        not_on_roster = len(review)
+        ready_ids = {c.id for c in ready}
+        for c in matched:
+            if c.id not in ready_ids:
+                # held once: later exports skip the applicant until the missing data releases the slip
+                state.held[applicant_key(c)] = encode_candidate(c)
+                missing_centre, missing_subjects = review_queue.missing_for(c)
+                review.append({"issue": "missing_centre" if missing_centre else "missing_timetable",
+                               "candidate_id": c.id, "name": c.name, "dob": c.dob, "email": c.email,
+                               "detail": missing_centre or " ".join(missing_subjects)})
+        if review and cfg["unmatched"] == "review":
+            write_review_file(review_path, review, append=True)
+        elif review:
+            for row in review:
+                log(f"{name}: {row['issue']}: {row['name']} ({row['detail']})", LOG_WARNING)
+        # marked only now, so an export that failed half way is picked up again on the next poll
+        watcher.mark_processed(path)
+        state.save()
+        log(f"{name}: {len(new)} row(s) without a slip yet, {written} slip(s) written in "
+            f"{time.perf_counter() - started:.2f}s; {not_on_roster} new row(s) not on the roster, "
+            f"{len(review_queue.held)} held for centre/timetable.")
+
+    with RosterStore(cfg["roster_store"]) as store:
+        stored = store.count(exam_key)
+        if not stored:
+            log(f"ERROR: no stored roster for {exam_key.replace('|', ' ')}. Pass --candidates once to build it.")
+            return 1
+        log(f"Watching {cfg['watch']} for CSV exports ({stored} candidates on the roster, "
+            f"{len(state.done)} slips already written). Press Ctrl+C to stop.")
+        if state.held:
+            # held by an earlier watcher: written now if their data arrived meanwhile, otherwise held again
+            released = review_queue.add([decode_candidate(data) for data in state.held.values()])
+            log(f"Resumed {len(state.held)} held candidate(s); {write_slips(released)} slip(s) written now.")
+            state.save()
+        try:
+            while True:
+                # held candidates are released as soon as their timetable is imported, e.g. from the GUI
+                released = review_queue.add_timetable(get_stored_timetable(exam_type, exam_month, exam_year))
+                if released:
+                    log(f"Timetable update released {write_slips(released)} held slip(s).")
+                    state.save()
+                for path in watcher.poll():
+                    try:
+                        process_export(store, path)
+                    except Exception as e:
+                        log(f"ERROR processing {os.path.basename(path)}: {e}")
+                time.sleep(cfg["poll"])
+        except KeyboardInterrupt:
+            state.save()
+            log("Watch stopped.")
+            return 0
+
+
+# ---------------- SHARDED RUNS ----------------
+_shard_state = {"workers": [], "waiting_logged": False}
+
+
+def start_shard(cfg):
+    """ Record the run's OCR settings in the queue folder and start any local worker processes """
+    queue = JobQueue(cfg["shard"])
+    if queue.load("finished.json"):
+        raise ValueError(f"{cfg['shard']} holds a finished sharded run; use an empty folder for a new one")
+    if queue.load("run.json"):
+        log(f"Resuming the sharded run in {cfg['shard']}: finished jobs are kept.")
+    queue.save("run.json", {"created": time.strftime("%Y-%m-%d %H:%M:%S"), "ocr": {
+        "auto_crop": cfg["auto_crop"], "body_crop": cfg["ocr_crop"], "preprocess": cfg["preprocess"],
+        "page_timeout": cfg["ocr_timeout"], "profiles": cfg["ocr_profiles"]}})
+    host = socket.gethostname()
+    for n in range(cfg["local_workers"]):
+        cmd = [sys.executable, os.path.abspath(__file__), "--worker", cfg["shard"],
+               "--worker-id", f"{host}-local{n + 1}"]
+        _shard_state["workers"].append(subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    if cfg["local_workers"]:
+        log(f"Started {cfg['local_workers']} local worker(s) on {cfg['shard']}.")
+    log(f"More workers can join with: python timeslips_cli.py --worker {os.path.abspath(cfg['shard'])}")
+    return queue
+
+
+def finish_shard(cfg, status):
+    """ Tell the workers the run is over and wait for the local ones to exit """
+    JobQueue(cfg["shard"]).save("finished.json", {"status": status, "finished": time.strftime("%Y-%m-%d %H:%M:%S")})
+    for proc in _shard_state["workers"]:
+        try:
+            proc.wait(timeout=core.SHARD_STALE_SECONDS)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+    _shard_state["workers"].clear()
+
+
+def wait_for_jobs(queue, kind, progress):
+    """ Block until every job of one kind is done or failed, handing the jobs of silent workers to others """
+    while True:
+        core.check_cancelled()
+        for job_id in queue.requeue_stale():
+            log(f"Job {job_id} stopped sending heartbeats; it is back in the queue.")
+        counts = queue.counts(kind)
+        total = sum(counts.values())
+        finished = counts["done"] + counts["failed"]
+        progress(f"shard_{kind}", finished, total)
+        if finished >= total:
+            if counts["failed"]:
+                log(f"WARNING: {counts['failed']} {kind} job(s) failed; see their results in {queue.path('results')}")
+            return counts
+        workers = _shard_state["workers"]
+        if counts["claimed"] == 0 and not _shard_state["waiting_logged"] and \
+                (not workers or all(proc.poll() is not None for proc in workers)):
+            _shard_state["waiting_logged"] = True
+            log("Waiting for workers to claim jobs (start them with --worker on the queue folder)...")
+        time.sleep(SHARD_POLL_SECONDS)
+
+
+def shard_candidate_lists(cfg, progress):
+    """
+    OCR the candidate lists as page-range jobs on the shard workers and parse the merged page text;
+    returns (candidates, unmatched blocks) like parse_candidate_lists
+    """
+    import pymupdf
+
+    queue = JobQueue(cfg["shard"])
+    files = []
+    for n, path in enumerate(cfg["candidates"], 1):
+        # inputs are copied into the queue folder, the one place every worker can reach
+        rel = os.path.join("inputs", f"{n:02d}", os.path.basename(path))
+        dest = queue.path(rel)
+        if not os.path.exists(dest):
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            shutil.copyfile(path, dest + ".tmp")
+            os.replace(dest + ".tmp", dest)
+        with pymupdf.open(dest) as doc:
+            ranges = core.page_ranges(len(doc), cfg["pages_per_job"])
+        jobs = [(f"ocr-{n:02d}-{start:05d}", start, end) for start, end in ranges]
+        for job_id, start, end in jobs:
+            queue.add(job_id, {"kind": "ocr", "file": rel, "pages": [start, end]})
+        files.append((path, jobs))
+    log(f"Queued {sum(len(jobs) for _, jobs in files)} OCR job(s) of up to {cfg['pages_per_job']} pages.")
+    wait_for_jobs(queue, "ocr", progress)
+
+    results = []
+    for path, jobs in files:
+        pages = []
+        for job_id, start, end in jobs:
+            res = queue.result(job_id) or {"error": "no result"}
+            if "error" in res:
+                log(f"WARNING: {os.path.basename(path)} pages {start + 1}-{end} were not read: {res['error']}")
+                for page in range(start, end):
+                    record_page_issue(path, "candidate_pages", page + 1, "skipped", 0, f"job {job_id}: {res['error']}")
+                continue
+            pages.extend(res["pages"])
+            for issue in res["issues"]:
+                record_page_issue(path, issue["stage"], issue["page"], issue["status"], issue["attempts"],
+                                  issue["detail"])
+        text = "\n".join(page_text for _, page_text in sorted(pages))
+        try:
+            cands = core.parse_candidate_text(text, core.file_log(log, path))
+        except ValueError as e:
+            log(f"ERROR parsing candidate list {os.path.basename(path)}: {e}")
+            cands = []
+        results.append((cands, [], text))
+    roster, unmatched, _ = core.merge_rosters(cfg["candidates"], results, log)
+    return roster, unmatched
+
+
+def shard_slips(cfg, ready, centres, timetable, progress):
+    """ Generate slips as one job per centre on the shard workers; returns a generate_slips result dict """
+    queue = JobQueue(cfg["shard"])
+    by_centre = {}
+    for c in ready:
+        by_centre.setdefault(c.centre_num, []).append(c)
+    for centre, cands in sorted(by_centre.items()):
+        queue.add(f"slips-{centre}", {
+            "kind": "slips", "centre": centre, "centre_name": centres.get(centre, ""),
+            "candidates": [encode_candidate(c) for c in cands],
+            "timetable": {code: timetable[code] for code in core.collect_subjects(cands) if code in timetable},
+            "exam_type": cfg["exam_type"], "exam_month": cfg["exam_month"], "exam_year": cfg["exam_year"],
+            "compact": cfg["compact"]})
+    log(f"Queued {len(by_centre)} slip job(s), one per centre.")
+    wait_for_jobs(queue, "slips", progress)
+
+    result = {"success": 0, "total": len(ready), "bytes": 0, "deliveries": [], "cancelled": False}
+    for centre in sorted(by_centre):
+        res = queue.result(f"slips-{centre}") or {"error": "no result"}
+        if "error" in res:
+            log(f"ERROR: slips for centre {centre} failed: {res['error']}")
+            continue
+        # slips of namesakes in other centres may share a file name, so each gets a free name in the output folder
+        merged_path = queue.path("slips", centre, "merged.json")
+        merged = queue.load(os.path.join("slips", centre, "merged.json"))
+        if merged is None:
+            merged = []
+            for name, email, cand_name in res["deliveries"]:
+                src = queue.path("slips", centre, name)
+                if not os.path.exists(src):
+                    continue  # moved by an earlier merge of this run that stopped part way
+                dest = core.unique_path(os.path.join(cfg["output"], name))
+                shutil.move(src, dest)
+                merged.append((dest, email, cand_name))
+            core.write_json_atomic(merged_path, merged)
+        result["deliveries"].extend(tuple(item) for item in merged)
+        result["success"] += res["success"]
+        result["bytes"] += res["bytes"]
+    core.log_output_size(result, log)
+    return result
+
+
+class JobHeartbeat:
+    """ Progress callback of a worker's job: keeps the claim fresh and stops the job if the run is over """
+
+    def __init__(self, queue, job_id, worker):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker = worker
+        self._last = time.monotonic()
+
+    def __call__(self, stage, done, total):
+        now = time.monotonic()
+        if now - self._last < core.SHARD_HEARTBEAT_SECONDS:
+            return
+        self._last = now
+        self.queue.heartbeat(self.job_id, self.worker)
+        if self.queue.load("finished.json"):
+            cancel_run()
+
+
+def run_shard_job(queue, job, progress):
+    """ Run one claimed job; returns its result for the queue """
+    if job["kind"] == "ocr":
+        start, end = job["pages"]
+        pages = list(core.iter_pdf_text(queue.path(job["file"]), log, progress, "candidate_pages",
+                                        core.CANDIDATE_NUM_PATTERN, pages=set(range(start, end))))
+        return {"pages": pages, "issues": core.take_page_issues()}
+    if job["kind"] == "slips":
+        slip_dir = queue.path("slips", job["centre"])
+        os.makedirs(slip_dir, exist_ok=True)
+        cands = [decode_candidate(data) for data in job["candidates"]]
+        res = generate_slips(cands, {job["centre"]: job["centre_name"]}, job["timetable"], slip_dir,
+                             job["exam_month"], job["exam_year"], job["exam_type"], job["compact"], log, progress)
+        if res["cancelled"]:
+            raise RunCancelled("Run cancelled.")
+        return {"success": res["success"], "total": res["total"], "bytes": res["bytes"],
+                "deliveries": [(os.path.basename(path), email, name) for path, email, name in res["deliveries"]]}
+    raise ValueError(f"unknown job kind {job['kind']!r}")
+
+
+def run_worker(cfg):
+    """ Claim and run jobs from a shard queue folder until its run is finished """
+    queue = JobQueue(cfg["worker"])
+    worker = re.sub(r"[^\w.-]", "_", cfg["worker_id"] or f"{socket.gethostname()}-{os.getpid()}")
+    os.makedirs(queue.path("logs"), exist_ok=True)
+    _log_state["file"] = RunLogFile(queue.path("logs"), prefix=f"eslip_worker_{worker}")
+    log(f"Worker {worker} serving {os.path.abspath(cfg['worker'])}")
+    jobs_run = 0
+    while not queue.load("finished.json"):
+        run = queue.load("run.json")
+        job_id, job = queue.claim(worker) if run else (None, None)
+        if job is None:
+            time.sleep(SHARD_POLL_SECONDS)
+            continue
+        configure_ocr(**run["ocr"])
+        t = time.perf_counter()
+        try:
+            result = run_shard_job(queue, job, JobHeartbeat(queue, job_id, worker))
+        except RunCancelled:
+            log(f"Run finished or cancelled during job {job_id}.")
+            return 130 if not queue.load("finished.json") else 0
+        except Exception as e:
+            log(f"ERROR in job {job_id}: {e}")
+            queue.fail(job_id, worker, str(e))
+            continue
+        queue.complete(job_id, worker, result)
+        jobs_run += 1
+        log(f"Job {job_id} done in {time.perf_counter() - t:.1f}s.")
+    log(f"Run finished; worker {worker} ran {jobs_run} job(s).")
+    return 0
+
+
+# ---------------- SLIP SERVICE ----------------
+# A local HTTP service for single slips on demand (e.g. a corrected slip at the front desk): the stored
+# roster, timetable and centre names stay loaded, and slips render on processes that are already warm.
+SERVICE_MAX_BATCH = 1000  # candidate numbers accepted by one POST /slips request
+
+
+def init_render_worker(compact):
+    """ Render process setup: Ctrl+C is handled by the service, then fonts and background are loaded once """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    warm_slip_renderer(compact)
+
+
+class SlipService:
+    """
+    What the slip service keeps between requests: the stored roster and timetable of one exam session
+    (reloaded when another run saves to their store), the centre names and the render processes.
+    """
+
+    def __init__(self, cfg, centres):
+        self.cfg = cfg
+        self.exam_key = timetable_store_key(cfg["exam_type"], cfg["exam_month"], cfg["exam_year"])
+        self.centres = centres
+        self.roster = {}
+        self.timetable = {}
+        self._mtimes = {}
+        self._lock = threading.Lock()
+        self.pool = None
+        workers = cfg["render_workers"]
+        if workers:
+            self.pool = ProcessPoolExecutor(max_workers=workers, initializer=init_render_worker,
+                                            initargs=(cfg["compact"],))
+            wait([self.pool.submit(os.getpid) for _ in range(workers)])  # start and warm them all now
+        else:
+            warm_slip_renderer(cfg["compact"])
+
+    def close(self):
+        if self.pool:
+            self.pool.shutdown(cancel_futures=True)
+
+    def refresh(self):
+        """ Reload the roster or the timetable if its store file changed since it was loaded """
+        with self._lock:
+            for name, path in (("roster", self.cfg["roster_store"]), ("timetable", core.TIMETABLE_STORE_PATH)):
+                mtime = os.path.getmtime(path) if os.path.exists(path) else None
+                if name in self._mtimes and self._mtimes[name] == mtime:
+                    continue
+                self._mtimes[name] = mtime
+                if name == "roster":
+                    with RosterStore(path) as store:
+                        self.roster = {c.id: c for c in store.candidates(self.exam_key)}
+                else:
+                    self.timetable = get_stored_timetable(self.cfg["exam_type"], self.cfg["exam_month"],
+                                                          self.cfg["exam_year"])
+                log(f"Slip service: loaded {len(self.roster) if name == 'roster' else len(self.timetable)} "
+                    f"{'candidate(s)' if name == 'roster' else 'timetabled subject(s)'} for {self.exam_key}.")
+
+    def lookup(self, candidate_id):
+        """ (candidate, None), or (None, (HTTP status, reason)) if there is no complete slip for it """
+        c = self.roster.get(candidate_id)
+        if c is None:
+            return None, (404, "candidate number not in the stored roster")
+        review = ReviewQueue(self.centres, self.timetable, check_centres=bool(self.cfg["centres"]))
+        missing_centre, missing_subjects = review.missing_for(c)
+        if missing_centre:
+            return None, (409, f"no name for centre {missing_centre}")
+        if missing_subjects:
+            return None, (409, f"no timetable for {', '.join(missing_subjects)}")
+        return c, None
+
+    def render(self, candidates, compact):
+        """ Slip PDF bytes for each candidate, spread over the render processes if there are any """
+        names = [self.centres.get(c.centre_num, "") for c in candidates]
+        args = (candidates, names, repeat(self.timetable), repeat(self.cfg["exam_month"]),
+                repeat(self.cfg["exam_year"]), repeat(self.cfg["exam_type"]), repeat(compact))
+        if self.pool and len(candidates) > 1:
+            chunk = max(1, len(candidates) // (self.cfg["render_workers"] * 4))
+            return list(self.pool.map(render_slip, *args, chunksize=chunk))
+        if self.pool:
+            return [self.pool.submit(render_slip, *next(zip(*args))).result()]
+        return [render_slip(*a) for a in zip(*args)]
+
+    def status(self):
+        return {"exam": self.exam_key, "candidates": len(self.roster), "timetabled_subjects": len(self.timetable),
+                "centres": len(self.centres), "render_workers": self.cfg["render_workers"]}
+
+
+class SlipRequestHandler(BaseHTTPRequestHandler):
+    """
+    GET /slip/<candidate number>  the slip PDF (?compact=0 for a full-quality one)
+    POST /slips                   {"candidates": [...], "compact": true}: a zip of the slips, with
+                                  problems.json listing the numbers that got none and why
+    GET /health                   what the service has loaded
+    """
+    server_version = "ESlipService/1.0"
+
+    def log_message(self, format, *args):
+        log(f"HTTP {self.address_string()} {format % args}", LOG_DETAIL)
+
+    def do_GET(self):
+        service = self.server.service
+        url = urlsplit(self.path)
+        if url.path == "/health":
+            service.refresh()
+            return self._send_json(200, service.status())
+        m = re.fullmatch(r"/slip/(\d{10})", url.path)
+        if not m:
+            return self._send_json(404, {"error": "expected /slip/<10-digit candidate number> or /health"})
+        compact = parse_qs(url.query).get("compact", [""])[0]
+        compact = service.cfg["compact"] if not compact else compact not in ("0", "false", "no")
+        started = time.perf_counter()
+        service.refresh()
+        c, problem = service.lookup(m.group(1))
+        if problem:
+            log(f"Slip service: no slip for {m.group(1)}: {problem[1]}.")
+            return self._send_json(problem[0], {"candidate": m.group(1), "error": problem[1]})
+        data = service.render([c], compact)[0]
+        log(f"Slip service: {c.id} ({c.name}) in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        self._send(200, "application/pdf", data, slip_filename(c, service.cfg["exam_type"]))
+
+    def do_POST(self):
+        service = self.server.service
+        if urlsplit(self.path).path != "/slips":
+            return self._send_json(404, {"error": "expected POST /slips"})
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)) or b"{}")
+            ids = [str(cid).strip() for cid in body["candidates"]]
+            compact = bool(body.get("compact", service.cfg["compact"]))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return self._send_json(400, {"error": 'expected JSON {"candidates": ["<candidate number>", ...]}'})
+        if len(ids) > SERVICE_MAX_BATCH:
+            return self._send_json(413, {"error": f"at most {SERVICE_MAX_BATCH} candidates per request"})
+
+        started = time.perf_counter()
+        service.refresh()
+        ready, problems = [], {}
+        for cid in dict.fromkeys(ids):
+            c, problem = service.lookup(cid)
+            if problem:
+                problems[cid] = problem[1]
+            else:
+                ready.append(c)
+        slips = service.render(ready, compact) if ready else []
+
+        buf = io.BytesIO()
+        names = set()
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_STORED) as zf:  # the PDFs are compressed already
+            for c, data in zip(ready, slips):
+                name = base = slip_filename(c, service.cfg["exam_type"])
+                counter = 1
+                while name in names:  # candidates sharing a name keep their slips, as in unique_path
+                    name = f"{os.path.splitext(base)[0]} ({counter}).pdf"
+                    counter += 1
+                names.add(name)
+                zf.writestr(name, data)
+            if problems:
+                zf.writestr("problems.json", json.dumps(problems, indent=2))
+        log(f"Slip service: batch of {len(ids)}: {len(ready)} slip(s), {len(problems)} problem(s) "
+            f"in {(time.perf_counter() - started) * 1000:.0f} ms.")
+        self._send(200, "application/zip", buf.getvalue(), "eslips.zip")
+
+    def _send(self, status, content_type, data, filename=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if filename:
+            self.send_header("Content-Disposition", f'inline; filename="{filename}"')
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_json(self, status, payload):
+        self._send(status, "application/json", json.dumps(payload).encode("utf-8"))
+
+
+def run_service(cfg):
+    """ Serve slips for the stored roster over HTTP until interrupted (Ctrl+C) """
+    exam_type, exam_month, exam_year = cfg["exam_type"], cfg["exam_month"], cfg["exam_year"]
+    os.makedirs(cfg["output"], exist_ok=True)
+    _log_state["file"] = RunLogFile(cfg["output"], prefix="eslip_service")
+    log(f"Full log: {_log_state['file'].path}")
+
+    missing_fonts = missing_slip_fonts()
+    if missing_fonts:
+        log(f"ERROR: missing font file(s): {', '.join(missing_fonts)}")
+        return 1
+    if cfg["timetable"]:
+        tt = parse_timetable_file(cfg["timetable"], log)
+        if tt:
+            update_stored_timetable(exam_type, exam_month, exam_year, tt)
+
+    centres = {}
+    if cfg["centres"]:
+        centres = parse_centre_list(cfg["centres"], log, cfg["output"])  # read once, every request uses it
+    centres.update(cfg["centre_names"])
+
+    if cfg["candidates"]:
+        cand_list, _, _ = parse_candidate_lists(cfg["candidates"], log, cfg["output"])
+        if cand_list:
+            save_roster(timetable_store_key(exam_type, exam_month, exam_year), cand_list,
+                        ", ".join(os.path.basename(p) for p in cfg["candidates"]), log, cfg["roster_store"])
+
+    host, _, port = cfg["serve"].rpartition(":")
+    host = host or "127.0.0.1"
+    service = SlipService(cfg, centres)
+    try:
+        service.refresh()
+        if not service.roster:
+            log(f"Warning: no stored roster for {service.exam_key} yet; run a batch or pass --candidates.")
+        with ThreadingHTTPServer((host, int(port)), SlipRequestHandler) as server:
+            server.service = service
+            log(f"Slip service listening on http://{host}:{port}/ with {cfg['render_workers']} render "
+                f"process(es). Press Ctrl+C to stop.")
+            try:
+                server.serve_forever()
+            except KeyboardInterrupt:
+                log("Slip service stopped.")
+    finally:
+        service.close()
+    return 0
+
+
+def install_cancel_handler():
+    """ First Ctrl+C cancels the run at the next page or slip; a second one stops it at once """
+    def handler(signum, frame):
+        if core.cancel_requested():
+            raise KeyboardInterrupt
+        cancel_run()
+        log("Cancelling: stopping after the current page or slip (Ctrl+C again to stop at once)...")
+    signal.signal(signal.SIGINT, handler)
+
+
+def main(argv=None):
+    args = build_arg_parser().parse_args(argv)
+    if args.verbose:
+        _log_state["min_level"] = LOG_DETAIL
+    try:
+        cfg = load_run_config(args)
+    except (OSError, ValueError) as e:
+        log(f"ERROR reading config: {e}")
+        return 1
+    errors = validate_config(cfg)
+    if errors:
+        for err in errors:
+            log(f"ERROR: {err}")
+        return 1
+    core.reset_run_control()
+    if cfg["worker"]:
+        install_cancel_handler()
+        try:
+            return run_worker(cfg)
+        except Exception as e:
+            log(f"ERROR: {e}")
+            return 1
+        finally:
+            if _log_state["file"] is not None:
+                _log_state["file"].close()
+    if cfg["preflight"]:
+        try:
+            configure_ocr(cfg["auto_crop"], cfg["ocr_crop"], cfg["preprocess"], cfg["ocr_timeout"],
+                          cfg["ocr_profiles"])
+            install_cancel_handler()
+            return run_preflight(cfg)
+        except RunCancelled:
+            log("Preflight check cancelled.")
+            return 130
+        except Exception as e:
+            log(f"ERROR: {e}")
+            return 1
+    status = 1
+    try:
+        configure_ocr(cfg["auto_crop"], cfg["ocr_crop"], cfg["preprocess"], cfg["ocr_timeout"], cfg["ocr_profiles"])
+        if cfg["watch"]:
+            return run_watch(cfg)
+        if cfg["serve"]:
+            return run_service(cfg)
+        install_cancel_handler()
+        if cfg["shard"]:
+            start_shard(cfg)
+        status = run_batch(cfg)
+        return status
+    except RunCancelled:
+        log("Run cancelled before slips were generated.")
+        status = 130
+        return status
+    except Exception as e:
+        log(f"ERROR: {e}")
+        return 1
+    finally:
+        if cfg["shard"]:
+            finish_shard(cfg, status)
+        core.write_timing_report(core.stop_timings(), cfg["output"], log, trace=cfg["trace"])
+        core.write_page_issue_report(cfg["output"], log)
+        if _log_state["file"] is not None:
+            _log_state["file"].close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2956 @@
+"""
+Processing pipeline of the CXC E-Slip Generator: CSV/PDF parsing, matching, slip
+rendering and email delivery. Shared by the Tk app (timeslips.py) and the headless
+batch mode (timeslips_cli.py), so this module must never import tkinter.
+"""
+import re
+import os
+import io
+import sys  # Added for PyInstaller path handling
+import threading
+import time
+import queue
+import csv
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+import shutil
+from datetime import datetime
+
+# PyMuPDF, fpdf2, Pillow and pytesseract (and smtplib/email for delivery) are imported on first
+# use (see get_pil_image, get_tesseract and get_pdf_class) so the window appears before they load.
+
+# ------------------ PATH HELPER ------------------
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    try:
+        # PyInstaller creates a temp folder and stores path in _MEIPASS
+        base_path = sys._MEIPASS
+    except Exception:
+        # resources sit next to this module, whatever the working directory of a scheduled run
+        base_path = os.path.dirname(os.path.abspath(__file__))
+
+    return os.path.join(base_path, relative_path)
+
+# ------------------ CONFIG ------------------
+PREFLIGHT_SAMPLE_PAGES = 3  # pages a preflight check reads from each candidate and centre list
+ASK_TIMETABLE_EVERY_RUN = True  # if True, asks once per unique subject set per run
+COMPACT_BACKGROUND_DPI = 72  # background resolution used for compact (small file) slips
+COMPACT_BACKGROUND_QUALITY = 70  # JPEG quality used for the compact background
+OCR_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))  # candidate list PDFs OCR'd at once in multi-file runs
+OCR_DPI = 350
+OCR_AUTO_CROP = True  # learn the body region (rows, without header/footer/margins) from the first pages
+OCR_BODY_CROP = {}  # fixed body region per stage, e.g. {"candidate_pages": (0.04, 0.11, 0.97, 0.94)} (page fractions)
+OCR_CROP_LEARN_PAGES = 2  # pages OCR'd in full to learn the body region; the first page often has a taller header
+OCR_CROP_PADDING = 0.015  # extra page fraction kept around the learned region
+OCR_PREPROCESS = False  # binarise, deskew and despeckle scanned pages before OCR (needs numpy)
+OCR_MAX_SKEW = 3.0  # degrees searched either way when detecting page skew
+OCR_CONFIG = '--psm 6'
+OCR_PAGE_TIMEOUT = 60  # seconds one Tesseract call may take on a page before it is killed (0 = no limit)
+PREFILTER_DPI = 150  # resolution of the cheap first pass of a prefiltered run over scanned candidate lists
+OCR_RETRY_POLICY = (('--psm 4', None), ('--psm 6', 200))  # (config, dpi or None = OCR_DPI) tried after a failed read
+OCR_STAGE_PROFILES = {"candidate_pages": "candidate_list", "prefilter_pages": "candidate_list_fast",
+                      "centre_pages": "centre_list"}  # OCR_PROFILES entry each stage is read with
+APP_DATA_DIR = os.path.join(os.path.expanduser("~"), ".cxc_eslip")  # persistent, user-writable app data
+TIMETABLE_STORE_PATH = os.path.join(APP_DATA_DIR, "timetables.json")
+SMTP_SETTINGS_PATH = os.path.join(APP_DATA_DIR, "smtp.json")
+ROSTER_DB_PATH = os.path.join(APP_DATA_DIR, "rosters.sqlite3")  # parsed candidate lists, see RosterStore
+
+# ---------------- LOGGING ----------------
+# Log callbacks are called as log(msg) or log(msg, level); without a level it is inferred from the message.
+LOG_DETAIL = 10  # per-page, per-block and per-slip chatter
+LOG_INFO = 20
+LOG_WARNING = 30
+LOG_ERROR = 40
+LOG_LEVEL_NAMES = {LOG_DETAIL: "DETAIL", LOG_INFO: "INFO", LOG_WARNING: "WARNING", LOG_ERROR: "ERROR"}
+
+
+def infer_log_level(msg, level=None):
+    if level is not None:
+        return level
+    head = msg[:8].upper()
+    if head.startswith(("ERROR", "FAILED")):
+        return LOG_ERROR
+    if head.startswith("WARNING"):
+        return LOG_WARNING
+    return LOG_INFO
+
+
+def format_log_line(msg, level):
+    return f"{datetime.now():%Y-%m-%d %H:%M:%S} {LOG_LEVEL_NAMES.get(level, level):<7} {msg}"
+
+
+class RunLogFile:
+    """ Full, unfiltered log of one run, written to a timestamped file in the output folder """
+
+    def __init__(self, output_dir, prefix="eslip_run"):
+        self.path = os.path.join(output_dir, f"{prefix}_{datetime.now():%Y%m%d_%H%M%S}.log")
+        self._lock = threading.Lock()
+        self._file = open(self.path, "a", encoding="utf-8")
+
+    def write(self, lines):
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write("\n".join(lines) + "\n")
+            self._file.flush()
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+# ---------------- PROGRESS ----------------
+# Stages report through a progress(stage, done, total) callback; `done == 0` marks the start of a stage.
+PROGRESS_STAGES = {
+    "centre_pages": "Centre list pages",
+    "candidate_pages": "Candidate list pages",
+    "prefilter_pages": "Prefilter pages",
+    "blocks": "Candidate blocks parsed",
+    "match": "CSV rows matched",
+    "slips": "Slips written",
+    "shard_ocr": "Sharded OCR jobs",
+    "shard_slips": "Sharded slip jobs",
+}
+PROGRESS_EVERY = 50  # cheap per-item stages (blocks, rows) report every N items
+
+
+def format_duration(secs):
+    secs = int(round(secs))
+    if secs >= 3600:
+        return f"{secs // 3600}h{secs % 3600 // 60:02d}m"
+    if secs >= 60:
+        return f"{secs // 60}m{secs % 60:02d}s"
+    return f"{secs}s"
+
+
+class ProgressTracker:
+    """ Keeps done/total, throughput and ETA per stage from progress events """
+
+    def __init__(self):
+        self.stages = {}
+        self._lock = threading.Lock()
+
+    def update(self, stage, done, total, now=None):
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            st = self.stages.get(stage)
+            if st is None or done == 0:
+                st = self.stages[stage] = {"start": now, "done": 0, "total": total, "last": now}
+            st["done"] = done
+            st["total"] = total
+            st["last"] = now
+
+    def rate(self, stage):
+        st = self.stages[stage]
+        elapsed = st["last"] - st["start"]
+        return st["done"] / elapsed if elapsed > 0 else 0.0
+
+    def eta(self, stage):
+        st = self.stages[stage]
+        rate = self.rate(stage)
+        return (st["total"] - st["done"]) / rate if rate else None
+
+    def describe(self, stage):
+        st = self.stages[stage]
+        text = f"{PROGRESS_STAGES.get(stage, stage)}: {st['done']}/{st['total']}"
+        rate = self.rate(stage)
+        if rate:
+            text += f" ({rate:.1f}/s"
+            eta = self.eta(stage)
+            text += f", ETA {format_duration(eta)})" if eta else ")"
+        return text
+
+    def summary(self):
+        lines = []
+        with self._lock:
+            for stage, st in self.stages.items():
+                elapsed = st["last"] - st["start"]
+                rate = st["done"] / elapsed if elapsed > 0 else 0.0
+                lines.append(f"  {PROGRESS_STAGES.get(stage, stage):<24} {st['done']:>7} in "
+                             f"{format_duration(elapsed):>6} ({rate:.1f}/s)")
+        return "Stage throughput:\n" + "\n".join(lines) if lines else ""
+
+# ---------------- TIMING ----------------
+# Hot paths are wrapped in `with timed("name"):`. Spans are only recorded while a run has called
+# start_timings(); otherwise timed() is a no-op, so the instrumentation costs nothing outside a run.
+_active_timings = None
+
+
+class RunTimings:
+    """ Thread-safe recorder of timed spans, exported as a Chrome trace (chrome://tracing, Perfetto) """
+
+    def __init__(self):
+        self.events = []
+        self.threads = {}
+        self._lock = threading.Lock()
+        self._t0 = time.perf_counter()
+        self._end = None
+
+    def add(self, name, start, end, cat="pipeline", args=None):
+        thread = threading.current_thread()
+        event = {"name": name, "cat": cat, "ph": "X", "pid": os.getpid(), "tid": thread.ident,
+                 "ts": round((start - self._t0) * 1e6, 1), "dur": round((end - start) * 1e6, 1)}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+            self.threads.setdefault(thread.ident, thread.name)
+
+    @contextmanager
+    def span(self, name, cat="pipeline", args=None):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter(), cat, args)
+
+    def stop(self):
+        self._end = time.perf_counter()
+
+    def wall_time(self):
+        return (self._end or time.perf_counter()) - self._t0
+
+    def write_chrome_trace(self, path):
+        with self._lock:
+            events = list(self.events)
+            threads = dict(self.threads)
+        meta = [{"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": name}}
+                for tid, name in threads.items()]
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": meta + events, "displayTimeUnit": "ms"}, f)
+        return path
+
+    def summary(self):
+        totals = {}
+        with self._lock:
+            for ev in self.events:
+                t = totals.setdefault(ev["name"], [0, 0.0, 0.0])
+                t[0] += 1
+                t[1] += ev["dur"]
+                t[2] = max(t[2], ev["dur"])
+        if not totals:
+            return ""
+        wall_ms = self.wall_time() * 1000
+        lines = [f"  {'span':<22} {'count':>7} {'total ms':>10} {'mean ms':>9} {'max ms':>9} {'% run':>6}"]
+        for name, (count, total, longest) in sorted(totals.items(), key=lambda kv: -kv[1][1]):
+            total_ms = total / 1000
+            share = 100 * total_ms / wall_ms if wall_ms else 0.0
+            lines.append(f"  {name:<22} {count:>7} {total_ms:>10.1f} {total_ms / count:>9.2f} "
+                         f"{longest / 1000:>9.2f} {share:>5.1f}%")
+        return f"Timing summary ({wall_ms / 1000:.2f}s wall; spans on worker threads overlap):\n" + "\n".join(lines)
+
+
+def start_timings():
+    global _active_timings
+    _active_timings = RunTimings()
+    return _active_timings
+
+
+def stop_timings():
+    global _active_timings
+    timings, _active_timings = _active_timings, None
+    if timings is not None:
+        timings.stop()
+    return timings
+
+
+def timed(name, cat="pipeline", **args):
+    timings = _active_timings
+    if timings is None:
+        return nullcontext()
+    return timings.span(name, cat, args)
+
+
+def record_span(name, start, cat="pipeline", **args):
+    """ Record a span that began at `start` (a time.perf_counter() value) and ends now """
+    timings = _active_timings
+    if timings is not None:
+        timings.add(name, start, time.perf_counter(), cat, args)
+
+
+def write_timing_report(timings, output_dir, log, trace=True):
+    """ Log the summary table and, if asked, write the Chrome trace next to the slips """
+    if timings is None:
+        return None
+    summary = timings.summary()
+    if summary:
+        log(summary)
+    if not trace:
+        return None
+    path = os.path.join(output_dir, f"eslip_trace_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    try:
+        timings.write_chrome_trace(path)
+        log(f"Timing trace written: {path} (open in chrome://tracing or ui.perfetto.dev)")
+        return path
+    except OSError as e:
+        log(f"WARNING: could not write timing trace: {e}")
+        return None
+
+# ---------------- RUN CONTROL ----------------
+# cancel_run() is safe to call from any thread (e.g. the Tk Cancel button). Page loops raise
+# RunCancelled at the next page; slip loops stop writing at the next slip and return what they have.
+_cancel_event = threading.Event()
+_page_issues = []
+_page_issues_lock = threading.Lock()
+PAGE_ISSUE_FIELDS = ["file", "stage", "page", "status", "attempts", "detail"]
+
+
+class RunCancelled(Exception):
+    pass
+
+
+def cancel_run():
+    _cancel_event.set()
+
+
+def cancel_requested():
+    return _cancel_event.is_set()
+
+
+def check_cancelled():
+    if _cancel_event.is_set():
+        raise RunCancelled("Run cancelled.")
+
+
+def reset_run_control():
+    """ Clear a previous cancel and the page issue list; call at the start of every run """
+    _cancel_event.clear()
+    with _page_issues_lock:
+        _page_issues.clear()
+
+
+def record_page_issue(pdf_path, stage, page, status, attempts, detail):
+    with _page_issues_lock:
+        _page_issues.append({"file": os.path.basename(pdf_path), "stage": stage, "page": page, "status": status,
+                             "attempts": attempts, "detail": detail})
+
+
+def take_page_issues():
+    """ The page issues recorded so far, clearing the list (a shard worker hands them over per job) """
+    with _page_issues_lock:
+        issues = list(_page_issues)
+        _page_issues.clear()
+    return issues
+
+
+def write_page_issue_report(output_dir, log):
+    """ Log and write to CSV the pages that timed out, needed a retry or were skipped in this run """
+    with _page_issues_lock:
+        issues = list(_page_issues)
+    if not issues:
+        return None
+    skipped = [i for i in issues if i["status"] == "skipped"]
+    log(f"OCR page issues: {len(skipped)} page(s) skipped, {len(issues) - len(skipped)} recovered by a retry.")
+    for i in skipped:
+        log(f"  Skipped {i['file']} page {i['page']}: {i['detail']}", LOG_WARNING)
+    path = os.path.join(output_dir, f"eslip_page_issues_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv")
+    try:
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=PAGE_ISSUE_FIELDS)
+            writer.writeheader()
+            writer.writerows(issues)
+        log(f"Page issue report written: {path}")
+        return path
+    except OSError as e:
+        log(f"WARNING: could not write page issue report: {e}")
+        return None
+
+# ---------------- TESSERACT CONFIG ----------------
+_lazy_lock = threading.Lock()
+_lazy_modules = {}
+
+
+def find_tesseract_cmd():
+    """ Locate the Tesseract binary once; None if it is not installed """
+    with _lazy_lock:
+        if "tesseract_cmd" not in _lazy_modules:
+            # 1. Look for Tesseract bundled inside the Exe
+            # 2. Fallback to standard install location (for dev mode), then PATH
+            candidates = []
+            if os.name == "nt":
+                candidates = [resource_path(os.path.join("Tesseract-OCR", "tesseract.exe")),
+                              r"C:\Program Files\Tesseract-OCR\tesseract.exe"]
+            found = next((p for p in candidates if os.path.exists(p)), None) or shutil.which("tesseract")
+            _lazy_modules["tesseract_cmd"] = found
+        return _lazy_modules["tesseract_cmd"]
+
+
+def get_pil_image():
+    """ PIL.Image, imported on first use; None if Pillow is not installed """
+    with _lazy_lock:
+        if "PIL" not in _lazy_modules:
+            try:
+                from PIL import Image
+            except ImportError:
+                Image = None
+            _lazy_modules["PIL"] = Image
+        return _lazy_modules["PIL"]
+
+
+def get_numpy():
+    """ numpy, imported on first use; None if it is not installed (page preprocessing is then skipped) """
+    with _lazy_lock:
+        if "numpy" not in _lazy_modules:
+            try:
+                import numpy
+            except ImportError:
+                numpy = None
+            _lazy_modules["numpy"] = numpy
+        return _lazy_modules["numpy"]
+
+
+def get_tesseract():
+    """ pytesseract pointed at the discovered binary; None if either is missing """
+    cmd = find_tesseract_cmd()
+    with _lazy_lock:
+        if "pytesseract" not in _lazy_modules:
+            try:
+                import pytesseract
+            except ImportError:
+                pytesseract = None
+            if pytesseract and cmd:
+                pytesseract.pytesseract.tesseract_cmd = cmd
+            _lazy_modules["pytesseract"] = pytesseract if cmd else None
+        return _lazy_modules["pytesseract"]
+
+# ---------------- SUBJECT MAP ----------------
+SUBJECT_CODE_MAP = {
+    "ENGAG": "English A",
+    "ENGBG": "English B",
+    "MATHG": "Mathematics",
+    "HISTG": "History",
+    "GEOGG": "Geography",
+    "BIOLG": "Biology",
+    "CHEMG": "Chemistry",
+    "PHYSICSG": "Physics",
+    "ECONG": "Economics",
+    "PRINBG": "Principles of Business",
+    "PRINAG": "Principles of Accounts",
+    "SPANSG": "Spanish",
+    "FRNCHG": "French",
+    "ITG": "Information Technology",
+    "ADDMTG": "Additional Mathematics",
+    "OFFADG": "Office Administration",
+    "AGSBG": "Agricultural Science (Double Award)",
+    "AGSCG": "Agricultural Science (Single Award)",
+    "SOCSG": "Social Studies",
+    "INTSG": "Integrated Science",
+    "HUMANG": "Human & Social Biology",
+    "TDSCG": "Technical Drawing",
+    "MECHTG": "Mechanical Engineering Technology",
+    "FOODNG": "Food & Nutrition",
+    "HTMG": "Hospitality Management",
+    "ARTSG": "Visual Arts",
+    "MUSCG": "Music",
+    "DANCIG": "Dance",
+    "THEATG": "Theatre Arts",
+    "PHEDUG": "Physical Education",
+    "CARITEG": "Caribbean History",
+    "SOCSTUDG": "Social Studies",
+    "OAG": "Office Administration",
+    "POAG": "Principles of Accounts",
+    "HSBIOG": "Human and Social Biology",
+    "POBG": "Principles of Business",
+    "INTSCIG": "Integrated Science S/A",
+    "BIOG": "Biology",
+    "ADDMATH": "Additional Mathematics",
+    "CARHISTG": "Caribbean History",
+    "GEOG": "Geography",
+    "SPANG": "Spanish",
+    "FRENG": "French",
+    "PORTG": "Portuguese",
+    "EDPMG": "Electronic Document Preparation & Management",
+    "RELIGEDG": "Religious Education",
+    "TECHDRG": "Technical Drawing",
+    "AGSCIDAG": "Agricultural Science D/A",
+    "AGSCISAG": "Agricultural Science S/A",
+    "INDTECHG": "Industrial Technology",
+    "FASHION": "Textiles, Clothing & Fashion",
+    "FOODNUTH": "Food, Nutrition & Health",
+    "FAMRESMG": "Family & Resource Management",
+    "MUSICG": "Music",
+    "PEASPORT": "Physical Education & Sport",
+    "THEARTSG": "Theatre Arts",
+    "VISARTSG": "Visual Arts",
+    "ACCU1": "Accounting Unit 1",
+    "ACCU2": "Accounting Unit 2",
+    "AMTU1": "Applied Mathematics Unit 1",
+    "AMTU2": "Applied Mathematics Unit 2",
+    "BIOU1": "Biology Unit 1",
+    "BIOU2": "Biology Unit 2",
+    "CARSTDU1": "Caribbean Studies",
+    "CHEMU1": "Chemistry Unit 1",
+    "CHEMU2": "Chemistry Unit 2",
+    "COMMSTU1": "Communication Studies",
+    "ECONU1": "Economics Unit 1",
+    "ECONU2": "Economics Unit 2",
+    "ENTRU1": "Entrepreneurship Unit 1",
+    "ENTRU2": "Entrepreneurship Unit 2",
+    "ENSCU1": "Environmental Science Unit 1",
+    "ENSCU2": "Environmental Science Unit 2",
+    "FRENU1": "French Unit 1",
+    "FRENU2": "French Unit 2",
+    "GEOU1": "Geography Unit 1",
+    "GEOU2": "Geography Unit 2",
+    "HISTU2": "History Unit 2",
+    "INMATU1": "Integrated Mathematics",
+    "INTHU1": "Information Technology Unit 1",
+    "INTHU2": "Information Technology Unit 2",
+    "LAWU1": "Law Unit 1",
+    "LAWU2": "Law Unit 2",
+    "LIEU1": "Literatures in English Unit 1",
+    "LIEU2": "Literatures in English Unit 2",
+    "MOBU1": "Management of Business Unit 1",
+    "MOBU2": "Management of Business Unit 2",
+    "PHYU1": "Physics Unit 1",
+    "PHYU2": "Physics Unit 2",
+    "PMATHU1": "Pure Mathematics Unit 1",
+    "PMATHU2": "Pure Mathematics Unit 2",
+    "SOCU1": "Sociology Unit 1",
+    "SOCU2": "Sociology Unit 2",
+    "SPU1": "Spanish Unit 1",
+    "SPU2": "Spanish Unit 2",
+    "TOURU1": "Tourism Unit 1",
+    "TOURU2": "Tourism Unit 2"
+}
+
+SUBJECT_TYPES = ("A", "G", "R")  # entry type letters printed after a subject code, e.g. MATHG-G
+SUBJECT_CODE_PATTERN = re.compile(r"([A-Z]{3,8})(?:-([A-Z]))?") 
+DATE_PATTERN = re.compile(r"\b(\d{2}/\d{2}/\d{4})\b")
+CANDIDATE_NUM_PATTERN = re.compile(r"\b(\d{10})\b")
+CENTRE_CODE_PATTERN = re.compile(r"\b(\d{6})\b")
+NAME_PATTERN = re.compile(r"^[A-Z'\- ]+,\s*[A-Z'\- ]+(?:\s+[A-Z'\- ]+)*$")
+EMAIL_PATTERN = re.compile(r"^[^@\s,;]+@[^@\s,;]+\.[A-Za-z]{2,}$")
+
+
+# ---------------- RECORDS ----------------
+# A national run holds hundreds of thousands of these, so they are slotted records rather than dicts and
+# the strings that repeat on every record (subject codes, type letters, gender words) are shared.
+GENDER_WORDS = {"M": "Male", "F": "Female"}
+_subject_cache = {}
+
+
+class Subject:
+    """ One subject entry on a candidate list: SUBJECT_CODE_MAP code and entry type letter (or 'N/A') """
+    __slots__ = ("code", "type")
+
+    def __init__(self, code, type='N/A'):
+        self.code = sys.intern(code)
+        self.type = sys.intern(type or 'N/A')
+
+    def __eq__(self, other):
+        return isinstance(other, Subject) and self.code == other.code and self.type == other.type
+
+    def __hash__(self):
+        return hash((self.code, self.type))
+
+    def __repr__(self):
+        return f"Subject({self.code!r}, {self.type!r})"
+
+    def __reduce__(self):
+        return make_subject, (self.code, self.type)
+
+
+def make_subject(code, type='N/A'):
+    """ Shared Subject per (code, type); there are only a few hundred distinct ones, so never build copies """
+    key = (code, type or 'N/A')
+    subject = _subject_cache.get(key)
+    if subject is None:
+        subject = _subject_cache.setdefault(key, Subject(*key))
+    return subject
+
+
+class Candidate:
+    """ A candidate from the candidate list or a manual entry dialog; email is set once matched to the CSV """
+    __slots__ = ("id", "name", "dob", "gender", "subjects", "email")
+
+    def __init__(self, id, name, dob, gender="N/A", subjects=(), email=""):
+        self.id = id
+        self.name = name
+        self.dob = dob
+        self.gender = sys.intern(gender)
+        self.subjects = tuple(subjects)
+        self.email = email
+
+    @property
+    def centre_num(self):
+        return self.id[:6]
+
+    @property
+    def seq_num(self):
+        return self.id[6:]
+
+    def with_email(self, email):
+        return Candidate(self.id, self.name, self.dob, self.gender, self.subjects, email)
+
+    def __repr__(self):
+        return f"Candidate({self.id!r}, {self.name!r}, {self.dob!r})"
+
+    def __reduce__(self):
+        return Candidate, (self.id, self.name, self.dob, self.gender, self.subjects, self.email)
+
+
+class Applicant:
+    """ An eligible row of the CSV export; only what matching and delivery need is kept, not the raw row """
+    __slots__ = ("name", "dob", "email", "line")
+
+    def __init__(self, name, dob, email="", line=0):
+        self.name = name
+        self.dob = dob
+        self.email = email
+        self.line = line  # line number in the CSV export, for review files
+
+    def __repr__(self):
+        return f"Applicant({self.name!r}, {self.dob!r})"
+
+    def __reduce__(self):
+        return Applicant, (self.name, self.dob, self.email, self.line)
+
+
+# ---------------- CSV PARSER (ROUTER) ----------------
+CSV_REQUIRED_COLUMNS = {
+    "may_june": ("Additional Application Service - sent via email", "Last Name", "First Name", "Date Of Birth"),
+    # the January export's headers are matched on these fragments (name, service, date of birth)
+    "january": ("Full Name - name of candidate participating in CSEC January 2026 examination.",
+                "Application Processing Type - sent via email", "Date of Birth"),
+}
+
+
+def csv_layout(exam_type, exam_month):
+    """ The CSV_REQUIRED_COLUMNS key of the export format used for an exam session """
+    return "january" if exam_type == "CSEC" and exam_month == "January" else "may_june"
+
+
+def parse_csv(csv_path, exam_type, exam_month, log_callback):
+    if csv_layout(exam_type, exam_month) == "january":
+        log_callback("Using CSEC January CSV parser.")
+        with timed("csv ingest", parser="january"):
+            return parse_csv_january(csv_path, log_callback)
+    else:
+        log_callback("Using standard May/June CSV parser.")
+        with timed("csv ingest", parser="may_june"):
+            return parse_csv_may_june(csv_path, exam_type, log_callback)
+
+
+def file_log(log, path):
+    """ Wrap a log callback so messages from one of several input files say which file they came from """
+    name = os.path.basename(path)
+
+    def wrapped(msg, level=None):
+        log(f"[{name}] {msg}", infer_log_level(msg, level))
+    return wrapped
+
+
+def parse_csvs(csv_paths, exam_type, exam_month, log_callback):
+    """ Parse several CSV exports into one eligibility list; an applicant in more than one export is kept once """
+    if len(csv_paths) == 1:
+        return parse_csv(csv_paths[0], exam_type, exam_month, log_callback)
+    eligible = []
+    seen = set()
+    duplicates = 0
+    for path in csv_paths:
+        rows = parse_csv(path, exam_type, exam_month, file_log(log_callback, path))
+        for row in rows:
+            key = (normalize_key_name(row.name), row.dob)
+            if key in seen:
+                duplicates += 1
+                continue
+            seen.add(key)
+            eligible.append(row)
+    if duplicates:
+        log_callback(f"CSV: skipped {duplicates} applicant(s) listed in more than one export.")
+    log_callback(f"CSV: {len(eligible)} eligible applicant(s) from {len(csv_paths)} export(s).")
+    return eligible
+
+
+def parse_csv_may_june(csv_path, exam_type, log_callback):
+    eligible = []
+    try:
+        with open(csv_path, newline='', encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            log_callback(f"DEBUG: Reading {csv_path} for May/June...", LOG_DETAIL)
+            
+            row_count = 0
+            for row in reader:
+                row_count += 1
+                service = row.get("Additional Application Service - sent via email", "").strip()
+
+                if service not in [
+                    "E-candidate slip/Timetable only- $30",
+                    "Error recognition & E-candidate slip/Timetable- $50"
+                ]:
+                    continue
+
+                if "Choose Examination" in row and row["Choose Examination"].strip():
+                    exam_in_csv = row["Choose Examination"].strip().upper()
+                    if exam_in_csv != exam_type.upper():
+                        continue
+
+                last = (row.get("Last Name", "")).strip()
+                first = (row.get("First Name", "")).strip()
+                middle = (row.get("Middle Name", "")).strip()
+                name = normalize_name_csv(last, first, middle)
+
+                dob = normalize_dob(row.get("Date Of Birth", ""))
+                if not dob:
+                    continue
+
+                eligible.append(Applicant(name, dob, find_email(row), reader.line_num))
+        log_callback(f"CSV: {len(eligible)} candidate(s) eligible for e-slips after filtering.")
+        return eligible
+    except Exception as e:
+        log_callback(f"ERROR parsing May/June CSV: {e}")
+        return []
+
+
+def parse_csv_january(csv_path, log_callback):
+    eligible = []
+    name_col, service_col, dob_col = CSV_REQUIRED_COLUMNS["january"]
+
+    try:
+        with open(csv_path, newline='', encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+
+            if not reader.fieldnames:
+                log_callback("ERROR: CSV file is empty or unreadable.")
+                return []
+
+            try:
+                name_header = next(h for h in reader.fieldnames if name_col in h)
+                service_header = next(h for h in reader.fieldnames if service_col in h)
+                dob_header = next(h for h in reader.fieldnames if dob_col in h)
+            except StopIteration:
+                log_callback("ERROR: CSEC January CSV is missing required columns.")
+                return []
+
+            row_count = 0
+            for row in reader:
+                row_count += 1
+                service = row.get(service_header, "").strip()
+
+                eligible_services = [
+                    "Generate E-candidate slip/Timetable only- $30",
+                    "Error recognition & E-candidate slip/Timetable- $50",
+                    "E-candidate slip/Timetable only- $30",
+                    "Error correction & E-candidate slip/Timetable- $50"
+                ]
+
+                if service not in eligible_services:
+                    continue
+
+                full_name_str = row.get(name_header, "").strip()
+                name = normalize_name_from_full(full_name_str)
+
+                dob = normalize_dob(row.get(dob_header, ""))
+                if not dob:
+                    continue
+
+                eligible.append(Applicant(name, dob, find_email(row), reader.line_num))
+        log_callback(f"CSV: {len(eligible)} candidate(s) eligible for e-slips after filtering.")
+        return eligible
+    except Exception as e:
+        log_callback(f"ERROR parsing CSEC January CSV: {e}")
+        return []
+
+
+def find_email(row):
+    """ Pick the applicant's email from a raw CSV row, preferring columns whose header mentions email """
+    headers = sorted(row, key=lambda h: "email" not in (h or "").lower())
+    for h in headers:
+        val = (row.get(h) or "").strip()
+        if EMAIL_PATTERN.match(val):
+            return val
+    return ""
+
+
+# ---------------- OCR PROFILES ----------------
+# Tesseract tuned per document type: page segmentation mode, the characters it may output, the subject
+# codes as extra dictionary words and the trained model ("fast" or "best" tessdata, when installed).
+# Whitelist and word list go into a generated config file, so no quoting is needed on the command line.
+CANDIDATE_LIST_CHARS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789/,'-."
+CENTRE_LIST_CHARS = CANDIDATE_LIST_CHARS + "abcdefghijklmnopqrstuvwxyz&()"
+OCR_PROFILES = {
+    "generic": {},  # OCR_CONFIG with Tesseract's own dictionary and default model
+    "candidate_list": {"psm": 6, "whitelist": CANDIDATE_LIST_CHARS, "subject_words": True},
+    "candidate_list_fast": {"psm": 6, "whitelist": CANDIDATE_LIST_CHARS, "subject_words": True, "model": "fast"},
+    "candidate_list_best": {"psm": 6, "whitelist": CANDIDATE_LIST_CHARS, "subject_words": True, "model": "best"},
+    "centre_list": {"psm": 6, "whitelist": CENTRE_LIST_CHARS},
+    "centre_list_fast": {"psm": 6, "whitelist": CENTRE_LIST_CHARS, "model": "fast"},
+}
+OCR_PROFILE_DIR = os.path.join(APP_DATA_DIR, "ocr")  # generated config files and subject word list
+_profile_args = {}
+
+
+def subject_words():
+    """ Every subject code as printed on candidate lists: bare and with each entry type letter """
+    return [word for code in sorted(SUBJECT_CODE_MAP) for word in [code] + [f"{code}-{t}" for t in SUBJECT_TYPES]]
+
+
+def find_ocr_model_dir(model):
+    """ tessdata_<model> folder holding eng.traineddata next to Tesseract or in APP_DATA_DIR; None if missing """
+    name = f"tessdata_{model}"
+    cmd = find_tesseract_cmd()
+    candidates = [resource_path(os.path.join("Tesseract-OCR", name)), os.path.join(APP_DATA_DIR, name)]
+    if cmd:
+        candidates.insert(0, os.path.join(os.path.dirname(cmd), name))
+    return next((d for d in candidates if os.path.exists(os.path.join(d, "eng.traineddata"))), None)
+
+
+def tesseract_path_arg(path):
+    return f'"{path}"' if any(ch.isspace() for ch in path) else path
+
+
+def write_if_changed(path, content):
+    try:
+        with open(path, encoding="utf-8") as f:
+            if f.read() == content:
+                return
+    except OSError:
+        pass
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+def ocr_profile_args(name, log):
+    """
+    Tesseract arguments a profile adds to every attempt's --psm config (model folder and config file).
+    Built once per profile; a missing model falls back to the default one and a config file that cannot
+    be written drops the whitelist and word list, both with one log line.
+    """
+    with _lazy_lock:
+        if name in _profile_args:
+            return _profile_args[name]
+    profile = OCR_PROFILES[name]
+    args = []
+    if profile.get("model"):
+        model_dir = find_ocr_model_dir(profile["model"])
+        if model_dir:
+            args.append(f"--tessdata-dir {tesseract_path_arg(model_dir)}")
+        else:
+            log(f"OCR profile {name}: tessdata_{profile['model']} is not installed, using the default model.",
+                LOG_INFO)
+    lines = []
+    if profile.get("whitelist"):
+        lines.append(f"tessedit_char_whitelist {profile['whitelist']}")
+    try:
+        if profile.get("subject_words"):
+            os.makedirs(OCR_PROFILE_DIR, exist_ok=True)
+            words_path = os.path.join(OCR_PROFILE_DIR, "subject_words.txt")
+            write_if_changed(words_path, "\n".join(subject_words()) + "\n")
+            lines.append(f"user_words_file {words_path}")
+        if lines:
+            os.makedirs(OCR_PROFILE_DIR, exist_ok=True)
+            config_path = os.path.join(OCR_PROFILE_DIR, f"{name}.cfg")
+            write_if_changed(config_path, "\n".join(lines) + "\n")
+            args.append(tesseract_path_arg(config_path))  # config files go last on the Tesseract command line
+    except OSError as e:
+        log(f"WARNING: could not write the {name} OCR profile ({e}); reading without its whitelist.")
+    with _lazy_lock:
+        return _profile_args.setdefault(name, " ".join(args))
+
+
+def ocr_profile_psm(name):
+    """ The profile's --psm config, or OCR_CONFIG for a profile without one """
+    psm = OCR_PROFILES[name].get("psm")
+    return f"--psm {psm}" if psm is not None else OCR_CONFIG
+
+
+# ---------------- SCAN PREPROCESSING ----------------
+# Works on the rendered grayscale pixmap as a numpy array; every step is a whole-array operation.
+def pixmap_to_gray_array(pix):
+    np = get_numpy()
+    return np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+
+
+def adaptive_binarize(gray, window, offset=0.12):
+    """ Ink mask: pixels darker than their window's mean by more than `offset` (Bradley local thresholding) """
+    np = get_numpy()
+    h, w = gray.shape
+    # box sums from cumulative sums of the edge-padded page; int32 holds a window of a 350 DPI page
+    padded = np.pad(gray, window // 2 + 1, mode="edge")
+    cum = np.cumsum(padded, axis=0, dtype=np.int32)
+    vert = cum[window:window + h] - cum[:h]
+    cum = np.cumsum(vert, axis=1, dtype=np.int32)
+    box = cum[:, window:window + w] - cum[:, :w]
+    return gray.astype(np.int32) * (window * window) < box * (1 - offset)
+
+
+def detect_skew(ink, max_angle=OCR_MAX_SKEW, step=0.1):
+    """ Skew in degrees whose row projection of the ink is sharpest (text lines line up with rows) """
+    np = get_numpy()
+    ys, xs = np.nonzero(ink[::4, ::4])
+    if len(ys) < 200:
+        return 0.0
+    if len(ys) > 60000:
+        keep = np.linspace(0, len(ys) - 1, 60000).astype(np.intp)
+        ys, xs = ys[keep], xs[keep]
+    angles = np.arange(-max_angle, max_angle + step / 2, step)
+    shifted = np.rint(ys[None, :] - xs[None, :] * np.tan(np.radians(angles))[:, None]).astype(np.int64)
+    shifted -= shifted.min()
+    span = int(shifted.max()) + 1
+    hist = np.bincount((shifted + np.arange(len(angles))[:, None] * span).ravel(),
+                       minlength=len(angles) * span).reshape(len(angles), span)
+    scores = (hist.astype(np.float64) ** 2).sum(axis=1)
+    return float(angles[int(np.argmax(scores))])
+
+
+def remove_speckles(ink, passes=2):
+    """ Drop ink pixels with fewer than two inked neighbours; text strokes at OCR DPI are never that thin """
+    np = get_numpy()
+    for _ in range(passes):
+        p = np.pad(ink, 1).astype(np.uint8)
+        h, w = ink.shape
+        neighbours = (p[:-2, :-2] + p[:-2, 1:-1] + p[:-2, 2:] + p[1:-1, :-2] + p[1:-1, 2:]
+                      + p[2:, :-2] + p[2:, 1:-1] + p[2:, 2:])
+        ink = ink & (neighbours >= 2)
+    return ink
+
+
+def preprocess_scan(gray, dpi=None):
+    """ Binarise, deskew and despeckle a grayscale page array; returns (PIL image for OCR, skew corrected) """
+    np = get_numpy()
+    Image = get_pil_image()
+    window = max(15, (dpi or OCR_DPI) // 6) | 1
+    ink = adaptive_binarize(gray, window)
+    angle = detect_skew(ink)
+    if abs(angle) >= 0.05:
+        img = Image.fromarray(np.where(ink, 0, 255).astype(np.uint8))
+        img = img.rotate(angle, resample=Image.BILINEAR, fillcolor=255)
+        ink = np.asarray(img) < 128
+    else:
+        angle = 0.0
+    ink = remove_speckles(ink)
+    return Image.fromarray(np.where(ink, 0, 255).astype(np.uint8)), angle
+
+
+# ---------------- PDF TEXT HELPERS ----------------
+def line_boxes_from_ocr(pytesseract, img, config, timeout=0):
+    """ [(text, x0, y0, x1, y1)] for each OCR line, as fractions of the image size """
+    data = pytesseract.image_to_data(img, config=config, output_type=pytesseract.Output.DICT, timeout=timeout)
+    lines = {}
+    for i, word in enumerate(data["text"]):
+        if not word.strip():
+            continue
+        x, y = data["left"][i], data["top"][i]
+        box = lines.setdefault((data["block_num"][i], data["par_num"][i], data["line_num"][i]), [[], x, y, x, y])
+        box[0].append(word)
+        box[1], box[2] = min(box[1], x), min(box[2], y)
+        box[3], box[4] = max(box[3], x + data["width"][i]), max(box[4], y + data["height"][i])
+    w, h = img.size
+    return [(" ".join(words), x0 / w, y0 / h, x1 / w, y1 / h) for words, x0, y0, x1, y1 in lines.values()]
+
+
+def line_boxes_from_text_layer(page):
+    lines = {}
+    for x0, y0, x1, y1, word, block, line, _ in page.get_text("words"):
+        box = lines.setdefault((block, line), [[], x0, y0, x1, y1])
+        box[0].append(word)
+        box[1], box[2], box[3], box[4] = min(box[1], x0), min(box[2], y0), max(box[3], x1), max(box[4], y1)
+    w, h = page.rect.width, page.rect.height
+    return [(" ".join(words), x0 / w, y0 / h, x1 / w, y1 / h) for words, x0, y0, x1, y1 in lines.values()]
+
+
+def learn_body_crop(line_boxes, body_pattern, padding=OCR_CROP_PADDING):
+    """
+    Region of one page holding the body rows: from the first to the last line matching body_pattern
+    (plus lines that directly continue the last row), padded. None if no line matches.
+    """
+    lines = sorted(line_boxes, key=lambda b: b[2])
+    body = [i for i, b in enumerate(lines) if body_pattern.search(b[0])]
+    if not body:
+        return None
+    first, last = body[0], body[-1]
+    gaps = sorted(max(0.0, lines[j + 1][2] - lines[j][4]) for j in range(first, last))
+    row_gap = gaps[len(gaps) // 2] if gaps else lines[last][4] - lines[last][2]
+    # a wrapped last row continues at the usual row spacing; a footer sits further down
+    while last + 1 < len(lines) and lines[last + 1][2] - lines[last][4] <= 1.5 * row_gap:
+        last += 1
+    region = lines[first:last + 1]
+    return (max(0.0, min(b[1] for b in region) - padding), max(0.0, min(b[2] for b in region) - padding),
+            min(1.0, max(b[3] for b in region) + padding), min(1.0, max(b[4] for b in region) + padding))
+
+
+def configure_ocr(auto_crop=None, body_crop=None, preprocess=None, page_timeout=None, profiles=None):
+    """
+    Override OCR_AUTO_CROP, OCR_BODY_CROP ({stage: (left, top, right, bottom)}), OCR_PREPROCESS,
+    OCR_PAGE_TIMEOUT (seconds, 0 = no limit) and OCR_STAGE_PROFILES ({stage: OCR_PROFILES name})
+    """
+    global OCR_AUTO_CROP, OCR_PREPROCESS, OCR_PAGE_TIMEOUT
+    if auto_crop is not None:
+        OCR_AUTO_CROP = bool(auto_crop)
+    if preprocess is not None:
+        OCR_PREPROCESS = bool(preprocess)
+    if page_timeout is not None:
+        if page_timeout < 0:
+            raise ValueError("OCR page timeout must be 0 (no limit) or a number of seconds")
+        OCR_PAGE_TIMEOUT = page_timeout
+    for stage, name in (profiles or {}).items():
+        if stage not in OCR_STAGE_PROFILES:
+            raise ValueError(f"Unknown OCR stage {stage!r}; expected one of {', '.join(OCR_STAGE_PROFILES)}")
+        if name not in OCR_PROFILES:
+            raise ValueError(f"Unknown OCR profile {name!r}; expected one of {', '.join(OCR_PROFILES)}")
+        OCR_STAGE_PROFILES[stage] = name
+    for stage, crop in (body_crop or {}).items():
+        if crop:
+            left, top, right, bottom = (float(v) for v in crop)
+            if not (0 <= left < right <= 1 and 0 <= top < bottom <= 1):
+                raise ValueError(f"OCR crop for {stage} must be page fractions left < right, top < bottom")
+            OCR_BODY_CROP[stage] = (left, top, right, bottom)
+        else:
+            OCR_BODY_CROP.pop(stage, None)
+
+
+def union_crop(crops):
+    return (min(c[0] for c in crops), min(c[1] for c in crops), max(c[2] for c in crops), max(c[3] for c in crops))
+
+
+def extract_text_from_pdf(pdf_path, log, output_dir, progress=None, stage="candidate_pages", body_pattern=None,
+                          pages=None):
+    """ Text of the whole PDF (or of the given page indexes), see iter_pdf_text """
+    return "\n".join(text for _, text in iter_pdf_text(pdf_path, log, progress, stage, body_pattern, pages=pages))
+
+
+def iter_pdf_text(pdf_path, log, progress=None, stage="candidate_pages", body_pattern=None, text_layer_first=False,
+                  pages=None, dpi=None):
+    """
+    Yield (page index, cleaned text) page by page, so a caller can stop reading early. `pages`
+    limits the read to those page indexes; `dpi` overrides OCR_DPI for the first OCR attempt.
+    OCR every page (or read its text layer without Tesseract). With text_layer_first, a page whose
+    text layer already has body_pattern matches is read from it instead of OCR'd. With a body_pattern, the first
+    OCR_CROP_LEARN_PAGES pages are read in full to learn where the body rows sit, and later pages
+    only render and OCR that region (or use OCR_BODY_CROP[stage] from the start).
+    Tesseract runs with the stage's OCR_STAGE_PROFILES profile (whitelist, word list, model).
+    A page whose OCR times out or fails is retried per OCR_RETRY_POLICY and skipped (and reported)
+    if every attempt fails. Raises RunCancelled at the next page after cancel_run().
+    """
+    import pymupdf  # PyMuPDF, deferred until the first PDF is read
+
+    pytesseract = get_tesseract()
+    Image = get_pil_image() if pytesseract else None
+    use_ocr = bool(pytesseract and Image)
+    preprocess = use_ocr and OCR_PREPROCESS and get_numpy() is not None
+    if use_ocr and OCR_PREPROCESS and not preprocess:
+        log("Warning: numpy is not installed, so pages are OCR'd without preprocessing.")
+    skews = {}
+    doc = pymupdf.open(pdf_path)
+    page_count = len(doc)
+    selected = [i for i in range(page_count) if pages is None or i in pages]
+
+    crop = OCR_BODY_CROP.get(stage) if body_pattern else None
+    learning = body_pattern is not None and crop is None and OCR_AUTO_CROP and len(selected) > OCR_CROP_LEARN_PAGES
+    learned = []
+    pixels = {"full": 0, "read": 0}
+    profile = OCR_STAGE_PROFILES.get(stage, "generic")
+    attempts = ((ocr_profile_psm(profile), dpi),) + tuple(OCR_RETRY_POLICY)
+    profile_args = ocr_profile_args(profile, log) if use_ocr else ""
+    if progress:
+        progress(stage, 0, len(selected))
+    if not use_ocr:
+        log("Tesseract/Pillow not found, falling back to simple text extraction.", LOG_DETAIL)
+
+    def render(i, page, clip, dpi):
+        with timed("page render", page=i + 1):
+            if preprocess:
+                pix = page.get_pixmap(dpi=dpi, clip=clip, colorspace=pymupdf.csGRAY)
+            else:
+                pix = page.get_pixmap(dpi=dpi, clip=clip)
+                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+        if preprocess:
+            with timed("preprocess", page=i + 1):
+                img, angle = preprocess_scan(pixmap_to_gray_array(pix), dpi)
+            if angle:
+                skews[i] = angle
+        pixels["read"] += pix.width * pix.height
+        return img
+
+    def read_page(i, page, clip, learn):
+        """ (text, line boxes if learn); (None, None) when every OCR attempt failed """
+        scale = (dpi or OCR_DPI) / 72
+        pixels["full"] += int(page.rect.width * scale) * int(page.rect.height * scale)
+        if not use_ocr:
+            with timed("text layer", page=i + 1):
+                txt = page.get_text("text", clip=clip) or ""
+            boxes = line_boxes_from_text_layer(page) if learn else None
+            return txt, boxes
+        if text_layer_first:
+            with timed("text layer", page=i + 1):
+                txt = page.get_text("text", clip=clip) or ""
+            if body_pattern.search(txt):
+                return txt, line_boxes_from_text_layer(page) if learn else None
+        img, img_dpi = None, None
+        failures = []
+        for n, (config, attempt_dpi) in enumerate(attempts, 1):
+            attempt_dpi = attempt_dpi or OCR_DPI
+            if n > 1:
+                check_cancelled()
+            if attempt_dpi != img_dpi:
+                img, img_dpi = render(i, page, clip, attempt_dpi), attempt_dpi
+            try:
+                with timed("ocr", page=i + 1, attempt=n):
+                    txt = pytesseract.image_to_string(img, config=f"{config} {profile_args}".strip(),
+                                                      timeout=OCR_PAGE_TIMEOUT)
+            except Exception as e:  # pytesseract raises RuntimeError on a timeout, TesseractError on a crash
+                reason = "timed out" if "timeout" in str(e).lower() else f"failed ({e})"
+                failures.append(f"{config} at {attempt_dpi} DPI {reason}")
+                log(f"Page {i + 1}: OCR {reason} with {config} at {attempt_dpi} DPI"
+                    + (", retrying..." if n < len(attempts) else "."), LOG_WARNING)
+                continue
+            if failures:
+                record_page_issue(pdf_path, stage, i + 1, "retried", n,
+                                  "; ".join(failures) + f"; read with {config} at {attempt_dpi} DPI")
+            boxes = None
+            if learn:
+                try:
+                    with timed("crop learning", page=i + 1):
+                        boxes = line_boxes_from_ocr(pytesseract, img, f"{config} {profile_args}".strip(),
+                                                    OCR_PAGE_TIMEOUT)
+                except Exception:
+                    pass  # the page just does not help learn the body region
+            return txt, boxes
+        record_page_issue(pdf_path, stage, i + 1, "skipped", len(attempts), "; ".join(failures))
+        return None, None
+
+    try:
+        for n, i in enumerate(selected, 1):
+            page = doc[i]
+            check_cancelled()
+
+            log(f"Processing page {i + 1}/{page_count}", LOG_DETAIL)
+            if use_ocr:
+                log(f"Forcing high-DPI OCR on page {i + 1}...", LOG_DETAIL)
+
+            r = page.rect
+            clip = pymupdf.Rect(r.x0 + crop[0] * r.width, r.y0 + crop[1] * r.height,
+                                r.x0 + crop[2] * r.width, r.y0 + crop[3] * r.height) if crop else None
+            txt, boxes = read_page(i, page, clip, learning)
+            if txt is not None and clip is not None and not body_pattern.search(txt):
+                # a page laid out differently from the learned ones: read it in full rather than lose its rows
+                log(f"Page {i + 1}: no rows inside the body region, reading the full page.", LOG_DETAIL)
+                txt, _ = read_page(i, page, None, False)
+            if learning:
+                page_crop = learn_body_crop(boxes, body_pattern) if boxes else None
+                if page_crop:
+                    learned.append(page_crop)
+                if n >= OCR_CROP_LEARN_PAGES:
+                    learning = False
+                    if learned:
+                        crop = union_crop(learned)
+                        area = (crop[2] - crop[0]) * (crop[3] - crop[1])
+                        log(f"Body region learned from {len(learned)} page(s): "
+                            f"({crop[0]:.3f}, {crop[1]:.3f}, {crop[2]:.3f}, {crop[3]:.3f}), {area:.0%} of the page.")
+
+            with timed("clean_ocr_text"):
+                cleaned_txt = clean_ocr_text(txt or "")
+            if progress:
+                progress(stage, n, len(selected))
+            yield i, cleaned_txt
+    finally:
+        doc.close()
+    if preprocess:
+        log(f"Preprocessing: deskewed {len(skews)} of {len(selected)} page(s)"
+            + (f", largest correction {max(skews.values(), key=abs):+.1f}°." if skews else "."))
+    if use_ocr and pixels["full"] and crop:
+        log(f"OCR read {pixels['read'] / 1e6:.1f} Mpx instead of {pixels['full'] / 1e6:.1f} Mpx "
+            f"({1 - pixels['read'] / pixels['full']:.0%} less).")
+
+
+def clean_ocr_text(s):
+    s = s.replace("\u2010", "-").replace("\u2011", "-").replace("\u2013", "-")
+    s = s.replace('|', '').replace(']', '')
+    s = s.replace(' O ', ' 0 ').replace(' G ', ' 6 ').replace(' B ', ' 8 ')
+    s = s.replace(' l ', ' 1 ')
+    s = re.sub(r'\s+', ' ', s)
+    return s
+
+
+def normalize_name_csv(last, first, middle):
+    parts = []
+    last = last.strip().upper()
+    first = first.strip().upper()
+    middle = middle.strip().upper()
+    if last:
+        nm = last + ", " + first
+        if middle:
+            nm += " " + middle
+        parts.append(nm)
+    else:
+        nm = first
+        if middle:
+            nm += " " + middle
+        parts.append(nm)
+    return ", ".join(parts).title()
+
+
+def normalize_name_from_full(full_name_str):
+    parts = full_name_str.strip().upper().split()
+    if not parts:
+        return ""
+
+    last = parts[-1]
+    first = parts[0] if len(parts) > 1 else ""
+    middle = " ".join(parts[1:-1])
+
+    return normalize_name_csv(last, first, middle) 
+
+
+def normalize_key_name(name_str):
+    if not isinstance(name_str, str):
+        return ""
+    return re.sub(r'[\s,]+', '', name_str).lower()
+
+
+def normalize_dob(val):
+    val = str(val).strip()
+    if not val:
+        return None
+
+    val = val.replace(".", "").strip()
+
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%m/%d/%Y"):
+        try:
+            dt = datetime.strptime(val, fmt)
+            return dt.strftime("%d/%m/%Y")
+        except ValueError:
+            continue
+
+    extended_formats = [
+        "%b %d, %Y", "%B %d, %Y", "%d %b %Y", "%d %B %Y",
+        "%b %d %Y", "%B %d %Y", "%d-%b-%Y", "%d-%B-%Y",
+        "%b-%d-%Y", "%B-%d-%Y", "%d %b, %Y", "%d %B, %Y",
+    ]
+
+    for fmt in extended_formats:
+        try:
+            dt = datetime.strptime(val, fmt)
+            return dt.strftime("%d/%m/%Y")
+        except ValueError:
+            continue
+    try:
+        words = val.split()
+        if len(words) >= 3:
+            words[0] = words[0].capitalize()
+            val_capitalized = " ".join(words)
+            for fmt in extended_formats:
+                try:
+                    dt = datetime.strptime(val_capitalized, fmt)
+                    return dt.strftime("%d/%m/%Y")
+                except ValueError:
+                    continue
+    except Exception:
+        pass
+
+    m = DATE_PATTERN.search(val)
+    return m.group(1) if m else None
+
+
+# ---------------- CENTRE LIST PARSER ----------------
+def parse_centre_entries(text, matches):
+    """ {code: name} for the centre code matches found in text """
+    centres = {}
+    for i, current_match in enumerate(matches):
+        code = current_match.group(1)
+        start_pos = current_match.end()
+        end_pos = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        name_raw = text[start_pos:end_pos]
+
+        name_cleaned = re.sub(r'\d', '', name_raw) 
+        name_cleaned = name_cleaned.replace("E-Testing", "").strip()
+        name_cleaned = name_cleaned.replace("Schoo!", "School").strip() 
+
+        common_endings = ["Secondary School", "Secondary", "College", "Campus", "High School", "School"]
+
+        best_name = name_cleaned
+        for ending in common_endings:
+            if ending in name_cleaned:
+                end_index = name_cleaned.find(ending) + len(ending)
+                potential_name = name_cleaned[:end_index].strip()
+                best_name = potential_name
+                break 
+
+        best_name = re.sub(r'\s+', ' ', best_name).strip()
+
+        if code and best_name:
+            centres[code] = best_name
+    return centres
+
+
+def parse_centre_list(pdf_path, log, output_dir, progress=None):
+    log("--- STARTING CENTRE LIST PARSING (IMPROVED LOGIC) ---")
+    try:
+        with timed("extract text", stage="centre_pages"):
+            text = extract_text_from_pdf(pdf_path, log, output_dir, progress, "centre_pages", CENTRE_CODE_PATTERN)
+        matches = list(CENTRE_CODE_PATTERN.finditer(text))
+
+        if not matches:
+            log("Warning: No 6-digit centre codes found in the centre list PDF.")
+            return {}
+
+        parse_start = time.perf_counter()
+        centres = parse_centre_entries(text, matches)
+        record_span("parse centres", parse_start, codes=len(matches))
+
+        if not centres:
+            log("Warning: No centres parsed from centre list PDF with improved logic.")
+        else:
+            log(f"Centres parsed (improved logic): {len(centres)}")
+        return centres
+
+    except RunCancelled:
+        raise
+    except Exception as e:
+        log(f"ERROR parsing centre list: {e}")
+        return {}
+
+
+def lookup_centres(pdf_path, codes, log, progress=None):
+    """
+    Names for just the given centre codes. Pages are read in order (from the text layer where it
+    has centre codes, otherwise OCR'd) and reading stops once every code is resolved, so a run that
+    needs a handful of centres does not OCR the whole list. Returns {code: name} for the codes found.
+    """
+    needed = {code for code in codes if code}
+    if not needed:
+        return {}
+    log(f"Looking up {len(needed)} centre code(s) in the centre list...")
+    found = {}
+    text = ""
+    pages = 0
+    try:
+        with timed("centre lookup", codes=len(needed)):
+            for i, page_text in iter_pdf_text(pdf_path, log, progress, "centre_pages", CENTRE_CODE_PATTERN,
+                                              text_layer_first=True):
+                pages = i + 1
+                text += "\n" + page_text
+                matches = list(CENTRE_CODE_PATTERN.finditer(text))
+                if not matches:
+                    continue
+                # the last entry's name may still continue on the next page
+                entries = parse_centre_entries(text, matches[:-1])
+                found.update({code: name for code, name in entries.items() if code in needed})
+                text = text[matches[-1].start():]
+                if needed <= found.keys():
+                    break
+            else:
+                matches = list(CENTRE_CODE_PATTERN.finditer(text))
+                found.update({code: name for code, name in parse_centre_entries(text, matches).items()
+                              if code in needed})
+    except RunCancelled:
+        raise
+    except Exception as e:
+        log(f"ERROR looking up centres: {e}")
+    missing = sorted(needed - found.keys())
+    log(f"Centre lookup: resolved {len(found)} of {len(needed)} code(s) after reading {pages} page(s)."
+        + (f" Not in the list: {', '.join(missing)}" if missing else ""))
+    return found
+
+
+# ---------------- CANDIDATE LIST PARSER ----------------
+def parse_candidate_list(pdf_path, log, output_dir, progress=None, eligible=None, on_page=None):
+    """
+    Parse a candidate list PDF. With `eligible` (the parsed CSV applicants), a cheap first pass
+    finds the pages holding them and only those pages get full OCR (see locate_eligible_pages).
+    Blocks are parsed as pages arrive; on_page(pdf_path, page index, candidates, skipped blocks) is
+    called with each page's results so a caller can show them live (see LiveMatchTally).
+    """
+    log("--- STARTING CANDIDATE LIST PARSING (Smarter Logic V3) ---")
+
+    try:
+        pages = locate_eligible_pages(pdf_path, eligible, log, progress) if eligible is not None else None
+        candidates = []
+        parts = []
+        counts = {"blocks": 0}
+        rest = ""  # the last block read so far, which may continue on the next page
+
+        def parse(i, text, final):
+            blocks, remainder = split_candidate_blocks(text, final)
+            found, skipped = [], []
+            with timed("parse blocks", blocks=len(blocks)):
+                for block in blocks:
+                    c = parse_candidate_block(block, log)
+                    if c is None:
+                        skipped.append(block)
+                    else:
+                        found.append(c)
+            counts["blocks"] += len(blocks)
+            candidates.extend(found)
+            if progress and blocks:
+                progress("blocks", counts["blocks"], counts["blocks"])
+            if on_page and (found or skipped or not final):
+                on_page(pdf_path, i, found, skipped)
+            return remainder
+
+        i = None
+        with timed("extract text", stage="candidate_pages"):
+            for i, page_text in iter_pdf_text(pdf_path, log, progress, "candidate_pages", CANDIDATE_NUM_PATTERN,
+                                              pages=pages):
+                parts.append(page_text)
+                rest = parse(i, f"{rest}\n{page_text}" if rest else page_text, False)
+            parse(i, rest, True)
+
+        if not counts["blocks"]:
+            raise ValueError("OCR did not find any 10-digit candidate numbers in the PDF text.")
+        log(f"Found {len(candidates)} candidates successfully parsed.")
+        if not candidates:
+            raise ValueError("OCR parsing failed to extract any valid candidate data.")
+        return candidates, [], "\n".join(parts)
+
+    except RunCancelled:
+        raise
+    except Exception as e:
+        log(f"ERROR parsing candidate list: {e}")
+        return [], [], ""
+
+
+def split_candidate_blocks(text, final=True):
+    """
+    (blocks, rest): the text split into whitespace-collapsed blocks, one per candidate number. Unless
+    final, the last block is returned as raw `rest` instead, since it may continue on the next page.
+    """
+    matches = list(CANDIDATE_NUM_PATTERN.finditer(text))
+    if not matches:
+        return [], ""  # text before the first candidate number is page header
+    starts = [m.start() for m in matches] + [len(text)]
+    count = len(matches) if final else len(matches) - 1
+    blocks = [re.sub(r'\s+', ' ', text[starts[n]:starts[n + 1]]).strip() for n in range(count)]
+    return blocks, "" if final else text[starts[-2]:]
+
+
+def parse_candidate_block(cleaned_block, log):
+    """ The Candidate in one block of a candidate list, or None (logged) if the block is malformed """
+    id_match = CANDIDATE_NUM_PATTERN.search(cleaned_block)
+    dob_match = DATE_PATTERN.search(cleaned_block)
+
+    if not (id_match and dob_match):
+        log(f"SKIPPING malformed block: {cleaned_block[:100]}...", LOG_DETAIL)
+        return None
+
+    candidate_num_full = id_match.group(1)
+    dob = dob_match.group(1)
+
+    name_raw = cleaned_block[id_match.end():dob_match.start()].strip()
+    name_parts = [part.strip() for part in name_raw.split(',') if part.strip()]
+    if name_parts:
+        last_name = name_parts[0]
+        first_middle = ' '.join(name_parts[1:])
+        name = f"{last_name}, {first_middle}".title()
+    else:
+        name = name_raw.title()
+
+    if not name or not re.search(r'[a-zA-Z]', name):
+        log(f"SKIPPING block for Cand# {candidate_num_full}: Invalid name parsed ('{name_raw}').", LOG_DETAIL)
+        return None
+
+    remaining_text = cleaned_block[dob_match.end():].strip()
+
+    gender_match = re.search(r'\b([MF])\b', remaining_text)
+    if not gender_match:
+        log(f"SKIPPING block for Cand# {candidate_num_full}: Could not find Gender after DOB.", LOG_DETAIL)
+        return None
+
+    gender = "Male" if gender_match.group(1) == "M" else "Female"
+
+    subjects_raw = remaining_text[gender_match.end():].strip()
+
+    count_match = re.search(r'\s(\d)$', subjects_raw)
+    if count_match:
+        subjects_raw = subjects_raw[:count_match.start()].strip()
+
+    subjects_list = []
+    for code_match in SUBJECT_CODE_PATTERN.finditer(subjects_raw.upper()):
+        code, type = code_match.groups()
+        if code in SUBJECT_CODE_MAP:
+            subjects_list.append(make_subject(code, type))
+
+    return Candidate(candidate_num_full, name, dob, gender, subjects_list)
+
+
+def parse_candidate_text(text, log, progress=None):
+    """ Candidates from the extracted text of a candidate list; raises ValueError if there are none """
+    parse_start = time.perf_counter()
+    blocks, _ = split_candidate_blocks(text)
+    if not blocks:
+        raise ValueError("OCR did not find any 10-digit candidate numbers in the PDF text.")
+
+    candidates = []
+    for i, block in enumerate(blocks):
+        if progress and i % PROGRESS_EVERY == 0:
+            progress("blocks", i, len(blocks))
+        c = parse_candidate_block(block, log)
+        if c is not None:
+            candidates.append(c)
+
+    record_span("parse blocks", parse_start, blocks=len(blocks))
+    if progress:
+        progress("blocks", len(blocks), len(blocks))
+    log(f"Found {len(candidates)} candidates successfully parsed.")
+
+    if not candidates:
+        raise ValueError("OCR parsing failed to extract any valid candidate data.")
+
+    return candidates
+
+
+# ---------------- ELIGIBILITY PREFILTER ----------------
+def eligible_keys(csv_list):
+    """ (DOBs, upper-case surnames) of the eligible CSV applicants """
+    dobs = {row.dob for row in csv_list if row.dob}
+    surnames = {row.name.split(",")[0].strip().upper() for row in csv_list if row.name.split(",")[0].strip()}
+    return dobs, surnames
+
+
+def page_has_eligible(text, dobs, surnames):
+    """ True if a candidate block on the page has an eligible DOB or, when its DOB is unreadable, surname """
+    matches = list(CANDIDATE_NUM_PATTERN.finditer(text))
+    for i, m in enumerate(matches):
+        block = text[m.end():matches[i + 1].start() if i + 1 < len(matches) else len(text)].upper()
+        dob_match = DATE_PATTERN.search(block)
+        if dob_match:
+            if normalize_dob(dob_match.group(1)) in dobs:
+                return True
+            continue
+        words = set(re.findall(r"[A-Z][A-Z'\-]+", block))
+        if any(s in words or (" " in s and s in block) for s in surnames):
+            return True
+    return False
+
+
+def continues_onto(text):
+    """ True if the page starts with the tail of a row from the previous page (subjects before any candidate number) """
+    m = CANDIDATE_NUM_PATTERN.search(text)
+    head = text[:m.start()] if m else text
+    return any(code in SUBJECT_CODE_MAP for code, _ in SUBJECT_CODE_PATTERN.findall(head.upper()))
+
+
+def locate_eligible_pages(pdf_path, csv_list, log, progress=None):
+    """
+    First pass of a prefiltered run: read every page cheaply (its text layer, else OCR at
+    PREFILTER_DPI) and return the indexes of the pages holding an eligible applicant, plus the
+    pages their rows continue onto. None (read every page) if the pass finds nothing.
+    """
+    dobs, surnames = eligible_keys(csv_list)
+    texts = {}
+    with timed("prefilter", stage="candidate_pages"):
+        for i, text in iter_pdf_text(pdf_path, log, progress, "prefilter_pages", CANDIDATE_NUM_PATTERN,
+                                     text_layer_first=True, dpi=PREFILTER_DPI):
+            texts[i] = text
+    pages = {i for i, text in texts.items() if page_has_eligible(text, dobs, surnames)}
+    pages |= {i + 1 for i in pages if i + 1 in texts and continues_onto(texts[i + 1])}
+    if not pages:
+        log("Prefilter: no page matched an eligible applicant, so every page is read.")
+        return None
+    log(f"Prefilter: {len(pages)} of {len(texts)} page(s) hold eligible applicants; OCR'ing only those.")
+    return pages
+
+
+class CombinedProgress:
+    """ Sums progress events from files parsed side by side, so each stage reports one done/total """
+
+    def __init__(self, progress):
+        self.progress = progress
+        self.counts = {}
+        self.started = set()
+        self._lock = threading.Lock()
+
+    def expect(self, stage, key, total):
+        """ Pre-seed a file's total so the combined total (and ETA) is right before that file starts """
+        self.counts.setdefault(stage, {})[key] = (0, total)
+
+    def for_file(self, key):
+        if not self.progress:
+            return None
+        return lambda stage, done, total: self.update(key, stage, done, total)
+
+    def update(self, key, stage, done, total):
+        with self._lock:
+            per_file = self.counts.setdefault(stage, {})
+            per_file[key] = (done, total)
+            done_sum = sum(d for d, _ in per_file.values())
+            total_sum = sum(t for _, t in per_file.values())
+            first = stage not in self.started
+            self.started.add(stage)
+        if done_sum or first:
+            self.progress(stage, done_sum, total_sum)
+
+
+def parse_candidate_lists(pdf_paths, log, output_dir, progress=None, eligible=None, on_page=None):
+    """
+    Parse several candidate list PDFs (e.g. one per centre or region) on a shared pool of OCR
+    workers and merge them into one roster. A candidate number found in more than one list is kept once.
+    Returns the same (candidates, unmatched_blocks, text) triple as parse_candidate_list.
+    """
+    if len(pdf_paths) == 1:
+        return parse_candidate_list(pdf_paths[0], log, output_dir, progress, eligible, on_page)
+
+    import pymupdf
+
+    combined = CombinedProgress(progress)
+    for i, path in enumerate(pdf_paths):
+        try:
+            with pymupdf.open(path) as doc:
+                combined.expect("candidate_pages", i, len(doc))
+        except Exception:
+            pass  # parse_candidate_list reports the unreadable file
+    log(f"Parsing {len(pdf_paths)} candidate lists with {min(OCR_WORKERS, len(pdf_paths))} OCR worker(s)...")
+    with ThreadPoolExecutor(max_workers=min(OCR_WORKERS, len(pdf_paths)), thread_name_prefix="ocr") as pool:
+        results = list(pool.map(
+            lambda i: parse_candidate_list(pdf_paths[i], file_log(log, pdf_paths[i]), output_dir, combined.for_file(i),
+                                           eligible, on_page),
+            range(len(pdf_paths))))
+    return merge_rosters(pdf_paths, results, log)
+
+
+def merge_rosters(pdf_paths, results, log):
+    """ One roster from per-file (candidates, unmatched_blocks, text) results; a candidate number is kept once """
+    roster = []
+    unmatched = []
+    texts = []
+    seen = set()
+    duplicates = 0
+    for path, (cands, blocks, text) in zip(pdf_paths, results):
+        if not cands:
+            log(f"Warning: no candidates parsed from {os.path.basename(path)}.")
+        for c in cands:
+            if c.id in seen:
+                duplicates += 1
+                continue
+            seen.add(c.id)
+            roster.append(c)
+        unmatched.extend(blocks)
+        texts.append(text)
+    if duplicates:
+        log(f"Skipped {duplicates} candidate(s) listed in more than one candidate list.")
+    log(f"Merged roster: {len(roster)} candidates from {len(pdf_paths)} candidate lists.")
+    return roster, unmatched, "\n".join(texts)
+
+
+# ---------------- TIMETABLE STORE ----------------
+def timetable_store_key(exam_type, exam_month, exam_year):
+    return f"{exam_type}|{exam_month}|{exam_year}"
+
+
+def load_timetable_store(path=TIMETABLE_STORE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_timetable_store(store, path=TIMETABLE_STORE_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(store, f, indent=2, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+def get_stored_timetable(exam_type, exam_month, exam_year, path=TIMETABLE_STORE_PATH):
+    store = load_timetable_store(path)
+    return store.get(timetable_store_key(exam_type, exam_month, exam_year), {})
+
+
+def update_stored_timetable(exam_type, exam_month, exam_year, timetable, path=TIMETABLE_STORE_PATH):
+    """ Merge subject timetables into the store; subjects without any papers are not stored """
+    store = load_timetable_store(path)
+    key = timetable_store_key(exam_type, exam_month, exam_year)
+    exam_tt = store.setdefault(key, {})
+    for code, papers in timetable.items():
+        if papers:
+            exam_tt[code] = papers
+    save_timetable_store(store, path)
+    return exam_tt
+
+
+def parse_timetable_file(file_path, log):
+    """ Read a timetable from JSON ({code: [{paper, date, session}]}) or CSV (Subject, Paper, Date, Session) """
+    timetable = {}
+    if file_path.lower().endswith(".json"):
+        with open(file_path, encoding="utf-8") as f:
+            data = json.load(f)
+        for code, papers in data.items():
+            timetable[code.strip().upper()] = [
+                {"paper": str(p.get("paper", "")).strip(), "date": str(p.get("date", "")).strip(),
+                 "session": str(p.get("session", "AM")).strip()}
+                for p in papers if str(p.get("date", "")).strip()
+            ]
+    else:
+        with open(file_path, newline='', encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            if not reader.fieldnames:
+                log("ERROR: Timetable CSV is empty or unreadable.")
+                return {}
+            headers = {h.strip().lower(): h for h in reader.fieldnames if h}
+            code_col = headers.get("subject") or headers.get("code") or headers.get("subject code")
+            if not code_col or "date" not in headers:
+                log("ERROR: Timetable CSV needs at least 'Subject' and 'Date' columns.")
+                return {}
+            for row in reader:
+                code = (row.get(code_col) or "").strip().upper()
+                date = (row.get(headers["date"]) or "").strip()
+                if not code or not date:
+                    continue
+                timetable.setdefault(code, []).append({
+                    "paper": (row.get(headers.get("paper", ""), "") or "").strip(),
+                    "date": date,
+                    "session": (row.get(headers.get("session", ""), "") or "AM").strip()
+                })
+
+    unknown = sorted(c for c in timetable if c not in SUBJECT_CODE_MAP)
+    if unknown:
+        log(f"Warning: timetable contains unknown subject code(s): {', '.join(unknown)}")
+    log(f"Timetable file: read {sum(len(p) for p in timetable.values())} paper(s) for {len(timetable)} subject(s).")
+    return timetable
+
+
+# ---------------- ROSTER STORE ----------------
+# Parsed candidate lists are saved per exam (timetable_store_key) so a late CSV batch can be matched
+# against the roster without OCRing the candidate list PDFs again.
+ROSTER_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    exam TEXT NOT NULL,
+    id TEXT NOT NULL,
+    centre_num TEXT NOT NULL,
+    name TEXT NOT NULL,
+    name_key TEXT NOT NULL,
+    dob TEXT NOT NULL,
+    gender TEXT NOT NULL,
+    subjects TEXT NOT NULL,
+    source TEXT NOT NULL,
+    saved_at TEXT NOT NULL,
+    PRIMARY KEY (exam, id)
+);
+CREATE INDEX IF NOT EXISTS candidates_centre ON candidates (exam, centre_num);
+CREATE INDEX IF NOT EXISTS candidates_name_dob ON candidates (exam, name_key, dob);
+CREATE INDEX IF NOT EXISTS candidates_dob ON candidates (exam, dob);
+"""
+ROSTER_COLUMNS = "id, name, dob, gender, subjects"
+
+
+def encode_subjects(subjects):
+    return " ".join(f"{s.code}:{s.type}" for s in subjects)
+
+
+def decode_subjects(text):
+    return [make_subject(*item.split(":", 1)) for item in text.split()]
+
+
+class RosterStore:
+    """ SQLite store of parsed candidate lists, indexed by candidate number, centre, name key and DOB """
+
+    def __init__(self, path=ROSTER_DB_PATH):
+        import sqlite3
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(ROSTER_SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def save(self, exam_key, candidates, source=""):
+        """ Insert or replace candidates for one exam; returns the number saved """
+        saved_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with timed("roster save", candidates=len(candidates)), self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO candidates VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                ((exam_key, c.id, c.centre_num, c.name, normalize_key_name(c.name), c.dob, c.gender,
+                  encode_subjects(c.subjects), source, saved_at) for c in candidates))
+        return len(candidates)
+
+    def count(self, exam_key):
+        return self.conn.execute("SELECT COUNT(*) FROM candidates WHERE exam = ?", (exam_key,)).fetchone()[0]
+
+    def sources(self, exam_key):
+        """ [(source, candidates, last saved)] for one exam """
+        return self.conn.execute("SELECT source, COUNT(*), MAX(saved_at) FROM candidates WHERE exam = ? "
+                                 "GROUP BY source ORDER BY MAX(saved_at)", (exam_key,)).fetchall()
+
+    def candidates(self, exam_key):
+        """ Every stored candidate of one exam """
+        rows = self.conn.execute(f"SELECT {ROSTER_COLUMNS} FROM candidates WHERE exam = ? ORDER BY id", (exam_key,))
+        return [self._candidate(row) for row in rows]
+
+    def get(self, exam_key, candidate_id):
+        row = self.conn.execute(f"SELECT {ROSTER_COLUMNS} FROM candidates WHERE exam = ? AND id = ?",
+                                (exam_key, candidate_id)).fetchone()
+        return self._candidate(row) if row else None
+
+    def find(self, exam_key, name, dob):
+        """ The candidate with this (normalised) name and DOB, as match_candidates would pair them """
+        row = self.conn.execute(f"SELECT {ROSTER_COLUMNS} FROM candidates WHERE exam = ? AND name_key = ? AND dob = ? "
+                                "ORDER BY rowid DESC LIMIT 1", (exam_key, normalize_key_name(name), dob)).fetchone()
+        return self._candidate(row) if row else None
+
+    def in_centre(self, exam_key, centre_num):
+        rows = self.conn.execute(f"SELECT {ROSTER_COLUMNS} FROM candidates WHERE exam = ? AND centre_num = ? "
+                                 "ORDER BY id", (exam_key, centre_num))
+        return [self._candidate(row) for row in rows]
+
+    def match(self, exam_key, csv_list, progress=None):
+        """ match_candidates against the stored roster; returns (matched, missing_csv) """
+        match_start = time.perf_counter()
+        matched = []
+        missing_csv = []
+        for i, row in enumerate(csv_list):
+            if progress and i % PROGRESS_EVERY == 0:
+                progress("match", i, len(csv_list))
+            cand = self.find(exam_key, row.name, row.dob) if normalize_key_name(row.name) else None
+            if cand:
+                matched.append(cand.with_email(row.email))
+            else:
+                missing_csv.append(row)
+        if progress:
+            progress("match", len(csv_list), len(csv_list))
+        record_span("match (roster store)", match_start, rows=len(csv_list))
+        return matched, missing_csv
+
+    @staticmethod
+    def _candidate(row):
+        cand_id, name, dob, gender, subjects = row
+        return Candidate(cand_id, name, dob, gender, decode_subjects(subjects))
+
+
+def save_roster(exam_key, candidates, source, log, path=ROSTER_DB_PATH):
+    """ Save a parsed roster to the store; failures are logged, never fatal for the run """
+    try:
+        with RosterStore(path) as store:
+            store.save(exam_key, candidates, source)
+            log(f"Roster store: saved {len(candidates)} candidates ({store.count(exam_key)} stored for this exam).")
+    except Exception as e:
+        log(f"Warning: could not save roster to {path}: {e}")
+
+
+def match_stored_roster(exam_key, csv_list, log, progress=None, path=ROSTER_DB_PATH):
+    """ Match CSV rows against the stored roster instead of a freshly parsed candidate list """
+    with RosterStore(path) as store:
+        stored = store.count(exam_key)
+        if not stored:
+            raise ValueError(f"No stored roster for {exam_key.replace('|', ' ')}. Run once with the candidate list.")
+        sources = ", ".join(src for src, _, _ in store.sources(exam_key))
+        log(f"Matching against stored roster: {stored} candidates from {sources}.")
+        return store.match(exam_key, csv_list, progress)
+
+
+# --- PDF GENERATION CLASS ---
+SLIP_FONTS = {'': 'Roboto-Regular.ttf', 'B': 'Roboto-Bold.ttf', 'I': 'Roboto-Italic.ttf'}
+_compact_background_cache = {}
+
+
+def get_compact_background(path, dpi=COMPACT_BACKGROUND_DPI, quality=COMPACT_BACKGROUND_QUALITY):
+    """ Downsample and JPEG-recompress the slip background once, cached per (path, dpi, quality) """
+    key = (path, dpi, quality)
+    if key in _compact_background_cache:
+        return _compact_background_cache[key]
+
+    data = None
+    Image = get_pil_image()
+    if Image and os.path.exists(path):
+        img = Image.open(path)
+        if img.mode in ("RGBA", "LA", "P"):
+            # JPEG has no alpha channel, so flatten onto the white page instead of embedding an SMask
+            img = img.convert("RGBA")
+            flat = Image.new("RGB", img.size, (255, 255, 255))
+            flat.paste(img, mask=img.split()[-1])
+            img = flat
+        else:
+            img = img.convert("RGB")
+
+        target_w = int(round(210 / 25.4 * dpi))  # A4 page width in inches * dpi
+        if img.width > target_w:
+            target_h = int(round(img.height * target_w / img.width))
+            img = img.resize((target_w, target_h), Image.LANCZOS)
+
+        buf = io.BytesIO()
+        img.save(buf, format="JPEG", quality=quality, optimize=True)
+        data = buf.getvalue()
+
+    _compact_background_cache[key] = data
+    return data
+
+
+def get_pdf_class():
+    """ The slip PDF class; fpdf2 is imported and the class defined on first use """
+    with _lazy_lock:
+        if "PDF" in _lazy_modules:
+            return _lazy_modules["PDF"]
+
+    from fpdf import FPDF
+    from fpdf.enums import XPos, YPos
+
+    class PDF(FPDF):
+        def __init__(self, compact=False):
+            super().__init__()
+            # FIX: Use resource path for background image
+            self.background_path = resource_path("background.png")
+            self.compact = compact
+            self.background_data = None
+            if compact:
+                # fpdf2 already subsets embedded TTFs to the glyphs used; compact mode also
+                # forces stream compression and swaps in the downsampled background.
+                self.set_compression(True)
+                self.background_data = get_compact_background(self.background_path)
+
+        def add_page(self, orientation='', format='', same=False):
+            super().add_page(orientation, format, same)
+            if self.background_data:
+                self.image(io.BytesIO(self.background_data), x=0, y=0, w=self.w, h=self.h)
+            elif self.background_path and os.path.exists(self.background_path):
+                self.image(self.background_path, x=0, y=0, w=self.w, h=self.h)
+            else:
+                try:
+                    self.set_font('Roboto', 'I', 8)
+                    self.cell(0, 5, "background.png not found", 0, align='C')
+                except RuntimeError:
+                    self.set_font('Helvetica', 'I', 8)
+                    self.cell(0, 5, "background.png not found", 0, align='C')
+
+        def header(self):
+            try:
+                self.set_font('Roboto', 'B', 14)
+            except RuntimeError:
+                self.set_font('Helvetica', 'B', 14)
+            self.set_y(50)
+            self.cell(0, 10, 'CXC Examination E-Slip', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C')
+            self.ln(5)
+
+        def footer(self):
+            self.set_y(-15)
+
+    with _lazy_lock:
+        return _lazy_modules.setdefault("PDF", PDF)
+
+
+def __getattr__(name):
+    # keeps `timeslips_core.PDF` working without importing fpdf2 at module import
+    if name == "PDF":
+        return get_pdf_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def split_slip_name(candidate):
+    name_parts = candidate.name.split(',', 1)
+    surname = name_parts[0].strip() if name_parts else "Unknown"
+    other_names = name_parts[1].strip() if len(name_parts) > 1 else ""
+    return surname, other_names
+
+
+def build_pdf_slip(candidate, centre_name, timetable, exam_month, exam_year, exam_type, compact=False):
+    surname, other_names = split_slip_name(candidate)
+
+    # --- NEW LOGIC: Rearrange to "First/Other Names Surname" ---
+    if other_names:
+        display_name = f"{other_names} {surname}"
+    else:
+        display_name = surname
+
+    from fpdf.enums import XPos, YPos
+
+    pdf = get_pdf_class()(compact=compact)
+
+    try:
+        # FIX: Use resource path for fonts
+        for style, font_file in SLIP_FONTS.items():
+            pdf.add_font('Roboto', style, resource_path(font_file))
+    except Exception as e:
+        raise RuntimeError(f"Required Roboto font files (.ttf) not found: {e}")
+
+    pdf.add_page()
+    pdf.set_right_margin(15)
+    pdf.set_left_margin(15)
+    pdf.set_auto_page_break(True, 30)
+
+    pdf.set_font('Roboto', '', 11)
+    greeting_text = (
+        "Greetings\n"
+        f"Thank you for using the Exam Concierge Service for the {exam_month} {exam_year} CXC examinations.\n"
+        "The information requested is as follows:"
+    )
+    pdf.multi_cell(0, 5, greeting_text)
+    pdf.ln(5)
+
+    pdf.set_font('Roboto', 'B', 12)
+    pdf.cell(0, 10, 'Candidate Credentials', 0, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='L')
+    pdf.set_font('Roboto', '', 10)
+    label_col_width = 55
+    value_col_width = 125
+
+    credentials = {
+        "Candidate Full Name": display_name,  # Updated to use the rearranged name
+        "Candidate DOB": candidate.dob, "Candidate Gender": candidate.gender,
+        "Candidate Number": candidate.id, "Centre Number": candidate.centre_num,
+        "Centre Location": centre_name or 'N/A' 
+    }
+    pdf.set_fill_color(220, 220, 220)
+    for label, value in credentials.items():
+        pdf.set_font('Roboto', 'B', 10)
+        pdf.cell(label_col_width, 8, label, border=1, fill=True)
+        pdf.set_font('Roboto', '', 10)
+        pdf.cell(value_col_width, 8, f" {value}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.ln(5)
+
+    examination_details = f"{exam_type} {exam_month} {exam_year}"
+    pdf.set_font('Roboto', 'B', 10)
+    pdf.cell(label_col_width, 8, "Examination", border=1, fill=True)
+    pdf.set_font('Roboto', '', 10)
+    pdf.cell(0, 8, f" {examination_details}", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+    pdf.ln(2)
+
+    pdf.set_font('Roboto', 'B', 10)
+    pdf.set_fill_color(220, 220, 220)
+    pdf.cell(0, 8, "Examination Timetable", border=1, new_x=XPos.LMARGIN, new_y=YPos.NEXT, align='C', fill=True)
+
+    pdf.set_font('Roboto', 'B', 10)
+    headers = ["Subject", "Candidate Type", "Paper", "Date", "Session"]
+    total_width = pdf.w - pdf.l_margin - pdf.r_margin
+    col_widths = [total_width * 0.35, total_width * 0.15, total_width * 0.15, total_width * 0.20,
+                  total_width * 0.15]
+
+    for i, header in enumerate(headers):
+        pdf.cell(col_widths[i], 8, header, border=1, align='C', fill=True)
+    pdf.ln()
+
+    pdf.set_font('Roboto', '', 9)
+    if not candidate.subjects:
+        pdf.cell(sum(col_widths), 10, "No subjects found for this candidate.", 1, new_x=XPos.LMARGIN,
+                 new_y=YPos.NEXT, align='C')
+    else:
+        for subject in candidate.subjects:
+            code = subject.code
+            cand_type = subject.type
+            subject_name = SUBJECT_CODE_MAP.get(code, code)
+            papers_info = timetable.get(code, [])
+
+            papers_to_show = papers_info
+            if cand_type == 'R':
+                papers_to_show = [p for p in papers_info if p.get('paper') in ['1', '2']]
+
+            for paper_info in papers_to_show:
+                pdf.cell(col_widths[0], 8, f" {subject_name}", 1)
+                pdf.cell(col_widths[1], 8, cand_type, 1, align='C')
+                pdf.cell(col_widths[2], 8, paper_info.get('paper', ''), 1, align='C')
+                pdf.cell(col_widths[3], 8, paper_info.get('date', ''), 1, align='C')
+                pdf.cell(col_widths[4], 8, paper_info.get('session', ''), 1, new_x=XPos.LMARGIN, new_y=YPos.NEXT,
+                         align='C')
+
+    bottom_text = (
+        "Starting times for all centers within a territory are 09:00 hr. for the morning (9AM) session and 13:00 hr. for the afternoon (1PM) session. The Local Registrar reserves the right to arrange candidates for the administering of examinations."
+    )
+    pdf.ln(5)
+    pdf.set_font('Roboto', 'I', 9)
+    pdf.multi_cell(0, 5, bottom_text, new_x=XPos.LMARGIN, new_y=YPos.NEXT)
+
+    return pdf
+
+
+def missing_slip_fonts():
+    return [f for f in SLIP_FONTS.values() if not os.path.exists(resource_path(f))]
+
+
+def unique_path(filepath):
+    """ filepath, or "name (1).pdf", "name (2).pdf"... if it is taken, so candidates sharing a name keep their slips """
+    counter = 1
+    base_filepath = filepath
+    while os.path.exists(filepath):
+        name, ext = os.path.splitext(base_filepath)
+        filepath = f"{name} ({counter}){ext}"
+        counter += 1
+    return filepath
+
+
+def slip_filename(candidate, exam_type):
+    surname, other_names = split_slip_name(candidate)
+
+    sanitized_surname = re.sub(r'[\\/*?:"<>|]', "", surname)
+    sanitized_other_names = re.sub(r'[\\/*?:"<>|]', "", other_names)
+
+    return f"{exam_type} E-Slip {sanitized_surname} {sanitized_other_names}.pdf"
+
+
+def render_slip(candidate, centre_name, timetable, exam_month, exam_year, exam_type, compact=False):
+    """ The slip PDF as bytes, without writing a file """
+    with timed("slip layout"):
+        pdf = build_pdf_slip(candidate, centre_name, timetable, exam_month, exam_year, exam_type, compact)
+    with timed("slip serialize"):
+        return pdf.output()
+
+
+def warm_slip_renderer(compact=False):
+    """ Render one slip in memory so the first real slip is not charged for loading fpdf2, fonts and background """
+    render_slip(Candidate("0000000000", "Warm, Up", "01/01/2000"), "", {}, "", "", "", compact)
+
+
+def create_pdf_slip(candidate, centre_name, timetable, output_dir, exam_month, exam_year, exam_type, log,
+                    compact=False):
+    """ Write one slip to output_dir; returns its path, or False (with the reason logged) if it failed """
+    try:
+        filepath = unique_path(os.path.join(output_dir, slip_filename(candidate, exam_type)))
+        data = render_slip(candidate, centre_name, timetable, exam_month, exam_year, exam_type, compact)
+        with timed("file write"):
+            with open(filepath, "wb") as f:
+                f.write(data)
+        return filepath
+
+    except Exception as e:
+        log(f"Failed to create PDF for {candidate.name or 'Unknown'}: {e}", LOG_ERROR)
+        return False
+
+
+def slip_size_report(candidate, centre_name, timetable, exam_month, exam_year, exam_type, log):
+    """ Render one slip in standard and compact mode in memory and log both sizes """
+    sizes = {}
+    try:
+        for label, compact in (("standard", False), ("compact", True)):
+            pdf = build_pdf_slip(candidate, centre_name, timetable, exam_month, exam_year, exam_type, compact)
+            sizes[label] = len(pdf.output())
+    except Exception as e:
+        log(f"Slip size report failed: {e}")
+        return None
+
+    saved = sizes["standard"] - sizes["compact"]
+    pct = (saved / sizes["standard"] * 100) if sizes["standard"] else 0
+    log(f"Slip size report: standard {sizes['standard'] / 1024:.1f} KB, compact {sizes['compact'] / 1024:.1f} KB "
+        f"({pct:.0f}% smaller per slip)")
+    return sizes
+
+
+# ---------------- EMAIL DELIVERY ----------------
+DEFAULT_SMTP_SETTINGS = {
+    "host": "localhost",
+    "port": 25,
+    "use_ssl": False,
+    "starttls": False,
+    "username": "",
+    "password": "",  # or set ESLIP_SMTP_PASSWORD
+    "sender": "",
+    "subject": "{exam_type} {exam_month} {exam_year} E-Slip",
+    "body": "Dear {name},\n\nPlease find attached your {exam_type} {exam_month} {exam_year} e-slip.\n",
+    "pool_size": 4,  # concurrent, reused SMTP connections
+    "rate_per_minute": 120,  # 0 = unlimited
+    "max_retries": 3,
+    "backoff_seconds": 2.0,
+    "timeout": 30,
+}
+
+
+def load_smtp_settings(path=SMTP_SETTINGS_PATH):
+    settings = dict(DEFAULT_SMTP_SETTINGS)
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            settings.update(json.load(f))
+    if not settings["password"]:
+        settings["password"] = os.environ.get("ESLIP_SMTP_PASSWORD", "")
+    return settings
+
+
+class SMTPPool:
+    """ Hands out up to `size` logged-in SMTP connections and reuses them between messages """
+
+    def __init__(self, settings):
+        self.settings = settings
+        self.size = max(1, int(settings["pool_size"]))
+        self._idle = queue.Queue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        import smtplib
+
+        st = self.settings
+        if st["use_ssl"]:
+            conn = smtplib.SMTP_SSL(st["host"], int(st["port"]), timeout=st["timeout"])
+        else:
+            conn = smtplib.SMTP(st["host"], int(st["port"]), timeout=st["timeout"])
+            if st["starttls"]:
+                conn.starttls()
+        if st["username"]:
+            conn.login(st["username"], st["password"])
+        return conn
+
+    def acquire(self):
+        while True:
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                break
+            try:
+                # all connections busy; a broken one frees a slot instead of returning, so poll
+                return self._idle.get(timeout=0.5)
+            except queue.Empty:
+                continue
+        try:
+            return self._connect()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def release(self, conn, broken=False):
+        if not broken:
+            self._idle.put(conn)
+            return
+        with self._lock:
+            self._created -= 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close(self):
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                conn.quit()
+            except Exception:
+                pass
+
+
+class RateLimiter:
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def load_send_log(log_path):
+    """ Return the set of (file name, email) pairs already delivered according to the send log """
+    sent = set()
+    if not os.path.exists(log_path):
+        return sent
+    with open(log_path, newline='', encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            if row.get("status") == "sent":
+                sent.add((row.get("file", ""), row.get("email", "")))
+    return sent
+
+
+def build_slip_email(settings, filepath, email, fields):
+    import mimetypes
+    from email.message import EmailMessage
+
+    msg = EmailMessage()
+    msg["From"] = settings["sender"] or settings["username"]
+    msg["To"] = email
+    msg["Subject"] = settings["subject"].format(**fields)
+    msg.set_content(settings["body"].format(**fields))
+    ctype = mimetypes.guess_type(filepath)[0] or "application/pdf"
+    maintype, subtype = ctype.split("/", 1)
+    with open(filepath, "rb") as f:
+        msg.add_attachment(f.read(), maintype=maintype, subtype=subtype, filename=os.path.basename(filepath))
+    return msg
+
+
+def deliver_slips(deliveries, settings, log_path, log, exam_month="", exam_year="", exam_type=""):
+    """
+    Email each (filepath, email, name) delivery over a pool of reused SMTP connections.
+    Every attempt outcome is appended to the CSV send log at log_path; deliveries already
+    logged as sent are skipped, so an interrupted run can simply be started again.
+    """
+    import smtplib
+
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+    already_sent = load_send_log(log_path)
+    todo = []
+    for filepath, email, name in deliveries:
+        if not email:
+            log(f"No email address for {name}, not sending {os.path.basename(filepath)}", LOG_WARNING)
+            counts["skipped"] += 1
+        elif (os.path.basename(filepath), email) in already_sent:
+            counts["skipped"] += 1
+        else:
+            todo.append((filepath, email, name))
+
+    if not todo:
+        log(f"Email: nothing to send ({counts['skipped']} skipped).")
+        return counts
+
+    log(f"Email: sending {len(todo)} slip(s) via {settings['host']}:{settings['port']} "
+        f"with {settings['pool_size']} connection(s)...")
+    pool = SMTPPool(settings)
+    limiter = RateLimiter(settings["rate_per_minute"])
+    log_lock = threading.Lock()
+    new_log = not os.path.exists(log_path)
+    log_file = open(log_path, "a", newline='', encoding="utf-8")
+    writer = csv.writer(log_file)
+    if new_log:
+        writer.writerow(["timestamp", "file", "email", "status", "attempts", "error"])
+
+    def record(filepath, email, status, attempts, error=""):
+        with log_lock:
+            writer.writerow([datetime.now().isoformat(timespec="seconds"), os.path.basename(filepath), email, status,
+                             attempts, error])
+            log_file.flush()
+            counts[status] += 1
+
+    def send_one(item):
+        filepath, email, name = item
+        fields = {"name": name, "exam_month": exam_month, "exam_year": exam_year, "exam_type": exam_type}
+        max_attempts = int(settings["max_retries"]) + 1
+        error = ""
+        for attempt in range(1, max_attempts + 1):
+            conn = None
+            try:
+                msg = build_slip_email(settings, filepath, email, fields)
+                limiter.wait()
+                conn = pool.acquire()
+                conn.send_message(msg)
+                pool.release(conn)
+                record(filepath, email, "sent", attempt)
+                return
+            except smtplib.SMTPRecipientsRefused as e:
+                if conn is not None:
+                    pool.release(conn)
+                record(filepath, email, "failed", attempt, f"recipient refused: {e}")
+                return
+            except Exception as e:
+                if conn is not None:
+                    pool.release(conn, broken=True)
+                error = str(e) or e.__class__.__name__
+                if attempt < max_attempts:
+                    delay = float(settings["backoff_seconds"]) * (2 ** (attempt - 1))
+                    time.sleep(delay + random.uniform(0, delay / 2))
+        log(f"Email to {email} failed after {max_attempts} attempt(s): {error}", LOG_ERROR)
+        record(filepath, email, "failed", max_attempts, error)
+
+    try:
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            list(executor.map(send_one, todo))
+    finally:
+        pool.close()
+        log_file.close()
+
+    log(f"Email: {counts['sent']} sent, {counts['failed']} failed, {counts['skipped']} skipped. "
+        f"Send log: {log_path}")
+    return counts
+
+
+# ---------------- PIPELINE ----------------
+def match_candidates(cand_list, csv_list, progress=None):
+    """ Match eligible CSV rows to parsed candidates on (normalised name, DOB); returns (matched, missing_csv) """
+    match_start = time.perf_counter()
+    matched = []
+    missing_csv = []
+
+    def make_key(c):
+        name_key = normalize_key_name(c.name)
+        return (name_key, c.dob)
+
+    cand_index = {}
+    for c in cand_list:
+        key = make_key(c)
+        if key[0]:
+            cand_index[key] = c
+
+    for i, row in enumerate(csv_list):
+        if progress and i % PROGRESS_EVERY == 0:
+            progress("match", i, len(csv_list))
+        csv_name_key = normalize_key_name(row.name)
+        k = (csv_name_key, row.dob)
+
+        if k in cand_index:
+            matched.append(cand_index[k].with_email(row.email))
+        else:
+            missing_csv.append(row)
+
+    if progress:
+        progress("match", len(csv_list), len(csv_list))
+    record_span("match", match_start, candidates=len(cand_list), rows=len(csv_list))
+    return matched, missing_csv
+
+
+class LiveMatchTally:
+    """
+    Running counts while candidate lists are parsed, fed with parse_candidate_list's on_page results:
+    candidates matching an eligible CSV row so far, candidates not in the CSV and skipped blocks.
+    A wrong CSV or a bad scan shows up in these within the first pages.
+    """
+
+    def __init__(self, csv_list):
+        self.keys = {applicant_key(row) for row in csv_list if normalize_key_name(row.name)}
+        self.pages = set()
+        self.matched = 0
+        self.not_in_csv = 0
+        self.skipped = 0
+
+    def add(self, pdf_path, page, candidates, skipped):
+        """ Count one on_page event; returns [(candidate, True if it matches a CSV row)] """
+        rows = [(c, applicant_key(c) in self.keys) for c in candidates]
+        hits = sum(1 for _, hit in rows if hit)
+        self.pages.add((pdf_path, page))
+        self.matched += hits
+        self.not_in_csv += len(rows) - hits
+        self.skipped += len(skipped)
+        return rows
+
+    def describe(self):
+        return (f"{self.matched + self.not_in_csv} parsed from {len(self.pages)} page(s): {self.matched} matched, "
+                f"{self.not_in_csv} not in the CSV, {self.skipped} block(s) skipped")
+
+
+def find_missing_centres(matched, centres):
+    needed_centres = {c.centre_num for c in matched if c.centre_num}
+    return sorted([c for c in needed_centres if c not in centres])
+
+
+def collect_subjects(matched):
+    subject_universe = set()
+    for c in matched:
+        for s in c.subjects:
+            subject_universe.add(s.code)
+    return {s for s in subject_universe if s}
+
+
+def write_slip(c, centres, timetable, output_dir, exam_month, exam_year, exam_type, compact, log, result):
+    """ Write one candidate's slip and record the outcome in a generate_slips-style result dict """
+    centre_name = centres.get(c.centre_num, '')
+
+    try:
+        out = create_pdf_slip(c, centre_name, timetable, output_dir, exam_month, exam_year, exam_type, log, compact)
+        if out:
+            log(f"Generated: {os.path.basename(out)}", LOG_DETAIL)
+            result["success"] += 1
+            result["bytes"] += os.path.getsize(out)
+            result["deliveries"].append((out, c.email, c.name))
+        else:
+            log(f"Failed to generate slip for {c.name or 'Unknown'}")
+    except Exception as e:
+        log(f"Failed to generate slip for {c.name or 'Unknown'}: {e}")
+
+
+def log_output_size(result, log):
+    if result["success"]:
+        log(f"Output size: {result['bytes'] / 1024:.1f} KB total, "
+            f"{result['bytes'] / result['success'] / 1024:.1f} KB per slip.")
+
+
+def generate_slips(matched, centres, timetable, output_dir, exam_month, exam_year, exam_type, compact, log,
+                   progress=None):
+    """
+    Write one slip per matched candidate, reporting progress("slips", done, total).
+    Returns a summary dict with the success count, bytes written and the (filepath, email, name)
+    deliveries for the email stage; "cancelled" is set if cancel_run() stopped it early.
+    """
+    total_candidates = len(matched)
+    result = {"success": 0, "total": total_candidates, "bytes": 0, "deliveries": [], "cancelled": False}
+
+    if compact and matched:
+        first = matched[0]
+        slip_size_report(first, centres.get(first.centre_num, ''), timetable, exam_month, exam_year,
+                         exam_type, log)
+
+    if progress:
+        progress("slips", 0, total_candidates)
+    for i, c in enumerate(matched):
+        if cancel_requested():
+            result["cancelled"] = True
+            log(f"Cancelled: stopped after {i} of {total_candidates} slip(s).")
+            break
+        write_slip(c, centres, timetable, output_dir, exam_month, exam_year, exam_type, compact, log, result)
+        if progress:
+            progress("slips", i + 1, total_candidates)
+
+    log_output_size(result, log)
+    return result
+
+
+class ReviewQueue:
+    """
+    Holds matched candidates that cannot get a slip yet (centre name unknown or subjects
+    without a timetable) and releases them as soon as the missing data is supplied.
+    """
+
+    def __init__(self, centres, timetable, check_centres=True):
+        self.centres = centres
+        self.timetable = timetable
+        self.check_centres = check_centres
+        self.held = []
+        self._lock = threading.Lock()
+
+    def missing_for(self, c):
+        """ (missing centre code or None, sorted subject codes without a timetable) """
+        code = c.centre_num
+        missing_centre = code if self.check_centres and code and code not in self.centres else None
+        missing_subjects = sorted({s.code for s in c.subjects if not self.timetable.get(s.code)})
+        return missing_centre, missing_subjects
+
+    def add(self, candidates):
+        """ Queue candidates; returns the ones that are ready for a slip right away """
+        ready = []
+        with self._lock:
+            for c in candidates:
+                missing_centre, missing_subjects = self.missing_for(c)
+                if missing_centre or missing_subjects:
+                    self.held.append(c)
+                else:
+                    ready.append(c)
+        return ready
+
+    def add_centres(self, names):
+        self.centres.update({code: name for code, name in names.items() if name})
+        return self._release()
+
+    def add_timetable(self, timetable):
+        self.timetable.update({code: papers for code, papers in timetable.items() if papers})
+        return self._release()
+
+    def _release(self):
+        with self._lock:
+            held = self.held
+            self.held = []
+        return self.add(held)
+
+    def missing_centres(self):
+        with self._lock:
+            return sorted({self.missing_for(c)[0] for c in self.held} - {None})
+
+    def missing_subjects(self):
+        with self._lock:
+            return {code for c in self.held for code in self.missing_for(c)[1]}
+
+
+class SlipWorker:
+    """ Background thread that writes slips for candidates as they are submitted """
+
+    def __init__(self, centres, timetable, output_dir, exam_month, exam_year, exam_type, compact, log,
+                 progress=None):
+        self.args = (centres, timetable, output_dir, exam_month, exam_year, exam_type, compact, log)
+        self.log = log
+        self.progress = progress
+        self.result = {"success": 0, "total": 0, "bytes": 0, "deliveries": [], "cancelled": False}
+        self._queue = queue.Queue()
+        self._done = 0
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        if progress:
+            progress("slips", 0, 0)
+        self._thread.start()
+
+    def submit(self, candidates):
+        for c in candidates:
+            self.result["total"] += 1
+            self._queue.put(c)
+
+    def _run(self):
+        while True:
+            c = self._queue.get()
+            if c is None:
+                break
+            if cancel_requested():
+                # keep draining so close() returns, but write nothing more
+                self.result["cancelled"] = True
+                continue
+            write_slip(c, *self.args, self.result)
+            self._done += 1
+            if self.progress:
+                self.progress("slips", self._done, self.result["total"])
+
+    def close(self):
+        """ Wait for every submitted slip to be written; returns the result dict """
+        self._queue.put(None)
+        self._thread.join()
+        if self.result["cancelled"]:
+            self.log(f"Cancelled: {self.result['success']} of {self.result['total']} slip(s) written.")
+        log_output_size(self.result, self.log)
+        return self.result
+
+
+# ---------------- PREFLIGHT ----------------
+# A check of a run's inputs in seconds, before committing to a run that OCRs every page: CSV columns and
+# eligibility, a few pages OCR'd from each list, the match rate they predict and the projected run time.
+def csv_missing_columns(csv_path, exam_type, exam_month):
+    """ The CSV_REQUIRED_COLUMNS of the session's export format that a CSV export's header row lacks """
+    with open(csv_path, newline='', encoding="utf-8") as f:
+        headers = next(csv.reader(f), [])
+    layout = csv_layout(exam_type, exam_month)
+    if layout == "january":
+        return [col for col in CSV_REQUIRED_COLUMNS[layout] if not any(col in h for h in headers)]
+    return [col for col in CSV_REQUIRED_COLUMNS[layout] if col not in headers]
+
+
+def sample_pages(page_count, n=PREFLIGHT_SAMPLE_PAGES):
+    """ Up to n page indexes spread evenly from the first page to the last """
+    if page_count <= n or n < 2:
+        return list(range(min(page_count, n)))
+    return sorted({round(k * (page_count - 1) / (n - 1)) for k in range(n)})
+
+
+def sample_pdf(pdf_path, stage, pattern, log, n, text_layer_first=False):
+    """ (page count, {page index: text} of the sampled pages, seconds per sampled page) """
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as doc:
+        page_count = len(doc)
+    start = time.perf_counter()
+    texts = dict(iter_pdf_text(pdf_path, log, None, stage, pattern, text_layer_first,
+                               pages=set(sample_pages(page_count, n))))
+    per_page = (time.perf_counter() - start) / len(texts) if texts else 0.0
+    return page_count, texts, per_page
+
+
+def preflight(candidate_paths, centre_path, csv_paths, exam_type, exam_month, exam_year, log, compact=False,
+              sample=PREFLIGHT_SAMPLE_PAGES, timetable=None):
+    """
+    Check the inputs of a run without running it: the CSV exports' columns and eligible rows,
+    `sample` pages OCR'd from each candidate list and the centre list, the share of eligible
+    applicants the sampled rows predict will match, and the projected time of the full run.
+    `timetable` defaults to the stored timetable of the exam session.
+    Returns a report dict; report["problems"] lists what would make the full run fail.
+    """
+    started = time.perf_counter()
+    report = {"problems": [], "eligible": 0, "candidate_pages": 0, "sampled_pages": 0, "sampled_candidates": 0,
+              "sampled_matched": 0, "projected_matched": 0, "match_rate": None, "projected_seconds": 0.0}
+    problems = report["problems"]
+    log("--- PREFLIGHT CHECK ---")
+
+    missing_fonts = missing_slip_fonts()
+    if missing_fonts:
+        problems.append(f"missing font file(s): {', '.join(missing_fonts)}")
+
+    for path in csv_paths:
+        try:
+            missing = csv_missing_columns(path, exam_type, exam_month)
+        except (OSError, UnicodeDecodeError) as e:
+            problems.append(f"{os.path.basename(path)}: unreadable CSV ({e})")
+            continue
+        if missing:
+            problems.append(f"{os.path.basename(path)}: missing column(s) {'; '.join(missing)}")
+    csv_list = parse_csvs(csv_paths, exam_type, exam_month, log)
+    report["eligible"] = len(csv_list)
+    if not csv_list:
+        problems.append("no eligible applicants in the CSV export(s)")
+
+    tally = LiveMatchTally(csv_list)
+    sampled = []
+    blocks = 0
+    list_seconds = []
+    for path in candidate_paths:
+        name = os.path.basename(path)
+        try:
+            page_count, texts, per_page = sample_pdf(path, "candidate_pages", CANDIDATE_NUM_PATTERN,
+                                                     file_log(log, path), sample)
+        except RunCancelled:
+            raise
+        except Exception as e:
+            problems.append(f"{name}: unreadable candidate list ({e})")
+            continue
+        found_here = 0
+        for i, text in texts.items():
+            # rows cut by a page break may be skipped here; the full run joins them across pages
+            page_blocks, _ = split_candidate_blocks(text)
+            parsed = [(block, parse_candidate_block(block, log)) for block in page_blocks]
+            found = [c for _, c in parsed if c is not None]
+            tally.add(path, i, found, [block for block, c in parsed if c is None])
+            sampled.extend(found)
+            blocks += len(page_blocks)
+            found_here += len(found)
+        report["candidate_pages"] += page_count
+        report["sampled_pages"] += len(texts)
+        list_seconds.append(page_count * per_page)
+        log(f"Candidate list {name}: sampled {len(texts)} of {page_count} page(s) at {per_page:.2f}s per page, "
+            f"{found_here} candidate(s) parsed.")
+        if not found_here:
+            problems.append(f"{name}: no candidates parsed from the sampled pages")
+
+    report["sampled_candidates"] = len(sampled)
+    report["sampled_matched"] = tally.matched
+    if blocks:
+        log(f"Sampled candidates: {tally.describe()} ({len(sampled) / blocks:.0%} of blocks parsed).")
+    if sampled and csv_list:
+        projected_roster = len(sampled) / report["sampled_pages"] * report["candidate_pages"]
+        report["projected_matched"] = round(min(len(csv_list), tally.matched / len(sampled) * projected_roster))
+        report["match_rate"] = report["projected_matched"] / len(csv_list)
+        log(f"Expected matches: about {report['projected_matched']} of {len(csv_list)} eligible applicant(s) "
+            f"({report['match_rate']:.0%}), from {report['sampled_pages']} of {report['candidate_pages']} page(s).")
+        if not tally.matched:
+            problems.append("none of the sampled candidates match an eligible CSV row "
+                            "(wrong export, exam session or candidate list?)")
+
+    centre_seconds = 0.0
+    if centre_path:
+        try:
+            page_count, texts, per_page = sample_pdf(centre_path, "centre_pages", CENTRE_CODE_PATTERN, log, sample,
+                                                     text_layer_first=True)
+            codes = sum(len(CENTRE_CODE_PATTERN.findall(text)) for text in texts.values())
+            centre_seconds = page_count * per_page
+            log(f"Centre list: sampled {len(texts)} of {page_count} page(s) at {per_page:.2f}s per page, "
+                f"{codes} centre code(s) found.")
+            if not codes:
+                problems.append("no centre codes found on the sampled centre list pages")
+        except RunCancelled:
+            raise
+        except Exception as e:
+            problems.append(f"{os.path.basename(centre_path)}: unreadable centre list ({e})")
+
+    slip_seconds = 0.0
+    if sampled and not missing_fonts:
+        if timetable is None:
+            timetable = get_stored_timetable(exam_type, exam_month, exam_year)
+        no_papers = sorted({s.code for c in sampled for s in c.subjects if not timetable.get(s.code)})
+        if no_papers:
+            log(f"Warning: no stored timetable for sampled subject(s) {', '.join(no_papers)}; "
+                f"the run will ask for them or hold those candidates for review.")
+        try:
+            c = sampled[0]
+            build_pdf_slip(c, "", timetable, exam_month, exam_year, exam_type, compact).output()  # loads fonts
+            slip_start = time.perf_counter()
+            build_pdf_slip(c, "", timetable, exam_month, exam_year, exam_type, compact).output()
+            slip_seconds = time.perf_counter() - slip_start
+        except Exception as e:
+            problems.append(f"sample slip could not be built ({e})")
+
+    # candidate lists are OCR'd side by side on up to OCR_WORKERS threads
+    workers = max(1, min(OCR_WORKERS, len(list_seconds)))
+    candidate_seconds = max(sum(list_seconds) / workers, max(list_seconds, default=0.0))
+    slips_seconds = report["projected_matched"] * slip_seconds
+    report["projected_seconds"] = candidate_seconds + centre_seconds + slips_seconds
+    log(f"Projected full run: about {format_duration(report['projected_seconds'])} "
+        f"(candidate lists {format_duration(candidate_seconds)}, centre list up to {format_duration(centre_seconds)}, "
+        f"{report['projected_matched']} slip(s) at {slip_seconds * 1000:.0f} ms each).")
+
+    for problem in problems:
+        log(f"ERROR: {problem}")
+    log(f"Preflight finished in {time.perf_counter() - started:.1f}s: "
+        + (f"{len(problems)} problem(s) found." if problems else "no problems found."))
+    return report
+
+
+# ---------------- WATCH FOLDER ----------------
+WATCH_POLL_SECONDS = 2.0
+
+
+def applicant_key(row):
+    """ Identity of an applicant across CSV exports: the same (name key, DOB) pair matching uses """
+    return f"{normalize_key_name(row.name)}|{row.dob}"
+
+
+class WatchState:
+    """ What watch mode has already handled, kept in the output folder so a restarted watcher resumes """
+
+    def __init__(self, path):
+        self.path = path
+        self.files = {}  # file name -> [mtime, size] of the export last processed
+        self.done = set()  # applicant keys whose slip has been written
+        self.unmatched = set()  # applicant keys already reported as not on the roster
+        self.held = {}  # applicant key -> encode_candidate() of a matched candidate waiting for centre/timetable
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            self.files = data.get("files", {})
+            self.done = set(data.get("done", []))
+            self.unmatched = set(data.get("unmatched", []))
+            self.held = data.get("held", {})
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"files": self.files, "done": sorted(self.done), "unmatched": sorted(self.unmatched),
+                       "held": self.held}, f)
+        os.replace(tmp_path, self.path)
+
+
+class CsvFolderWatcher:
+    """
+    Polls a folder for new or changed CSV exports. A file is only reported once its size and
+    modification time are the same on two polls in a row, so half-written exports are skipped.
+    """
+
+    def __init__(self, folder, state):
+        self.folder = folder
+        self.state = state
+        self._pending = {}  # name -> signature seen on the last poll, not yet stable
+        self._ready = {}  # name -> stable signature handed out by poll()
+
+    def poll(self):
+        """ Paths of CSV files that changed since they were last processed and are no longer being written """
+        ready = []
+        try:
+            names = sorted(n for n in os.listdir(self.folder) if n.lower().endswith(".csv"))
+        except OSError:
+            return ready
+        for name in names:
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            sig = [st.st_mtime, st.st_size]
+            if self.state.files.get(name) == sig:
+                self._pending.pop(name, None)
+                continue
+            if self._pending.get(name) == sig:
+                del self._pending[name]
+                self._ready[name] = sig
+                ready.append(path)
+            else:
+                self._pending[name] = sig
+        return ready
+
+    def mark_processed(self, path):
+        # the signature polled, not the current one, so an edit made while processing is picked up next poll
+        name = os.path.basename(path)
+        self.state.files[name] = self._ready.pop(name)
+
+
+# ---------------- SHARDED RUNS ----------------
+# A sharded run splits candidate list OCR by page range and slip generation by centre into jobs in a
+# shared folder, so several processes or machines can work on one run (see timeslips_cli.py --shard).
+SHARD_PAGES_PER_JOB = 20
+SHARD_POLL_SECONDS = 1.0
+SHARD_STALE_SECONDS = 600  # a claimed job without a heartbeat for this long is handed to another worker
+SHARD_HEARTBEAT_SECONDS = 15
+
+
+def page_ranges(page_count, per_job=SHARD_PAGES_PER_JOB):
+    """ [start, end) page index ranges covering a PDF in jobs of per_job pages """
+    return [(start, min(start + per_job, page_count)) for start in range(0, page_count, per_job)]
+
+
+def encode_candidate(c):
+    return {"id": c.id, "name": c.name, "dob": c.dob, "gender": c.gender, "subjects": encode_subjects(c.subjects),
+            "email": c.email}
+
+
+def decode_candidate(data):
+    return Candidate(data["id"], data["name"], data["dob"], data["gender"], decode_subjects(data["subjects"]),
+                     data["email"])
+
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+class JobQueue:
+    """
+    Job queue kept as files in a folder every worker can reach (a local folder or a network share).
+    A job is a JSON file in pending/. A worker claims it by renaming it into claimed/ under its own
+    name; the rename is atomic, so exactly one worker wins. Results go to results/ and the job moves
+    on to done/ or failed/. A claimed job whose file stops being touched is put back in pending/.
+    """
+    FOLDERS = ("pending", "claimed", "done", "failed", "results")
+
+    def __init__(self, root):
+        self.root = root
+        for folder in self.FOLDERS:
+            os.makedirs(os.path.join(root, folder), exist_ok=True)
+
+    def path(self, *parts):
+        return os.path.join(self.root, *parts)
+
+    def _claimed(self, job_id, worker):
+        return self.path("claimed", f"{job_id}~{worker}.json")
+
+    def _ids(self, folder, kind=None):
+        try:
+            names = sorted(os.listdir(self.path(folder)))
+        except OSError:
+            return []
+        ids = [n[:-5].split("~")[0] for n in names if n.endswith(".json")]
+        return [i for i in ids if kind is None or i.startswith(f"{kind}-")]
+
+    def add(self, job_id, job):
+        if not os.path.exists(self.path("done", f"{job_id}.json")):
+            write_json_atomic(self.path("pending", f"{job_id}.json"), job)
+
+    def claim(self, worker):
+        """ (job id, job) of the next pending job, now owned by this worker; (None, None) if there is none """
+        for job_id in self._ids("pending"):
+            claimed = self._claimed(job_id, worker)
+            try:
+                os.rename(self.path("pending", f"{job_id}.json"), claimed)
+                os.utime(claimed)  # the rename keeps the planning time, which would look stale
+                with open(claimed, encoding="utf-8") as f:
+                    return job_id, json.load(f)
+            except OSError:
+                continue  # another worker got there first
+        return None, None
+
+    def heartbeat(self, job_id, worker):
+        """ Mark the job as still being worked on; False if it was handed to another worker meanwhile """
+        try:
+            os.utime(self._claimed(job_id, worker))
+            return True
+        except OSError:
+            return False
+
+    def complete(self, job_id, worker, result):
+        write_json_atomic(self.path("results", f"{job_id}.json"), result)
+        self._move(job_id, worker, "done")
+
+    def fail(self, job_id, worker, error):
+        write_json_atomic(self.path("results", f"{job_id}.json"), {"error": error})
+        self._move(job_id, worker, "failed")
+
+    def _move(self, job_id, worker, folder):
+        try:
+            os.replace(self._claimed(job_id, worker), self.path(folder, f"{job_id}.json"))
+        except OSError:
+            pass  # requeued as stale meanwhile; whoever runs it again writes the same result
+
+    def requeue_stale(self, max_age=SHARD_STALE_SECONDS):
+        """ Put jobs whose worker stopped sending heartbeats back in pending/; returns their ids """
+        requeued = []
+        now = time.time()
+        for name in os.listdir(self.path("claimed")):
+            path = self.path("claimed", name)
+            try:
+                if now - os.path.getmtime(path) < max_age:
+                    continue
+                job_id = name[:-5].split("~")[0]
+                os.rename(path, self.path("pending", f"{job_id}.json"))
+                requeued.append(job_id)
+            except OSError:
+                continue
+        return requeued
+
+    def counts(self, kind=None):
+        """ {folder: number of jobs} for pending, claimed, done and failed, optionally of one kind """
+        return {folder: len(self._ids(folder, kind)) for folder in self.FOLDERS[:4]}
+
+    def result(self, job_id):
+        path = self.path("results", f"{job_id}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    def job_ids(self, folder, kind=None):
+        return self._ids(folder, kind)
+
+    def load(self, name):
+        """ A run-level JSON file in the queue folder (e.g. run.json); None if it is not there yet """
+        try:
+            with open(self.path(name), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save(self, name, data):
+        write_json_atomic(self.path(name), data)
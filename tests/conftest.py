@@ -0,0 +1,113 @@
+"""
+Shared fixtures. The app modules live in pyinstall/ (next to the fonts and background they load),
+so that folder is put on the import path; app data goes to a temporary home folder.
+"""
+import os
+import socketserver
+import sys
+import threading
+
+import pytest
+
+PYINSTALL_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "pyinstall")
+sys.path.insert(0, PYINSTALL_DIR)
+
+
+@pytest.fixture(autouse=True)
+def app_home(tmp_path, monkeypatch):
+    """ Keep ~/.cxc_eslip (timetables, rosters, SMTP settings) out of the real home folder """
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))
+    return home
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """
+    A minimal local SMTP server for delivery tests. It records every accepted message. Recipients
+    in `refuse` get a 550. Recipients in `drop_once` have the connection cut at their first DATA command.
+    """
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.messages = []  # (recipients, raw message bytes)
+        self.connections = 0
+        self.refuse = set()
+        self.drop_once = set()
+        self.lock = threading.Lock()
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode("ascii") + b"\r\n")
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server
+        with server.lock:
+            server.connections += 1
+        rcpts = []
+        self.reply("220 localhost stand-in")
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            cmd = line.decode("ascii", "replace").strip()
+            verb = cmd.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.reply("250-localhost")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "MAIL":
+                rcpts = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                addr = cmd.split(":", 1)[1].strip().strip("<>")
+                if addr in server.refuse:
+                    self.reply("550 no such user")
+                else:
+                    rcpts.append(addr)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                with server.lock:
+                    dropped = [a for a in rcpts if a in server.drop_once]
+                    server.drop_once.difference_update(dropped)
+                if dropped:
+                    return  # close the connection mid-transaction
+                self.reply("354 end with <CRLF>.<CRLF>")
+                data = []
+                for data_line in self.rfile:
+                    if data_line == b".\r\n":
+                        break
+                    data.append(data_line)
+                with server.lock:
+                    server.messages.append((list(rcpts), b"".join(data)))
+                self.reply("250 OK queued")
+            elif verb == "RSET":
+                rcpts = []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("502 not implemented")
+
+
+@pytest.fixture
+def smtp_server():
+    server = SMTPStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
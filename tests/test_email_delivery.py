@@ -0,0 +1,74 @@
+import csv
+
+from timeslips_core import DEFAULT_SMTP_SETTINGS, deliver_slips
+
+
+def make_deliveries(tmp_path, emails):
+    deliveries = []
+    for i, email in enumerate(emails):
+        path = tmp_path / f"CSEC E-Slip Candidate {i}.pdf"
+        path.write_bytes(b"%PDF-1.4 slip " + str(i).encode())
+        deliveries.append((str(path), email, f"Candidate, Number {i}"))
+    return deliveries
+
+
+def settings_for(server, **overrides):
+    settings = dict(DEFAULT_SMTP_SETTINGS, host="127.0.0.1", port=server.port, sender="eslips@example.com",
+                    pool_size=2, rate_per_minute=0, max_retries=2, backoff_seconds=0.01, timeout=5)
+    settings.update(overrides)
+    return settings
+
+
+def read_send_log(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def test_sends_every_slip_and_resumes_from_the_send_log(tmp_path, smtp_server):
+    emails = [f"applicant{i}@example.com" for i in range(6)]
+    deliveries = make_deliveries(tmp_path, emails)
+    log_path = tmp_path / "email_send_log.csv"
+    settings = settings_for(smtp_server)
+
+    counts = deliver_slips(deliveries, settings, str(log_path), lambda *a: None, "May - June", "2026", "CSEC")
+    assert counts == {"sent": 6, "failed": 0, "skipped": 0}
+    assert sorted(r[0] for r, _ in smtp_server.messages) == sorted(emails)
+    assert all(b"CSEC May - June 2026 E-Slip" in msg for _, msg in smtp_server.messages)
+    assert smtp_server.connections <= settings["pool_size"]  # connections are reused between messages
+
+    again = deliver_slips(deliveries, settings, str(log_path), lambda *a: None, "May - June", "2026", "CSEC")
+    assert again == {"sent": 0, "failed": 0, "skipped": 6}
+    assert len(smtp_server.messages) == 6
+    assert [row["status"] for row in read_send_log(log_path)] == ["sent"] * 6
+
+
+def test_refused_recipient_fails_once_without_retry(tmp_path, smtp_server):
+    smtp_server.refuse.add("nobody@example.com")
+    deliveries = make_deliveries(tmp_path, ["ok@example.com", "nobody@example.com"])
+    log_path = tmp_path / "email_send_log.csv"
+
+    counts = deliver_slips(deliveries, settings_for(smtp_server), str(log_path), lambda *a: None)
+    assert counts == {"sent": 1, "failed": 1, "skipped": 0}
+    refused = [row for row in read_send_log(log_path) if row["email"] == "nobody@example.com"]
+    assert [(row["status"], row["attempts"]) for row in refused] == [("failed", "1")]
+    assert "recipient refused" in refused[0]["error"]
+    assert [r for r, _ in smtp_server.messages] == [["ok@example.com"]]
+
+
+def test_dropped_connection_is_retried_on_a_new_connection(tmp_path, smtp_server):
+    smtp_server.drop_once.add("flaky@example.com")
+    deliveries = make_deliveries(tmp_path, ["flaky@example.com"])
+    log_path = tmp_path / "email_send_log.csv"
+
+    counts = deliver_slips(deliveries, settings_for(smtp_server, pool_size=1), str(log_path), lambda *a: None)
+    assert counts == {"sent": 1, "failed": 0, "skipped": 0}
+    assert [(row["status"], row["attempts"]) for row in read_send_log(log_path)] == [("sent", "2")]
+    assert smtp_server.connections == 2
+    assert [r for r, _ in smtp_server.messages] == [["flaky@example.com"]]
+
+
+def test_delivery_without_an_email_address_is_skipped(tmp_path, smtp_server):
+    deliveries = make_deliveries(tmp_path, [""])
+    counts = deliver_slips(deliveries, settings_for(smtp_server), str(tmp_path / "log.csv"), lambda *a: None)
+    assert counts == {"sent": 0, "failed": 0, "skipped": 1}
+    assert smtp_server.connections == 0
@@ -0,0 +1,83 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+import benchmark
+from conftest import PYINSTALL_DIR
+from timeslips_core import JobQueue, RosterStore, encode_candidate, timetable_store_key
+
+CLI = os.path.join(PYINSTALL_DIR, "timeslips_cli.py")
+CORPUS_SIZE = 100
+EXAM_KEY = timetable_store_key("CSEC", "May - June", "2026")
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    return benchmark.generate_corpus(str(tmp_path_factory.mktemp("corpus")), CORPUS_SIZE, ["text"])
+
+
+def run_cli(corpus, workdir, *extra):
+    """ One headless run on the synthetic corpus; returns (output folder, roster store path) """
+    output = os.path.join(workdir, "out")
+    roster_store = os.path.join(workdir, "roster.db")
+    cmd = [sys.executable, CLI, "--candidates", corpus["text"], "--centres", corpus["centres"],
+           "--csv", corpus["csv"], "--timetable", corpus["timetable"], "--exam-year", "2026",
+           "--output", output, "--roster-store", roster_store, "--unmatched", "skip", *extra]
+    proc = subprocess.run(cmd, cwd=workdir, capture_output=True, text=True, timeout=600)
+    assert proc.returncode == 0, proc.stdout + proc.stderr
+    return output, roster_store
+
+
+def slip_files(output):
+    return sorted(n for n in os.listdir(output) if n.lower().endswith(".pdf"))
+
+
+def stored_roster(path):
+    with RosterStore(path) as store:
+        return [encode_candidate(c) for c in store.candidates(EXAM_KEY)]
+
+
+def test_sharded_run_matches_a_single_process_run(tmp_path, corpus):
+    (tmp_path / "plain").mkdir()
+    (tmp_path / "sharded").mkdir()
+    plain_out, plain_roster = run_cli(corpus, str(tmp_path / "plain"))
+    shard_out, shard_roster = run_cli(corpus, str(tmp_path / "sharded"), "--shard", str(tmp_path / "queue"),
+                                      "--local-workers", "2", "--pages-per-job", "1")
+
+    plain_slips = slip_files(plain_out)
+    assert plain_slips
+    assert slip_files(shard_out) == plain_slips
+    roster = stored_roster(plain_roster)
+    assert len(roster) == CORPUS_SIZE
+    assert stored_roster(shard_roster) == roster
+
+    queue = JobQueue(str(tmp_path / "queue"))
+    assert queue.load("finished.json")["status"] == 0
+    assert queue.counts() == {"pending": 0, "claimed": 0, "done": len(queue.job_ids("done")), "failed": 0}
+    assert len(queue.job_ids("done", "ocr")) > 1  # the list really was split across jobs
+
+
+def test_stale_claim_is_requeued_and_finished_by_another_worker(tmp_path):
+    queue = JobQueue(str(tmp_path / "queue"))
+    queue.add("ocr-0001", {"kind": "ocr", "pages": [0, 1]})
+    queue.add("ocr-0002", {"kind": "ocr", "pages": [1, 2]})
+
+    job_id, job = queue.claim("dead-worker")
+    assert (job_id, job) == ("ocr-0001", {"kind": "ocr", "pages": [0, 1]})
+    assert queue.requeue_stale(max_age=60) == []  # a fresh claim is left alone
+
+    claimed = queue.path("claimed", "ocr-0001~dead-worker.json")
+    old = time.time() - 120
+    os.utime(claimed, (old, old))
+    assert queue.requeue_stale(max_age=60) == ["ocr-0001"]
+    assert queue.counts() == {"pending": 2, "claimed": 0, "done": 0, "failed": 0}
+    assert not queue.heartbeat("ocr-0001", "dead-worker")  # the old owner learns it lost the job
+
+    assert queue.claim("live-worker") == ("ocr-0001", job)
+    queue.complete("ocr-0001", "live-worker", {"pages": ["text"]})
+    queue.complete("ocr-0001", "dead-worker", {"pages": ["text"]})  # a late finish from the old owner is harmless
+    assert queue.result("ocr-0001") == {"pages": ["text"]}
+    assert queue.counts() == {"pending": 1, "claimed": 0, "done": 1, "failed": 0}